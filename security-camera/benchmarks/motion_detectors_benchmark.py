@@ -0,0 +1,123 @@
+"""
+Compares motion detection engines on the same input. Reports per-frame cost and number of frames in which each
+engine detected motion (triggers).
+
+usage: python motion_detectors_benchmark.py [--video PATH] [--frames N] [--width W] [--height H]
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from camera import Camera
+from frame_sources import SyntheticFrameSource, ScriptedObject, VideoFileFrameSource
+from motion_analysis import MotionAnalysis
+from motion_detectors import motion_detectors, create_motion_detector
+
+
+def generate_synthetic_frames(no_frames, width, height, seed=13):
+    """
+    Generates static noisy scene with a slow moving object and single-frame flickers.
+    :return: list with frames, list with flags telling if the object moved in the frame
+    """
+
+    rng = np.random.default_rng(seed)
+    object_size = height // 8
+
+    # slow mover appears in the second half of the input
+    scripted_objects = [ScriptedObject(position=(0, height // 2), size=(object_size, object_size),
+                                       velocity=(max(1, width // 640), 0), start_frame=no_frames // 2)]
+
+    # single-frame flickers
+    flickers = [ScriptedObject(position=(rng.integers(0, width - object_size), rng.integers(0, height - object_size)),
+                               size=(object_size, object_size), color=(250, 250, 250), start_frame=i, end_frame=i + 1)
+                for i in range(25, no_frames, 50)]
+
+    source = SyntheticFrameSource(width, height, scripted_objects=scripted_objects + flickers, no_frames=no_frames,
+                                  seed=seed)
+    frames = read_source_frames(source, no_frames)
+
+    return frames, [i >= no_frames // 2 for i in range(len(frames))]
+
+
+def read_source_frames(source, no_frames):
+    frames = []
+
+    while len(frames) < no_frames:
+        success, frame = source.read()
+        if not success:
+            break
+        frames.append(frame)
+
+    source.release()
+
+    return frames
+
+
+def read_video_frames(path, no_frames):
+    return read_source_frames(VideoFileFrameSource(path, real_time=False), no_frames), None
+
+
+def benchmark_motion_detector(name, frames, detection_resolution, threshold, min_motion_contour_area):
+    detector = create_motion_detector(name)
+    kernel = (3, 3)
+    triggers = []
+    start_time = time.perf_counter()
+
+    for frame in frames:
+        detection_scale = min(1, detection_resolution / frame.shape[0]) if detection_resolution else 1
+        proxy = Camera.get_detection_proxy(frame, detection_scale)
+        motion_mask = detector.detect(Camera.convert_frame_to_gray_gb(proxy, kernel), threshold)
+
+        if motion_mask is None:
+            triggers.append(False)
+            continue
+
+        triggers.append(MotionAnalysis(0, motion_mask, detection_scale).has_motion(min_motion_contour_area))
+
+    per_frame_time = (time.perf_counter() - start_time) / len(frames)
+
+    return per_frame_time, triggers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare motion detection engines.")
+    parser.add_argument("--video", help="video file used as input instead of synthetic scene")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detection-resolution", type=int, default=480)
+    parser.add_argument("--detection-sensitivity", type=float, default=12)
+    parser.add_argument("--max-detection-sensitivity", type=float, default=15)
+    parser.add_argument("--min-motion-area", type=float, default=500)
+    args = parser.parse_args()
+
+    if args.video:
+        frames, object_moved = read_video_frames(args.video, args.frames)
+    else:
+        frames, object_moved = generate_synthetic_frames(args.frames, args.width, args.height)
+
+    threshold = (args.max_detection_sensitivity + 1 - args.detection_sensitivity) * args.max_detection_sensitivity
+
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"detection resolution: {args.detection_resolution or 'full'}, threshold: {threshold}")
+    header = f"{'engine':<18}{'ms/frame':>10}{'triggers':>10}"
+    if object_moved is not None:
+        header += f"{'hits':>8}{'false':>8}"
+    print(header)
+
+    for name in motion_detectors:
+        per_frame_time, triggers = benchmark_motion_detector(name, frames, args.detection_resolution, threshold,
+                                                             args.min_motion_area)
+        row = f"{name:<18}{per_frame_time * 1000:>10.2f}{sum(triggers):>10}"
+        if object_moved is not None:
+            hits = sum(triggered and moved for triggered, moved in zip(triggers, object_moved))
+            row += f"{hits:>8}{sum(triggers) - hits:>8}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
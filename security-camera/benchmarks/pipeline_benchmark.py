@@ -0,0 +1,215 @@
+"""
+Measures throughput and per-stage latency of the camera pipeline on synthetic input at several resolutions: frame
+refresh, motion detection, rendering of each frame mode, emergency buffer update and writing of the recording.
+Each resolution runs in a fresh process, so that its peak RSS is reported separately. Results are saved as JSON,
+which can be compared with results of a previous run.
+
+usage: python pipeline_benchmark.py [--frames N] [--resolutions 640x480,1280x720] [--output PATH] [--compare PATH]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from camera import Camera
+from frame_sources import SyntheticFrameSource, ScriptedObject
+
+resolutions = ((640, 480), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160))
+
+
+def get_peak_rss_mb():
+    """
+    :return: peak resident set size of the process in MB, None if it can't be measured
+    """
+
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macOS, kilobytes elsewhere
+    return peak_rss / 1024 ** 2 if sys.platform == "darwin" else peak_rss / 1024
+
+
+def summarise_latencies(latencies):
+    latencies_ms = np.array(latencies) * 1000
+
+    return {"mean_ms": round(float(np.mean(latencies_ms)), 3),
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3)}
+
+
+def benchmark_resolution(resolution, settings):
+    """
+    Runs the pipeline on synthetic frames of given resolution.
+    :return: dict with fps, latencies of stages and peak RSS
+    """
+
+    width, height = resolution
+    object_size = height // 8
+    # second object appears in the middle of measured frames
+    scripted_objects = [ScriptedObject(position=(0, height // 3), size=(object_size, object_size),
+                                       velocity=(max(2, width // 160), 0)),
+                        ScriptedObject(position=(width // 2, 0), size=(object_size // 2, object_size),
+                                       velocity=(0, max(1, height // 120)),
+                                       start_frame=settings["warmup_frames"] + settings["frames"] // 2)]
+    frame_source = SyntheticFrameSource(width, height, scripted_objects=scripted_objects)
+
+    camera = Camera(emergency_buff_size=settings["emergency_buff_size"],
+                    detection_sensitivity=settings["detection_sensitivity"],
+                    max_detection_sensitivity=settings["max_detection_sensitivity"],
+                    min_motion_contour_area=settings["min_motion_area"], fps=24, camera_number=0,
+                    recording_mode="Standard", detection_resolution=settings["detection_resolution"],
+                    motion_detector=settings["motion_detector"], frame_source=frame_source)
+
+    recording_path = os.path.join(tempfile.mkdtemp(), "benchmark.mkv")
+    writer = cv2.VideoWriter(recording_path, cv2.VideoWriter_fourcc(*"mp4v"), 24, resolution)
+
+    stages = ["refresh", "detection"] + [f"render: {mode}" for mode in camera.frame_modes] + \
+             ["emergency buffer update", "video write"]
+    latencies = {stage: [] for stage in stages}
+    no_motion_frames = 0
+    start_time = None
+
+    for i in range(settings["warmup_frames"] + settings["frames"]):
+        if i == settings["warmup_frames"]:
+            latencies = {stage: [] for stage in stages}
+            no_motion_frames = 0
+            start_time = time.perf_counter()
+
+        t = time.perf_counter()
+        camera.refresh_frame()
+        latencies["refresh"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        no_motion_frames += camera.search_for_motion()
+        latencies["detection"].append(time.perf_counter() - t)
+
+        for mode, get_frame_with_mode in camera.frame_modes.items():
+            t = time.perf_counter()
+            get_frame_with_mode()
+            latencies[f"render: {mode}"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        camera.update_emergency_buffer()
+        latencies["emergency buffer update"].append(time.perf_counter() - t)
+
+        frame = camera.get_standard_frame()
+        t = time.perf_counter()
+        writer.write(frame)
+        latencies["video write"].append(time.perf_counter() - t)
+
+    total_time = time.perf_counter() - start_time
+
+    writer.release()
+    camera.destroy()
+    os.remove(recording_path)
+    os.rmdir(os.path.dirname(recording_path))
+
+    return {"resolution": f"{width}x{height}",
+            "frames": settings["frames"],
+            "fps": round(settings["frames"] / total_time, 2),
+            "motion_frames": int(no_motion_frames),
+            "stages": {stage: summarise_latencies(stage_latencies) for stage, stage_latencies in latencies.items()},
+            "peak_rss_mb": get_peak_rss_mb()}
+
+
+def compare_results(results, previous_results, tolerance):
+    """
+    Prints stages, which got slower than in previous results by more than tolerance.
+    :return: number of regressions
+    """
+
+    previous_by_resolution = {result["resolution"]: result for result in previous_results["results"]}
+    no_regressions = 0
+
+    for result in results["results"]:
+        previous_result = previous_by_resolution.get(result["resolution"])
+        if previous_result is None:
+            continue
+
+        for stage, latencies in result["stages"].items():
+            previous_latencies = previous_result["stages"].get(stage)
+            if previous_latencies is None or previous_latencies["p50_ms"] == 0:
+                continue
+
+            change = latencies["p50_ms"] / previous_latencies["p50_ms"] - 1
+            if change > tolerance:
+                no_regressions += 1
+                print(f"regression {result['resolution']:>10} {stage:<30} p50 {previous_latencies['p50_ms']:.2f} "
+                      f"-> {latencies['p50_ms']:.2f} ms (+{change:.0%})")
+
+    return no_regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark camera pipeline stages on synthetic input.")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup-frames", type=int, default=20)
+    parser.add_argument("--resolutions", default=",".join(f"{w}x{h}" for w, h in resolutions),
+                        help="comma separated list of WIDTHxHEIGHT")
+    parser.add_argument("--detection-resolution", type=int, default=480)
+    parser.add_argument("--motion-detector", default="Frame difference")
+    parser.add_argument("--detection-sensitivity", type=float, default=12)
+    parser.add_argument("--max-detection-sensitivity", type=float, default=15)
+    parser.add_argument("--min-motion-area", type=float, default=500)
+    parser.add_argument("--emergency-buff-size", type=int, default=120)
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+    parser.add_argument("--compare", help="results of a previous run, stages slower by more than tolerance are listed")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    settings = {"frames": args.frames, "warmup_frames": args.warmup_frames,
+                "detection_resolution": args.detection_resolution, "motion_detector": args.motion_detector,
+                "detection_sensitivity": args.detection_sensitivity,
+                "max_detection_sensitivity": args.max_detection_sensitivity,
+                "min_motion_area": args.min_motion_area, "emergency_buff_size": args.emergency_buff_size}
+
+    results = {"environment": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                               "python": platform.python_version(), "numpy": np.__version__,
+                               "opencv": cv2.__version__, "platform": platform.platform(),
+                               "cpu_count": os.cpu_count()},
+               "settings": settings,
+               "results": []}
+
+    # fresh process for each resolution, so that peak RSS isn't carried over
+    context = multiprocessing.get_context("spawn")
+
+    for resolution in args.resolutions.split(","):
+        width, height = (int(size) for size in resolution.lower().split("x"))
+
+        with context.Pool(processes=1) as pool:
+            result = pool.apply(benchmark_resolution, ((width, height), settings))
+
+        results["results"].append(result)
+        print(f"{result['resolution']:>10} {result['fps']:>8.1f} fps, peak RSS: {result['peak_rss_mb']:.0f} MB")
+
+        for stage, latencies in result["stages"].items():
+            print(f"{'':>10} {stage:<30} p50 {latencies['p50_ms']:>8.2f} ms, p99 {latencies['p99_ms']:>8.2f} ms")
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+
+    print(f"results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as previous_results_file:
+            no_regressions = compare_results(results, json.load(previous_results_file), args.tolerance)
+
+        print(f"{no_regressions} regressions")
+        sys.exit(1 if no_regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
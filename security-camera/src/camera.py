@@ -1,12 +1,27 @@
 import cv2
+import copy
+import os
 import numpy as np
 import time
 import logging
-from threading import Thread
+import weakref
+from functools import partial
+from threading import Lock, Thread, Condition
 from collections import deque
 from platform import system
-from time import sleep
 from datetime import datetime
+from frame import Frame
+from frame_bus import FrameBus
+from motion_analysis import MotionAnalysis
+from motion_detectors import create_motion_detector
+from detection_cadence import DetectionCadence
+from render_modes import create_render_chain, register_render_step
+from detection_zones import create_detection_mask
+from frame_capture import FrameCaptureThread
+from frame_sources import DeviceFrameSource
+from frame_buffers import create_frame_buffer
+from recording_writers import EmergencyRecordingWriter, StandardRecordingWriter
+from emergency_clips import EmergencyClipAssembler
 
 
 class Camera:
@@ -14,55 +29,139 @@ class Camera:
     Class responsible for handling input from the video source, detecting motion, saving videos.
     """
 
+    # "Encode" - emergency recordings are encoded from the emergency buffer and following frames,
+    # "Segments" - emergency clips are assembled from segments of standard recording, without re-encoding
+    emergency_recording_modes = ("Encode", "Segments")
+
+    # names of frame modes, indexes are used to request preview mode from other processes
+    frame_mode_names = ("Motion rectangles", "Motion contours", "High contrast", "Mexican hat", "Sharpened", "Gray",
+                        "Negative", "Standard", "Edges")
+
     def __init__(self, emergency_buff_size, detection_sensitivity, max_detection_sensitivity,
-                 min_motion_contour_area, fps, camera_number, recording_mode):
+                 min_motion_contour_area, fps, camera_number, recording_mode, detection_resolution=0,
+                 motion_detector="Frame difference", detection_zones=(), threaded_capture=False,
+                 emergency_buff_max_memory=1024, emergency_buff_compression="None", emergency_queue_size=240,
+                 emergency_overflow_policy="Block", recording_name_suffix="", frame_source=None,
+                 standard_recording_segment_frames=0, standard_queue_size=240, standard_overflow_policy="Block",
+                 emergency_recording_mode="Encode", idle_detection_interval=1, detection_change_threshold=8,
+                 emergency_buff_length=None):
         # logging
         self.__logger = logging.getLogger("security_camera_logger")
 
         # user's config
         self.min_motion_contour_area = min_motion_contour_area
         self.emergency_buff_size = emergency_buff_size
+        # pre-roll of emergency clips in seconds, independent of the rate frames actually arrive at
+        self.emergency_buff_length = emergency_buff_length if emergency_buff_length is not None \
+            else emergency_buff_size / fps
         self.detection_sensitivity = detection_sensitivity
         self.max_detection_sensitivity = max_detection_sensitivity
         self.camera_number = camera_number
         self.recording_mode = recording_mode
+        self.detection_resolution = detection_resolution
+        self.motion_detector = motion_detector
+        self.detection_zones = detection_zones
+        self.recording_name_suffix = recording_name_suffix
 
         # standard recording vars
         self.standard_recording_started = False
-        self.__standard_recording_output = None
+        self.__standard_recording_writer = None
+        self.__last_standard_recording_stats = None
         self.standard_recording_fps = fps
+        self.standard_recording_segment_frames = standard_recording_segment_frames
+        self.standard_queue_size = standard_queue_size
+        self.standard_overflow_policy = standard_overflow_policy
 
         # emergency recording vars
         self.emergency_recording_started = False
-        self.__emergency_recording_output = None
-        self.__emergency_recording_buffered_frames = deque()
+        self.__emergency_recording_writer = None
+        self.__last_emergency_recording_stats = None
+        self.emergency_queue_size = emergency_queue_size
+        self.emergency_overflow_policy = emergency_overflow_policy
+        # emergency buffer isn't used if emergency clips are assembled from segments
+        self.__emergency_recording_buffered_frames = None
+        if emergency_recording_mode != "Segments":
+            self.__emergency_recording_buffered_frames = create_frame_buffer(emergency_buff_size,
+                                                                             emergency_buff_max_memory * 1024 ** 2,
+                                                                             emergency_buff_compression)
         self.emergency_recording_fps = fps
         self.emergency_file_path = None
+        self.emergency_recording_mode = emergency_recording_mode
+
+        # finished segments of standard recording, emergency clips are assembled from them in segments mode
+        self.__recording_segments = deque(maxlen=256)
+        self.__recording_segments_condition = Condition()
+        self.__emergency_event_time = None
+        self.__emergency_clip_assembler = EmergencyClipAssembler()
+        self.__emergency_clip_threads = {}
+
+        # capture config, camera device is used if no other source is given
+        self.__capture = DeviceFrameSource(self.camera_number) if frame_source is None else frame_source
 
-        # capture config
         # todo: test h264 lib for linux
         if system() == "Windows":
             self.__fourcc_codec = cv2.VideoWriter_fourcc(*"h264")
-            self.__capture = cv2.VideoCapture(self.camera_number, cv2.CAP_DSHOW)
             self.__logger.info("using h264 video codec on Windows")
         else:
             self.__fourcc_codec = cv2.VideoWriter_fourcc(*"mp4v")
-            self.__capture = cv2.VideoCapture(self.camera_number)
             self.__logger.info("using mp4v video codec on Linux")
-            
-        HIGH_RES = 10000
-        self.__capture.set(cv2.CAP_PROP_FRAME_WIDTH, HIGH_RES)
-        self.__capture.set(cv2.CAP_PROP_FRAME_HEIGHT, HIGH_RES)
-        
-        self.frame_dimensions = (int(self.__capture.get(cv2.CAP_PROP_FRAME_WIDTH)), 
-                                 int(self.__capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
 
-        self.__capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_dimensions[0])
-        self.__capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_dimensions[1])
+        self.frame_dimensions = self.__capture.frame_dimensions
+
+        # preallocate emergency buffer
+        if self.__capture.is_opened() and self.__emergency_recording_buffered_frames is not None:
+            self.__emergency_recording_buffered_frames.allocate((self.frame_dimensions[1], self.frame_dimensions[0], 3))
+            self.__logger.info(f"emergency buffer: {self.__emergency_recording_buffered_frames.capacity} of "
+                               f"{int(emergency_buff_size)} frames, "
+                               f"{self.__emergency_recording_buffered_frames.nbytes / 1024 ** 2:.0f} MB allocated, "
+                               f"compression: {emergency_buff_compression}, "
+                               f"memory ceiling: {emergency_buff_max_memory} MB")
+
+        # frame in recording mode shared by the emergency buffer and both writers, as (Frame, mode, image)
+        self.__recording_frame = (None, None, None)
 
         # frames
-        self.__frame_old = None
-        self.__frame_new = None
+        self.__frame_old = Frame(None)
+        self.__frame_new = Frame(None)
+        self.__frame_sequence_number = 0
+        self.frame_capture_time = None
+
+        # captured frames are published to consumers running in other threads, e.g. preview
+        self.frame_bus = FrameBus()
+        self.no_failed_refreshes = 0
+
+        # frames read by the capture thread, buffers are pinned until their images are no longer referenced
+        self.__last_captured_sequence_number = 0
+        self.__frame_capture_thread = None
+
+        if threaded_capture and self.__capture.is_opened():
+            self.__frame_capture_thread = FrameCaptureThread(self.__capture,
+                                                             (self.frame_dimensions[1], self.frame_dimensions[0], 3),
+                                                             on_frame_captured=self.put_timestamp)
+            self.__frame_capture_thread.start()
+
+        # motion detection
+        self.__motion_detector = create_motion_detector(self.motion_detector)
+        self.__motion_detector_name = self.motion_detector
+        self.__last_detected_sequence_number = None
+        self.__motion_analysis = None
+        self.__motion_analysis_lock = Lock()
+        # analyses of recent frames, frames taken from the frame bus are drawn with their own analysis
+        self.__recent_motion_analyses = deque(maxlen=8)
+
+        # adaptive detection cadence, detection runs on every frame for 2 s after motion
+        self.idle_detection_interval = idle_detection_interval
+        self.detection_change_threshold = detection_change_threshold
+        self.__detection_cadence = DetectionCadence(idle_detection_interval, detection_change_threshold,
+                                                    active_frames=max(1, int(2 * fps)))
+        self.detection_due = True
+
+        # detection zones, the timestamp is always excluded
+        self.timestamp_zone = {"type": "exclude", "points": [[0, 0], [420, 0], [420, 50], [0, 50]]}
+        self.__detection_mask = None
+        self.__detection_mask_key = None
+        self.__thumbnail_mask = None
+        self.__thumbnail_mask_key = None
 
         # modes
         self.frame_modes = {"Motion rectangles": self.get_frame_with_rectangles,
@@ -75,8 +174,33 @@ class Camera:
                             "Standard": self.get_standard_frame,
                             "Edges": self.get_edged_frame}
 
+        # modes registered with register_frame_mode
+        self.__render_chains = {}
+        for name in self.frame_mode_names:
+            self.frame_modes.setdefault(name, partial(self.render_mode, name))
+
+    @classmethod
+    def register_frame_mode(cls, name, step):
+        """
+        Registers new frame mode, available to all cameras created afterwards.
+        :param step RenderStep or chain of registered modes, e.g. "Gray -> Sharpened"
+        :return: None
+        """
+
+        register_render_step(name, step)
+
+        if name not in cls.frame_mode_names:
+            cls.frame_mode_names += (name,)
+
     def validate_capture(self):
-        return self.__capture.isOpened()
+        return self.__capture.is_opened()
+
+    def get_frame_sequence_number(self):
+        """
+        :return: sequence number of the new frame, 0 if no frame was read yet
+        """
+
+        return self.__frame_new.sequence_number
 
     def destroy(self):
         """
@@ -86,43 +210,147 @@ class Camera:
 
         self.stop_emergency_recording()
         self.stop_standard_recording()
+
+        if self.__frame_capture_thread is not None:
+            self.__frame_capture_thread.stop()
+            self.__frame_capture_thread.join(timeout=1)
+
         self.__capture.release()
-        cv2.destroyAllWindows()
+        if self.__emergency_recording_buffered_frames is not None:
+            self.__emergency_recording_buffered_frames.close()
+        self.frame_bus.close()
+
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            # OpenCV built without GUI support
+            pass
 
         self.__logger.info("recordings stopped, camera destroyed")
 
-    def refresh_frame(self):
+    def refresh_frame(self, publish=True):
         """
-        Grabs new frame from the capture, updates emergency buffer.
+        Grabs new frame from the capture. Emergency buffer is updated separately, after the recording frame is
+        rendered.
+        :param publish if False, the frame isn't published on the frame bus until publish_frame is called, e.g. after
+        motion detection, so that subscribers draw its motion
         :return: True on success, False on fail
         """
 
-        self.__frame_old = self.__frame_new
-        try:
-            success, self.__frame_new = self.__capture.read()
-            cv2.putText(self.__frame_new, str(datetime.now())[:-7], (15, 35),
-                        cv2.FONT_HERSHEY_PLAIN, 2.2, (255, 255, 255), 2, cv2.LINE_AA)
-        except cv2.error:
-            self.__logger.exception("failed to refresh frame")
-            return False
+        if self.__frame_capture_thread is not None:
+            success = self.refresh_frame_from_capture_thread()
+        else:
+            self.__frame_old = self.__frame_new
+            self.__frame_sequence_number += 1
+            try:
+                success, image = self.__capture.read()
+                self.frame_capture_time = time.time()
+                if success:
+                    self.put_timestamp(image, self.frame_capture_time)
+                self.__frame_new = Frame(image if success else None, self.__frame_sequence_number,
+                                         self.frame_capture_time)
+            except cv2.error:
+                self.__logger.exception("failed to refresh frame")
+                return False
 
         if success:
-            if not self.emergency_recording_started:
-                self.update_emergency_buffer()
+            if publish:
+                self.publish_frame()
+            self.update_detection_cadence()
         else:
+            self.no_failed_refreshes += 1
             self.__logger.warning("failed to refresh frame")
 
         return success
 
+    def publish_frame(self):
+        """
+        Publishes the new frame on the frame bus.
+        :return: None
+        """
+
+        if self.validate_frame(self.__frame_new):
+            self.frame_bus.publish(self.__frame_new)
+
+    def update_detection_cadence(self):
+        """
+        Decides if motion detection should run on the new frame, see DetectionCadence.
+        :return: None
+        """
+
+        detection_cadence = self.__detection_cadence
+        detection_cadence.idle_interval = self.idle_detection_interval
+        detection_cadence.change_threshold = self.detection_change_threshold
+
+        detection_cadence.add_frame()
+        self.detection_due = detection_cadence.is_detection_due(self.get_detection_thumbnail)
+
+    def get_detection_thumbnail(self):
+        """
+        :return: thumbnail of the new frame used to score changes of the scene, None if detection runs on every frame
+        """
+
+        if self.idle_detection_interval <= 1 or not self.validate_frame(self.__frame_new):
+            return None
+
+        def render_thumbnail(frame):
+            thumbnail = self.__detection_cadence.get_thumbnail(frame.image)
+            thumbnail_scale = thumbnail.shape[1] / frame.image.shape[1]
+
+            # cells with the timestamp or outside detection zones don't count, rasterised mask is eroded, so that
+            # cells partially covered by excluded zones don't count either
+            mask_key = (thumbnail.shape, self.detection_zones)
+            if self.__thumbnail_mask is None or self.__thumbnail_mask_key != mask_key:
+                self.__thumbnail_mask = cv2.erode(create_detection_mask(thumbnail.shape, thumbnail_scale,
+                                                                        [self.timestamp_zone] +
+                                                                        list(self.detection_zones)),
+                                                  np.ones((3, 3), np.uint8), borderType=cv2.BORDER_REPLICATE)
+                self.__thumbnail_mask_key = (thumbnail.shape, copy.deepcopy(self.detection_zones))
+
+            return cv2.bitwise_and(thumbnail, self.__thumbnail_mask)
+
+        return self.__frame_new.get_derived("thumbnail", render_thumbnail)
+
+    def refresh_frame_from_capture_thread(self):
+        """
+        Takes the next unseen frame read by the capture thread. Its buffer is released once the image is no longer
+        referenced by the camera, writers and buffers, so the frame is passed on without copying.
+        :return: True on success, False if no frame was captured in time
+        """
+
+        captured_frame = self.__frame_capture_thread.acquire_next_frame(self.__last_captured_sequence_number,
+                                                                        timeout=1)
+
+        if captured_frame is None:
+            return False
+
+        self.__last_captured_sequence_number = captured_frame.sequence_number
+        self.__frame_sequence_number += 1
+
+        frame = Frame(captured_frame.image, self.__frame_sequence_number, captured_frame.capture_time)
+        weakref.finalize(frame.image, self.__frame_capture_thread.release_frame, captured_frame)
+
+        self.__frame_old = self.__frame_new
+        self.__frame_new = frame
+        self.frame_capture_time = captured_frame.capture_time
+
+        return True
+
+    @staticmethod
+    def put_timestamp(frame, capture_time):
+        cv2.putText(frame, str(datetime.fromtimestamp(capture_time))[:19], (15, 35),
+                    cv2.FONT_HERSHEY_PLAIN, 2.2, (255, 255, 255), 2, cv2.LINE_AA)
+
     def update_emergency_buffer(self):
-        frame_to_save = np.copy(self.get_frame_with_mode(self.recording_mode))
+        if self.emergency_recording_mode == "Segments":
+            return
+
+        frame_to_save = self.render_recording_frame()
 
         if self.validate_frame(frame_to_save):
+            self.__emergency_recording_buffered_frames.set_capacity(self.emergency_buff_size)
             self.__emergency_recording_buffered_frames.append(frame_to_save)
 
-            if len(self.__emergency_recording_buffered_frames) > self.emergency_buff_size:
-                self.__emergency_recording_buffered_frames.popleft()
-
     def show_window(self):
         """
         Shows standard OpenCV window with the captured frame.
@@ -130,181 +358,400 @@ class Camera:
         """
 
         if self.validate_frame(self.__frame_new):
-            cv2.imshow("Capture", self.__frame_new)
+            cv2.imshow("Capture", self.__frame_new.image)
 
-    def get_motion_contours(self):
+    def get_motion_analysis(self):
         """
-        Looks for contours around places in the new frame that are different from the old frame.
-        :return: list with contours on success, None if frames are corrupted / doesn't exist
+        Feeds the new frame to the motion detection engine and looks for contours of detected motion. Analysis is
+        performed once per captured frame, subsequent calls for the same frame return cached result.
+        :return: MotionAnalysis on success, None if frames are corrupted / doesn't exist
         """
 
-        if not self.validate_frame(self.__frame_new) or not self.validate_frame(self.__frame_old):
-            # self.__logger.warning("get_motion_contours() - failed to validate frames")
-            return None
+        with self.__motion_analysis_lock:
+            sequence_number = self.__frame_sequence_number
 
-        kernel = (3, 3)
+            if self.__motion_analysis is not None and self.__motion_analysis.sequence_number == sequence_number:
+                return self.__motion_analysis
 
-        # hide timestamps
-        frame_old = self.__frame_old.copy()
-        cv2.rectangle(frame_old, (0, 0), (420, 50), (0, 0, 0), -1)
-        frame_new = self.__frame_new.copy()
-        cv2.rectangle(frame_new, (0, 0), (420, 50), (0, 0, 0), -1)
+            frame_old = self.__frame_old
+            frame_new = self.__frame_new
 
-        # get difference between frames
+            if not self.validate_frame(frame_new) or not self.validate_frame(frame_old):
+                # self.__logger.warning("get_motion_analysis() - failed to validate frames")
+                return None
+
+            if self.__motion_detector_name != self.motion_detector:
+                self.__motion_detector = create_motion_detector(self.motion_detector)
+                self.__motion_detector_name = self.motion_detector
+                self.__last_detected_sequence_number = None
+                self.__logger.info(f"using {self.motion_detector} motion detector")
 
-        gray_diff = cv2.absdiff(self.convert_frame_to_gray_gb(frame_new, kernel),
-                                self.convert_frame_to_gray_gb(frame_old, kernel))
+            detection_scale = self.get_detection_scale(frame_new.image)
 
-        binary_diff = (
-            cv2.threshold(gray_diff,
-                          thresh=(self.max_detection_sensitivity + 1 - self.detection_sensitivity) *
-                          self.max_detection_sensitivity,
-                          maxval=255,
-                          type=cv2.THRESH_BINARY))[1]
+            # engines comparing consecutive frames need the old frame if it hasn't been analysed
+            if self.__motion_detector.requires_previous_frame and \
+                    self.__last_detected_sequence_number != sequence_number - 1:
+                self.__motion_detector.update(self.get_detection_frame(frame_old, detection_scale))
 
-        binary_diff = cv2.dilate(binary_diff, np.ones(kernel), 1)
+            motion_mask = self.__motion_detector.detect(
+                self.get_detection_frame(frame_new, detection_scale),
+                threshold=(self.max_detection_sensitivity + 1 - self.detection_sensitivity) *
+                self.max_detection_sensitivity)
+            self.__last_detected_sequence_number = sequence_number
+
+            if motion_mask is None:
+                return None
 
-        return cv2.findContours(binary_diff, mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_SIMPLE)[0]
+            cv2.bitwise_and(motion_mask, self.get_detection_mask(motion_mask.shape, detection_scale), dst=motion_mask)
+
+            self.__motion_analysis = MotionAnalysis(sequence_number, motion_mask, detection_scale)
+            self.__recent_motion_analyses.append(self.__motion_analysis)
+            self.__detection_cadence.add_detection(self.get_detection_thumbnail(),
+                                                   self.__motion_analysis.has_motion(self.min_motion_contour_area))
+
+            return self.__motion_analysis
+
+    def get_cached_motion_analysis(self, sequence_number):
+        """
+        Looks up analysis of a recent frame, motion detection never runs here.
+        :return: MotionAnalysis of the frame, None if the frame wasn't analysed
+        """
+
+        with self.__motion_analysis_lock:
+            for motion_analysis in reversed(self.__recent_motion_analyses):
+                if motion_analysis.sequence_number == sequence_number:
+                    return motion_analysis
+
+        return None
+
+    def get_motion_contours(self):
+        """
+        Looks for contours around places in the new frame that are different from the old frame.
+        :return: list with contours on success, None if frames are corrupted / doesn't exist
+        """
+
+        motion_analysis = self.get_motion_analysis()
+
+        if motion_analysis is not None:
+            return motion_analysis.contours
 
     def get_motion_contours_with_min_area(self):
         """
         Looks for contours with minimum area around places in the new frame that are different from the old frame.
         :return: list with contours on success, None if frames are corrupted / doesn't exist
         """
-        contours = self.get_motion_contours()
 
-        if contours is not None:
-            return tuple(filter(lambda c: cv2.contourArea(c) >= self.min_motion_contour_area, [c for c in contours]))
+        motion_analysis = self.get_motion_analysis()
+
+        if motion_analysis is not None:
+            return motion_analysis.get_contours_with_min_area(self.min_motion_contour_area)
 
     def search_for_motion(self):
         """
-        Checks if list of contours contains contour with min specified area.
-        :return: True if contour with min specified area exists, False otherwise
+        Checks if motion blob with min specified area exists.
+        :return: True if motion blob with min specified area exists, False otherwise
         """
 
-        contours = self.get_motion_contours_with_min_area()
+        motion_analysis = self.get_motion_analysis()
 
-        if contours is not None:
-            return len(contours) > 0
+        if motion_analysis is not None:
+            return motion_analysis.has_motion(self.min_motion_contour_area)
 
         return False
 
     def write_standard_recording_frame(self):
         """
-        Writes frame into the standard output video file. If output doesn't exist, creates a new one.
+        Passes frame to the standard recording writer. If standard recording isn't running, starts the writer, which
+        opens a new output file for each segment.
         :return: None
         """
 
         if not self.standard_recording_started:
-            '''create new standard output'''
-
             self.standard_recording_started = True
-            current_recording_time = time.strftime("%d-%m-%Y_%H-%M-%S", time.localtime(time.time()))
-            recording_file_path = f"../recordings/standard/{current_recording_time}.mkv"
-            self.__standard_recording_output = cv2.VideoWriter(recording_file_path, self.__fourcc_codec,
-                                                               self.standard_recording_fps, self.frame_dimensions)
+            self.__standard_recording_writer = StandardRecordingWriter(self.open_standard_recording_output,
+                                                                       self.standard_queue_size,
+                                                                       self.standard_overflow_policy,
+                                                                       int(self.standard_recording_segment_frames),
+                                                                       self.add_recording_segment)
+            self.__standard_recording_writer.start()
 
-            self.__logger.info("standard recording started")
+        frame_to_save = self.render_recording_frame()
 
-        frame_to_save = np.copy(self.get_frame_with_mode(self.recording_mode))
+        if self.validate_frame(frame_to_save):
+            self.__standard_recording_writer.put(frame_to_save, self.frame_capture_time)
 
-        if self.validate_frame(frame_to_save) and self.__standard_recording_output is not None:
-            try:
-                self.__standard_recording_output.write(frame_to_save)
-            except cv2.error:
-                self.__logger.exception("failed to write frame to standard recording")
+    def open_standard_recording_output(self, capture_time):
+        """
+        Creates new standard output, called by the standard recording writer for each segment. Segment is named after
+        capture time of its first frame.
+        :return: tuple (cv2.VideoWriter, file path)
+        """
+
+        recording_file_path = self.get_recording_base_path("../recordings/standard", capture_time, (".mkv",)) + ".mkv"
+        standard_recording_output = cv2.VideoWriter(recording_file_path, self.__fourcc_codec,
+                                                    self.standard_recording_fps, self.frame_dimensions)
+
+        self.__logger.info("standard recording started")
 
-    def save_emergency_recording_frame(self, controller):
+        return standard_recording_output, recording_file_path
+
+    def get_recording_base_path(self, directory, recording_time, extensions):
+        """
+        Recordings are named after their time with milliseconds, e.g. a segment opened by an early rollover in the same
+        second as the previous one. If the name is taken anyway, a counter is added to it.
+        :param extensions extensions of files, which may be created for the recording
+        :return: path of the recording without extension
         """
-        Appends frame into emergency buffer and runs thread that writes buffered frames into emergency output video
-        file. If output doesn't exist, creates a new one.
+
+        recording_name = time.strftime("%d-%m-%Y_%H-%M-%S", time.localtime(recording_time)) + \
+            f"-{int(recording_time * 1000) % 1000:03d}" + self.recording_name_suffix
+        base_path = f"{directory}/{recording_name}"
+        counter = 1
+
+        while any(os.path.exists(base_path + extension) for extension in extensions):
+            base_path = f"{directory}/{recording_name}_{counter}"
+            counter += 1
+
+        return base_path
+
+    def add_recording_segment(self, segment):
+        with self.__recording_segments_condition:
+            self.__recording_segments.append(segment)
+            self.__recording_segments_condition.notify_all()
+
+    def save_emergency_recording_frame(self):
+        """
+        Passes frame to the emergency recording writer. If emergency recording isn't running, creates a new output and
+        starts the writer, which writes buffered frames first. In segments mode, only the time of the event is noted.
         :return: None
         """
 
+        if self.emergency_recording_mode == "Segments":
+            if not self.emergency_recording_started:
+                self.emergency_recording_started = True
+                self.__emergency_event_time = self.frame_capture_time or time.time()
+                self.__logger.info("emergency recording started")
+            return
+
         if not self.emergency_recording_started:
             '''create new emergency output'''
 
             self.emergency_recording_started = True
-            current_recording_time = time.strftime("%d-%m-%Y_%H-%M-%S", time.localtime(time.time()))
-            self.emergency_file_path = f"../recordings/emergency/{current_recording_time}.mkv"
-            self.__emergency_recording_output = cv2.VideoWriter(self.emergency_file_path, self.__fourcc_codec,
-                                                                self.emergency_recording_fps, self.frame_dimensions)
+            self.emergency_file_path = self.get_recording_base_path("../recordings/emergency", time.time(),
+                                                                    (".mkv",)) + ".mkv"
+            emergency_recording_output = cv2.VideoWriter(self.emergency_file_path, self.__fourcc_codec,
+                                                         self.emergency_recording_fps, self.frame_dimensions)
 
-            emergency_buff_write_thread = Thread(target=self.write_emergency_buffer, args=(controller,))
-            emergency_buff_write_thread.start()
+            self.__emergency_recording_writer = EmergencyRecordingWriter(emergency_recording_output,
+                                                                         self.__emergency_recording_buffered_frames,
+                                                                         self.emergency_queue_size,
+                                                                         self.emergency_overflow_policy)
+            self.__emergency_recording_writer.start()
 
             self.__logger.info("emergency recording started")
 
-        frame_to_save = np.copy(self.get_frame_with_mode(self.recording_mode))
-        self.__emergency_recording_buffered_frames.append(frame_to_save)
+        frame_to_save = self.render_recording_frame()
+
+        if self.validate_frame(frame_to_save):
+            self.__emergency_recording_writer.put(frame_to_save)
+        else:
+            self.__logger.warning("save_emergency_recording_frame() - failed to validate frame")
 
-    def write_emergency_buffer(self, controller):
+    def get_emergency_recording_stats(self):
         """
-        Writes buffered frames into emergency output file.
-        :return: None
+        :return: dict with queue depth, number of written and dropped frames of the running or the last emergency
+        recording, None if there was no emergency recording
         """
 
-        if self.__emergency_recording_output is not None:
-            while (self.emergency_recording_started or len(self.__emergency_recording_buffered_frames) > 0) and \
-                    controller.surveillance_running:
-                if len(self.__emergency_recording_buffered_frames) > 0:
-                    frame_to_save = self.__emergency_recording_buffered_frames.popleft()
-                    if self.validate_frame(frame_to_save):
-                        try:
-                            self.__emergency_recording_output.write(frame_to_save)
-                        except cv2.error:
-                            self.__logger.exception("failed to write frame to emergency recording")
-                    else:
-                        self.__logger.warning("write_emergency_buffer() - failed to validate frames")
+        if self.__emergency_recording_writer is not None:
+            return self.__emergency_recording_writer.get_stats()
+
+        return self.__last_emergency_recording_stats
 
-                sleep(0.0001)
+    def get_standard_recording_stats(self):
+        """
+        :return: dict with queue depth, number of written and dropped frames and number of segments of the running or
+        the last standard recording, None if there was no standard recording
+        """
+
+        if self.__standard_recording_writer is not None:
+            return self.__standard_recording_writer.get_stats()
+
+        return self.__last_standard_recording_stats
+
+    def get_stats(self):
+        """
+        :return: dict with counters of captured, dropped and written frames and depths of buffers and queues
+        """
+
+        stats = {"refreshed_frames": self.__frame_sequence_number,
+                 "detections": self.__detection_cadence.no_detections,
+                 "detection_rate": round(self.__detection_cadence.detection_rate, 3),
+                 "failed_refreshes": self.no_failed_refreshes,
+                 "emergency_buffer_frames": len(self.__emergency_recording_buffered_frames or ()),
+                 "emergency_buffer_dropped_frames": getattr(self.__emergency_recording_buffered_frames,
+                                                            "no_dropped_frames", 0)}
+
+        capture_thread = self.__frame_capture_thread
+        if capture_thread is not None:
+            stats.update({"captured_frames": capture_thread.no_captured_frames,
+                          "capture_dropped_frames": capture_thread.no_dropped_frames,
+                          "capture_failed_reads": capture_thread.no_failed_reads})
+        else:
+            stats["captured_frames"] = self.__frame_sequence_number - self.no_failed_refreshes
+
+        standard_recording_stats = self.get_standard_recording_stats()
+        if standard_recording_stats is not None:
+            stats.update({f"standard_recording_{name}": value for name, value in standard_recording_stats.items()})
+
+        emergency_recording_stats = self.get_emergency_recording_stats()
+        if emergency_recording_stats is not None:
+            stats.update({f"emergency_recording_{name}": value for name, value in emergency_recording_stats.items()})
+
+        stats.update({f"frame_bus_{name}": value for name, value in self.frame_bus.get_stats().items()})
+
+        return stats
 
     def stop_standard_recording(self):
         """
-        Stops standard recording and releases standard recording output.
+        Stops standard recording, waits until queued frames are written and releases standard recording output.
         :return: None
         """
 
         self.standard_recording_started = False
-        if self.__standard_recording_output is not None:
-            try:
-                self.__standard_recording_output.release()
+        if self.__standard_recording_writer is not None:
+            released = self.__standard_recording_writer.stop(drain=True)
+            self.__last_standard_recording_stats = self.__standard_recording_writer.get_stats()
+            self.__standard_recording_writer = None
+
+            if released:
                 self.__logger.info("standard recording stopped")
-            except cv2.error:
-                self.__logger.exception("failed to release standard recording output")
 
     def stop_emergency_recording(self):
         """
-        Stops emergency recording and releases emergency recording output.
+        Stops emergency recording, waits until queued frames are written and releases emergency recording output.
+        In segments mode, the clip is assembled in the background, see wait_for_emergency_clip.
         :return: file path of emergency recording that just finished on success, None on fail
         """
 
         self.emergency_recording_started = False
-        if self.__emergency_recording_output is not None:
-            try:
-                self.__emergency_recording_output.release()
-                self.__logger.info("emergency recording stopped")
-            except cv2.error:
-                self.__logger.exception("failed to release emergency recording output")
+
+        if self.emergency_recording_mode == "Segments":
+            return self.start_emergency_clip_assembly()
+
+        if self.__emergency_recording_writer is not None:
+            # writer finishes writing queued frames before the output is released
+            released = self.__emergency_recording_writer.stop(drain=True)
+            self.__last_emergency_recording_stats = self.__emergency_recording_writer.get_stats()
+            self.__emergency_recording_writer = None
+
+            if not released:
                 return None
 
+            self.__logger.info("emergency recording stopped")
+
+        return self.emergency_file_path
+
+    def start_emergency_clip_assembly(self):
+        """
+        Starts assembling emergency clip covering the pre-roll (emergency buffer length) before the event until now.
+        Current segment of standard recording is finished as soon as the current frame is written.
+        :return: file path of the clip, None if no event was noted
+        """
+
+        if self.__emergency_event_time is None:
+            return None
+
+        event_time = self.__emergency_event_time
+        end_time = self.frame_capture_time or time.time()
+        start_time = event_time - self.emergency_buff_length
+        self.__emergency_event_time = None
+
+        # clips being assembled don't have files yet, so their paths are checked too
+        base_path = self.get_recording_base_path("../recordings/emergency", event_time, (".mkv", ".ffconcat"))
+        while self.__emergency_clip_assembler.get_clip_path(base_path) in self.__emergency_clip_threads:
+            base_path += "_1"
+        self.emergency_file_path = self.__emergency_clip_assembler.get_clip_path(base_path)
+
+        standard_recording_writer = self.__standard_recording_writer
+        if standard_recording_writer is not None:
+            standard_recording_writer.request_rollover(end_time)
+
+        # threads of clips no one waited for
+        for clip_path, (clip_thread, _) in list(self.__emergency_clip_threads.items()):
+            if not clip_thread.is_alive():
+                del self.__emergency_clip_threads[clip_path]
+
+        clip_thread = Thread(target=self.assemble_emergency_clip, args=(start_time, end_time, self.emergency_file_path),
+                             daemon=True)
+        self.__emergency_clip_threads[self.emergency_file_path] = (clip_thread, [])
+        clip_thread.start()
+
+        self.__logger.info("emergency recording stopped, assembling clip from segments")
+
         return self.emergency_file_path
 
-    def save_frame_to_img(self, path):
+    def assemble_emergency_clip(self, start_time, end_time, clip_path):
+        """
+        Waits until the segments covering the clip are finished and assembles the clip from them.
+        :return: None
+        """
+
+        segment_length = self.standard_recording_segment_frames / self.standard_recording_fps
+        timeout = 2 * segment_length + 5
+
+        with self.__recording_segments_condition:
+            finished = self.__recording_segments_condition.wait_for(
+                lambda: any(segment.end_time >= end_time for segment in self.__recording_segments), timeout)
+            segments = list(self.__recording_segments)
+
+        if not finished:
+            self.__logger.warning(f"segments covering emergency clip weren't finished in time: {clip_path}")
+
+        assembled_clip_path = self.__emergency_clip_assembler.assemble(segments, start_time, end_time, clip_path)
+        self.__emergency_clip_threads[clip_path][1].append(assembled_clip_path)
+
+    def wait_for_emergency_clip(self, clip_path, timeout=None):
+        """
+        Waits until assembling of the emergency clip finishes, in segments mode.
+        :return: path of the assembled clip (playlist if segments couldn't be concatenated), None on fail
+        """
+
+        clip_thread, result = self.__emergency_clip_threads.get(clip_path, (None, [clip_path]))
+
+        if clip_thread is not None:
+            clip_thread.join(timeout)
+
+            if not clip_thread.is_alive():
+                self.__emergency_clip_threads.pop(clip_path, None)
+
+        return result[0] if result else None
+
+    def save_frame_to_img(self, path, frame=None):
         """
         Saves frame to specified location.
+        :param frame Frame taken from the frame bus, the new frame if not given
         :return: None
         """
 
-        frame_to_save = np.copy(self.__frame_new)
-        if self.validate_frame(frame_to_save):
-            cv2.imwrite(path, frame_to_save)
+        frame = self.__frame_new if frame is None else frame
+
+        if self.validate_frame(frame):
+            cv2.imwrite(path, frame.image)
         else:
             self.__logger.warning("save_frame_to_img() - failed to validate frame")
 
     @staticmethod
     def validate_frame(frame):
-        return frame is not None and str(frame) != "None"
+        """
+        :param frame Frame or image
+        :return: True if the frame holds an image, False otherwise
+        """
+
+        if isinstance(frame, Frame):
+            return frame.valid
+
+        return isinstance(frame, np.ndarray) and frame.size > 0
 
     @classmethod
     def get_number_of_camera_devices(cls):
@@ -326,102 +773,243 @@ class Camera:
 
     '''Methods below are used to get and convert frames'''
 
-    def get_standard_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            return frame
-        else:
-            self.__logger.warning("get_standard_frame() - failed to validate frame")
+    def render_frame(self, mode, render_function, frame=None):
+        """
+        Renders the new frame in given mode. Each mode is rendered at most once per frame, returned image is shared,
+        so it must be copied before it's modified.
+        :param render_function function taking the Frame and returning rendered image
+        :param frame Frame taken from the frame bus, the new frame if not given
+        :return: read-only image, None if the frame is corrupted / doesn't exist
+        """
+
+        frame = self.__frame_new if frame is None else frame
 
-    def get_sharpened_frame(self):
-        frame = np.copy(self.__frame_new)
         if self.validate_frame(frame):
-            kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+            return frame.render(mode, render_function)
 
-            return cv2.filter2D(src=frame, ddepth=-1, kernel=kernel)
-        else:
-            self.__logger.warning("get_sharpened_frame() - failed to validate frame")
+        self.__logger.warning(f"render_frame() - failed to validate frame, mode: {mode}")
+
+    def render_recording_frame(self):
+        """
+        Renders the new frame in recording mode once per frame. The same read-only image is passed to the emergency
+        buffer, the standard recording writer and the emergency recording writer.
+        :return: read-only image, None if the frame is corrupted / doesn't exist
+        """
+
+        frame, mode, image = self.__recording_frame
+        frame_new = self.__frame_new
+
+        if frame is not frame_new or mode != self.recording_mode or image is None:
+            mode = self.recording_mode
+            image = self.get_frame_with_mode(mode)
+
+            if self.__frame_capture_thread is not None and image is not None and image is frame_new.image:
+                # frames queued by writers would keep the capture buffer pinned, they get a copy instead
+                image = Frame.get_read_only_view(image.copy())
+
+            self.__recording_frame = (frame_new, mode, image)
+
+        return image
+
+    def render_mode(self, mode, frame=None):
+        """
+        Renders the new frame in given mode or chain of modes, e.g. "Gray -> Sharpened -> Motion rectangles".
+        :param frame Frame taken from the frame bus, the new frame if not given
+        :return: read-only image, None if the frame is corrupted / doesn't exist or the mode is unknown
+        """
+
+        render_chain = self.__render_chains.get(mode)
+
+        if render_chain is None:
+            render_chain = create_render_chain(mode)
+
+            if render_chain is None:
+                self.__logger.warning(f"unknown render mode: {mode}")
+                return None
+
+            self.__render_chains[mode] = render_chain
+
+        frame_old = self.__frame_old
+
+        if frame is not None and frame is not self.__frame_new:
+            # the camera has already moved on to a newer frame, motion is drawn on the frame itself
+            frame_old = frame
+
+        key = mode
+
+        if render_chain.draws_motion:
+            # motion is drawn with the analysis of the scheduled detection, rendering never runs detection, the image
+            # is rendered again once the frame is analysed
+            rendered_frame = self.__frame_new if frame is None else frame
+            sequence_number = rendered_frame.sequence_number if rendered_frame is not None else None
+            key = (mode, self.get_cached_motion_analysis(sequence_number) is not None)
+
+        return self.render_frame(key, lambda frame_new: render_chain.render(frame_new, frame_old, self), frame)
+
+    def mode_draws_motion(self, mode):
+        """
+        :return: True if motion is drawn in the mode, so the frame has to be analysed before it's rendered
+        """
+
+        render_chain = self.__render_chains.get(mode) or create_render_chain(mode)
+
+        return render_chain is not None and render_chain.draws_motion
+
+    def get_standard_frame(self):
+        return self.render_mode("Standard")
+
+    def get_sharpened_frame(self):
+        return self.render_mode("Sharpened")
 
     def get_gray_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            pseudo_color_frame = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2BGR)
-            return pseudo_color_frame
-        else:
-            self.__logger.warning("get_gray_frame() - failed to validate frame")
+        return self.render_mode("Gray")
 
     def get_mexican_hat_effect_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            kernel = np.array([[0, 0, -1, 0, 0], [0, -1, -2, -1, 0], [-1, -2, 16, -2, -1],
-                               [0, -1, -2, -1, 0], [0, 0, -1, 0, 0]])
-
-            return cv2.filter2D(src=frame, ddepth=-1, kernel=kernel)
-        else:
-            self.__logger.warning("get_mexican_hat_effect_frame() - failed to validate frame")
+        return self.render_mode("Mexican hat")
 
     def get_high_contrast_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            kernel = (3, 3)
-            gray_frame = self.convert_frame_to_gray_gb(frame, kernel)
-            equ_frame = cv2.equalizeHist(gray_frame)
-
-            return cv2.cvtColor(equ_frame, cv2.COLOR_GRAY2BGR)
-        else:
-            self.__logger.warning("get_high_contrast_frame() - failed to validate frame")
+        return self.render_mode("High contrast")
 
     def get_frame_with_contours(self):
-        contours = self.get_motion_contours_with_min_area()
+        return self.render_mode("Motion contours")
+
+    def draw_motion_contours(self, image, sequence_number=None):
+        """
+        Draws contours of motion with min area on the image.
+        :param sequence_number sequence number of the frame whose motion is drawn, the new frame if not given
+        :return: the image
+        """
+
+        # motion isn't drawn on frames skipped by the detection cadence, they have no analysis
+        motion_analysis = self.get_cached_motion_analysis(self.__frame_sequence_number if sequence_number is None
+                                                          else sequence_number)
 
-        if self.validate_frame(self.__frame_old):
-            frame = self.__frame_old.copy()
-            if contours is not None:
-                return cv2.drawContours(frame, contours, -1, (0, 255, 0), 3)
-            else:
-                return frame
+        if motion_analysis is not None:
+            contours = motion_analysis.get_contours_with_min_area(self.min_motion_contour_area)
+            cv2.drawContours(image, contours, -1, (0, 255, 0), 3)
+
+        return image
 
     def get_frame_with_rectangles(self):
-        contours = self.get_motion_contours_with_min_area()
+        return self.render_mode("Motion rectangles")
+
+    def draw_motion_rectangles(self, image, sequence_number=None):
+        """
+        Draws rectangles around motion with min area on the image.
+        :param sequence_number sequence number of the frame whose motion is drawn, the new frame if not given
+        :return: the image
+        """
+
+        # motion isn't drawn on frames skipped by the detection cadence, they have no analysis
+        motion_analysis = self.get_cached_motion_analysis(self.__frame_sequence_number if sequence_number is None
+                                                          else sequence_number)
+
+        if motion_analysis is not None:
+            bounding_boxes = motion_analysis.get_bounding_boxes_with_min_area(self.min_motion_contour_area)
 
-        if self.validate_frame(self.__frame_old):
-            frame = self.__frame_old.copy()
+            if len(bounding_boxes) > 0:
+                cv2.polylines(image, self.get_rectangle_polygons(bounding_boxes, margin=5), isClosed=True,
+                              color=(0, 255, 0), thickness=2)
+
+        return image
+
+    @staticmethod
+    def get_rectangle_polygons(bounding_boxes, margin):
+        """
+        Converts bounding boxes into closed polygons, so that all of them can be drawn in one call.
+        :param bounding_boxes array with (x, y, w, h) rows
+        :return: int32 array of shape (n, 4, 2)
+        """
 
-            if contours is not None:
-                for contour in contours:
-                    (x, y, w, h) = cv2.boundingRect(contour)
-                    cv2.rectangle(frame, (x - 5, y - 5), (x + w + 5, y + h + 5), (0, 255, 0), 2)
+        x1 = bounding_boxes[:, 0] - margin
+        y1 = bounding_boxes[:, 1] - margin
+        x2 = bounding_boxes[:, 0] + bounding_boxes[:, 2] + margin
+        y2 = bounding_boxes[:, 1] + bounding_boxes[:, 3] + margin
 
-            return frame
+        return np.stack((np.stack((x1, y1), axis=1), np.stack((x2, y1), axis=1),
+                         np.stack((x2, y2), axis=1), np.stack((x1, y2), axis=1)), axis=1).astype(np.int32)
 
     def get_negative_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            return cv2.bitwise_not(frame)
-        else:
-            self.__logger.warning("get_negative_frame() - failed to validate frame")
+        return self.render_mode("Negative")
 
     def get_edged_frame(self):
-        frame = np.copy(self.__frame_new)
-        if self.validate_frame(frame):
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray_frame, threshold1=50, threshold2=150)
-            return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        else:
-            self.__logger.warning("get_edged_frame() - failed to validate frame")
+        return self.render_mode("Edges")
 
-    def get_frame_with_mode(self, mode):
-        try:
-            frame = self.frame_modes[mode]()
-        except KeyError:
-            frame = self.get_standard_frame()
+    def get_frame_with_mode(self, mode, frame=None):
+        """
+        :param mode name of the mode or chain of modes, unknown modes are rendered as standard frame
+        :param frame Frame taken from the frame bus, the new frame if not given
+        :return: read-only image, None if the frame is corrupted / doesn't exist
+        """
+
+        get_frame = self.frame_modes.get(mode)
+
+        if get_frame is None:
+            # chains are added to modes, unknown modes are looked up only once
+            get_frame = partial(self.render_mode, mode) if create_render_chain(mode) is not None \
+                else self.get_standard_frame
+            self.frame_modes[mode] = get_frame
+
+        if frame is not None:
+            return self.render_mode(mode if get_frame != self.get_standard_frame else "Standard", frame)
+
+        return get_frame()
+
+    def get_detection_scale(self, frame):
+        """
+        Calculates scale of the detection proxy, so that its height doesn't exceed detection resolution.
+        :return: scale in range (0, 1], 1 if detection runs in full resolution
+        """
+
+        if not self.detection_resolution or frame.shape[0] <= self.detection_resolution:
+            return 1
+
+        return self.detection_resolution / frame.shape[0]
+
+    @staticmethod
+    def get_detection_proxy(frame, detection_scale):
+        """
+        Prepares downscaled version of the frame used for detection.
+        :return: detection proxy frame, the frame itself if detection runs in full resolution
+        """
+
+        if detection_scale < 1:
+            return cv2.resize(frame, None, fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_LINEAR)
 
         return frame
 
+    def get_detection_frame(self, frame, detection_scale):
+        """
+        Returns blurred gray detection proxy of the frame, it is computed only once per frame and scale.
+        :return: read-only gray image
+        """
+
+        if detection_scale == 1:
+            return frame.blurred_gray
+
+        return frame.get_derived(("detection", detection_scale),
+                                 lambda f: self.convert_frame_to_gray_gb(self.get_detection_proxy(f.image,
+                                                                                                  detection_scale),
+                                                                         (3, 3)))
+
+    def get_detection_mask(self, mask_shape, detection_scale):
+        """
+        Returns mask of places where motion is detected. Mask is rasterised only when detection zones, detection
+        scale or frame size change. Timestamp is always excluded.
+        :return: uint8 mask with 255 where motion is detected and 0 elsewhere
+        """
+
+        mask_key = (mask_shape, detection_scale, self.detection_zones)
+
+        if self.__detection_mask is None or self.__detection_mask_key != mask_key:
+            self.__detection_mask = create_detection_mask(mask_shape, detection_scale,
+                                                          [self.timestamp_zone] + list(self.detection_zones))
+            self.__detection_mask_key = (mask_shape, detection_scale, copy.deepcopy(self.detection_zones))
+
+        return self.__detection_mask
+
     @staticmethod
     def convert_frame_to_gray_gb(frame, kernel):
-        frame = np.copy(frame)
         if Camera.validate_frame(frame):
             return cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), kernel, sigmaX=0)
         else:
@@ -429,7 +1017,6 @@ class Camera:
 
     @staticmethod
     def convert_frame_to_rgb(frame):
-        frame = np.copy(frame)
         if Camera.validate_frame(frame):
             return cv2.cvtColor(src=frame, code=cv2.COLOR_BGR2RGB)
         # else:
@@ -0,0 +1,181 @@
+import logging
+import time
+import multiprocessing
+from threading import Thread, Event
+
+
+def run_camera_worker(camera_settings, stop_event, log_file_path=None):
+    """
+    Runs surveillance of a single camera, target of the worker process. Settings file is loaded as in the main process,
+    camera settings override its values.
+    :param camera_settings dict with camera_number and other controller settings of the camera
+    :param stop_event multiprocessing.Event, surveillance stops when it's set
+    :return: None
+    """
+
+    logging.basicConfig(filename=log_file_path, level=logging.DEBUG,
+                        format="[%(asctime)s]:[%(levelname)s]:[%(processName)s]:[%(module)s]:%(message)s")
+
+    # imported in the worker, so that the supervisor doesn't depend on the controller
+    from controller import Controller
+
+    controller = Controller(camera_settings)
+
+    def wait_for_stop():
+        stop_event.wait()
+        controller.stop_surveillance()
+
+    Thread(target=wait_for_stop, daemon=True).start()
+    controller.start_surveillance()
+
+
+class CameraWorker:
+    """
+    Process running surveillance of a single camera together with its restart state.
+    """
+
+    def __init__(self, camera_settings):
+        self.camera_settings = camera_settings
+        self.camera_number = camera_settings["camera_number"]
+        self.process = None
+        self.start_time = None
+        self.no_restarts = 0
+        self.restart_time = None
+
+
+class CameraSupervisor:
+    """
+    Class responsible for running cameras in worker processes, one process per camera, each with its own detection,
+    emergency buffer and recordings. Workers that exit while surveillance is running are restarted with increasing
+    delay.
+    """
+
+    def __init__(self, cameras_settings, restart_delay=1, max_restart_delay=60, stable_run_time=60,
+                 worker_target=None, start_method="spawn"):
+        """
+        :param cameras_settings list of dicts with camera_number and other controller settings of each camera
+        :param restart_delay delay in seconds before the first restart, it doubles with each consecutive crash
+        :param stable_run_time worker running longer than that (in seconds) is considered stable, restart delay resets
+        :param worker_target function run by worker processes, run_camera_worker by default
+        """
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_run_time = stable_run_time
+
+        self.__workers = [CameraWorker(camera_settings) for camera_settings in cameras_settings]
+        self.__worker_target = run_camera_worker if worker_target is None else worker_target
+        self.__context = multiprocessing.get_context(start_method)
+        self.__stop_event = None
+        self.__monitor_thread = None
+        self.__running = False
+        self.__monitor_stop_event = Event()
+
+        self.__log_file_path = next((handler.baseFilename for handler in logging.getLogger().handlers
+                                     if isinstance(handler, logging.FileHandler)), None)
+
+    def start(self):
+        """
+        Starts worker processes and the thread monitoring them.
+        :return: None
+        """
+
+        if self.__running:
+            return
+
+        self.__running = True
+        self.__stop_event = self.__context.Event()
+        self.__monitor_stop_event.clear()
+
+        for worker in self.__workers:
+            self.start_worker(worker)
+
+        self.__monitor_thread = Thread(target=self.monitor_workers, daemon=True)
+        self.__monitor_thread.start()
+
+        self.__logger.info(f"camera supervisor started {len(self.__workers)} workers")
+
+    def start_worker(self, worker):
+        worker.process = self.__context.Process(target=self.__worker_target,
+                                                args=(worker.camera_settings, self.__stop_event,
+                                                      self.__log_file_path),
+                                                name=f"camera-{worker.camera_number}", daemon=True)
+        worker.process.start()
+        worker.start_time = time.monotonic()
+        worker.restart_time = None
+
+        self.__logger.info(f"camera {worker.camera_number} worker started, pid: {worker.process.pid}")
+
+    def monitor_workers(self, interval=0.5):
+        """
+        Restarts workers that exited while the supervisor is running. Restart delay doubles with each consecutive
+        crash, up to max restart delay.
+        :return: None
+        """
+
+        while not self.__monitor_stop_event.is_set():
+            for worker in self.__workers:
+                if worker.process is None or worker.process.is_alive() or self.__monitor_stop_event.is_set():
+                    continue
+
+                if worker.restart_time is None:
+                    run_time = time.monotonic() - worker.start_time
+                    if run_time >= self.stable_run_time:
+                        worker.no_restarts = 0
+
+                    delay = min(self.restart_delay * 2 ** worker.no_restarts, self.max_restart_delay)
+                    worker.restart_time = time.monotonic() + delay
+
+                    self.__logger.error(f"camera {worker.camera_number} worker exited with code "
+                                        f"{worker.process.exitcode}, restarting in {delay} s")
+
+                elif time.monotonic() >= worker.restart_time:
+                    worker.no_restarts += 1
+                    self.start_worker(worker)
+
+            self.__monitor_stop_event.wait(interval)
+
+    def stop(self, timeout=5):
+        """
+        Stops surveillance in all workers and waits until they finish, workers that don't finish in time are
+        terminated.
+        :return: None
+        """
+
+        if not self.__running:
+            return
+
+        self.__running = False
+        self.__monitor_stop_event.set()
+        self.__stop_event.set()
+
+        if self.__monitor_thread is not None:
+            self.__monitor_thread.join()
+
+        deadline = time.monotonic() + timeout
+
+        for worker in self.__workers:
+            if worker.process is None:
+                continue
+
+            worker.process.join(max(0, deadline - time.monotonic()))
+
+            if worker.process.is_alive():
+                self.__logger.warning(f"camera {worker.camera_number} worker didn't stop in time, terminating")
+                worker.process.terminate()
+                worker.process.join()
+
+        self.__logger.info("camera supervisor stopped")
+
+    def get_status(self):
+        """
+        :return: list of dicts with camera number, state and number of restarts of each worker
+        """
+
+        return [{"camera_number": worker.camera_number,
+                 "alive": worker.process is not None and worker.process.is_alive(),
+                 "restarts": worker.no_restarts}
+                for worker in self.__workers]
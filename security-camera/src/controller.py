@@ -1,20 +1,32 @@
-import cv2
+import os
 import time
 import logging
 import gdrive
-from threading import Thread
+from threading import Thread, Lock, Event
 from camera import Camera
+from frame_sources import create_frame_source
+from metrics import Metrics, MetricsServer
+from loop_scheduler import LoopScheduler
+from camera_supervisor import CameraSupervisor
+from shared_frame_transport import SharedFrameTransport, get_preview_transport_name
 from notifications import NotificationSender
 from stats_data_manager import StatsDataManager
+from emergency_clips import EmergencyClipAssembler
 from controller_settings_manager import ControllerSettingsManager
 
 
 class Controller:
     """
-    Class responsible for controlling the camera, surveillance logic.
+    Class responsible for controlling the camera, surveillance logic. Cameras listed in the cameras setting are run by
+    controllers in worker processes, the main controller supervises them.
     """
 
-    def __init__(self):
+    def __init__(self, camera_settings=None):
+        """
+        :param camera_settings dict with camera_number and other settings overriding the settings file, passed to
+        controllers running in camera worker processes
+        """
+
         # logging
         self.__logger = logging.getLogger("security_camera_logger")
 
@@ -22,7 +34,6 @@ class Controller:
         self.emergency_recording_length = None
         self.standard_recording_length = None
         self.emergency_buff_length = None
-        self.refresh_time = None
         self.detection_sensitivity = None
         self.max_detection_sensitivity = None
         self.min_motion_rectangle_area = None
@@ -38,6 +49,25 @@ class Controller:
         self.gdrive_folder_id = None
         self.disable_preview = None
         self.recording_mode = None
+        self.detection_resolution = None
+        self.motion_detector = None
+        self.detection_zones = None
+        self.threaded_capture = None
+        self.emergency_buff_max_memory = None
+        self.emergency_buff_compression = None
+        self.emergency_queue_size = None
+        self.emergency_overflow_policy = None
+        self.standard_queue_size = None
+        self.standard_overflow_policy = None
+        self.emergency_recording_mode = None
+        self.recording_segment_length = None
+        self.idle_detection_interval = None
+        self.detection_change_threshold = None
+        self.cameras = None
+        self.frame_source = None
+        self.metrics_port = None
+        self.metrics_snapshot_interval = None
+        self.preview_fps = None
 
         # other
         self.no_emergency_recording_frames = None
@@ -45,82 +75,476 @@ class Controller:
         self.no_emergency_buff_frames = None
         self.cam = None
         self.surveillance_running = False
+        # surveillance loops run one at a time, each one is stopped by its own event
+        self.__surveillance_lock = Lock()
+        self.__surveillance_stopped = None
         self.notification_sender = NotificationSender()
         self.__stats_data_manager = None
         self.controller_settings_manager = ControllerSettingsManager("../config/controller_settings.json")
         self.collect_stats = False
+        self.emergency_recording_stats = None
+        self.is_camera_worker = camera_settings is not None
+        self.__camera_supervisor = None
+        self.__camera_workers_lock = Lock()
+        self.__preview_transport = None
+        self.__preview_readers = {}
+        self.__preview_readers_lock = Lock()
+        self.metrics = Metrics()
+        self.loop_scheduler = None
+        self.__preview_subscription = None
+        self.__metrics_server = None
 
         # loading settings from json
         self.controller_settings_manager.load_settings(self)
+        if self.is_camera_worker:
+            self.apply_camera_settings(camera_settings)
         self.update_parameters()
 
+        self.metrics.labels = {"camera": str(self.camera_number)}
+        self.metrics.register_gauge("camera", lambda: None if self.cam is None else self.cam.get_stats())
+        self.metrics.register_gauge("loop", lambda: None if self.loop_scheduler is None else
+                                    self.loop_scheduler.get_stats())
+        self.metrics.register_gauge("camera_workers_alive", lambda: sum(status["alive"] for status in
+                                                                        self.get_camera_workers_status()))
+
+    def apply_camera_settings(self, camera_settings):
+        """
+        Overrides settings with the settings of the camera run by the worker process. Only settings saved in the
+        settings file can be overridden, other attributes of the controller are never touched. Files saved by the worker
+        are suffixed with the camera number, so that cameras don't overwrite each other's files.
+        :return: None
+        """
+
+        setting_names = set(self.controller_settings_manager.get_settings_data(self)) - {"cameras"}
+
+        for name, value in camera_settings.items():
+            if name in setting_names:
+                setattr(self, name, value)
+            else:
+                self.__logger.warning(f"unknown camera setting skipped: {name}")
+
+        self.notification_sender.tmp_img_path += f"_camera{self.camera_number}"
+
+    def get_worker_cameras_settings(self):
+        """
+        :return: list of settings of cameras that are run in worker processes, the camera of this controller excluded
+        """
+
+        cameras_settings = []
+
+        for camera_settings in self.cameras:
+            if "camera_number" not in camera_settings:
+                self.__logger.warning(f"camera skipped - camera_number is missing: {camera_settings}")
+            elif int(camera_settings["camera_number"]) == int(self.camera_number):
+                self.__logger.warning(f"camera {self.camera_number} skipped - it is run by the main controller")
+            else:
+                cameras_settings.append(camera_settings)
+
+        return cameras_settings
+
+    def start_camera_workers(self):
+        """
+        Starts worker processes of cameras from the cameras setting, if they aren't running yet.
+        :return: None
+        """
+
+        if self.is_camera_worker:
+            return
+
+        with self.__camera_workers_lock:
+            if self.__camera_supervisor is None:
+                cameras_settings = self.get_worker_cameras_settings()
+
+                if not cameras_settings:
+                    return
+
+                self.__camera_supervisor = CameraSupervisor(cameras_settings)
+
+            self.__camera_supervisor.start()
+
+    def stop_camera_workers(self):
+        with self.__camera_workers_lock:
+            if self.__camera_supervisor is not None:
+                self.__camera_supervisor.stop()
+                self.__camera_supervisor = None
+
+    def restart_camera_workers(self):
+        """
+        Restarts camera workers, so that they load new settings. Workers are restarted only if surveillance is running.
+        :return: None
+        """
+
+        if self.surveillance_running:
+            self.stop_camera_workers()
+            self.start_camera_workers()
+
+    def get_camera_workers_status(self):
+        """
+        :return: list of dicts with camera number, state and number of restarts of each camera worker
+        """
+
+        if self.__camera_supervisor is None:
+            return []
+
+        return self.__camera_supervisor.get_status()
+
+    def open_preview_transport(self):
+        """
+        Creates shared memory block, through which the worker passes preview frames to the main process.
+        :return: None
+        """
+
+        if not self.is_camera_worker or self.__preview_transport is not None:
+            return
+
+        try:
+            self.__preview_transport = SharedFrameTransport(
+                get_preview_transport_name(self.camera_number, os.getppid()),
+                (self.cam.frame_dimensions[1], self.cam.frame_dimensions[0], 3), create=True)
+        except OSError:
+            self.__logger.exception("failed to create preview transport")
+
+    def close_preview_transport(self):
+        if self.__preview_transport is not None:
+            self.__preview_transport.close()
+            self.__preview_transport = None
+
+    def publish_preview_frame(self):
+        """
+        Renders the frame in preview mode requested by the main process and writes it to the preview transport.
+        Nothing is rendered if the preview isn't watched.
+        :return: None
+        """
+
+        if self.__preview_transport is None or self.disable_preview:
+            return
+
+        mode_index = self.__preview_transport.get_request()
+
+        if mode_index is None:
+            return
+
+        mode = Camera.frame_mode_names[mode_index] if 0 <= mode_index < len(Camera.frame_mode_names) else "Standard"
+        frame = self.cam.get_frame_with_mode(mode)
+
+        if self.cam.validate_frame(frame):
+            self.__preview_transport.write(frame)
+
+    def get_preview_frame(self, camera_number, mode, last_sequence_number=0):
+        """
+        Returns frame of the camera in given mode. Frames of cameras run by workers are read from shared memory.
+        :param last_sequence_number sequence number of the last previewed frame of the camera, 0 to get any frame
+        :return: tuple (sequence number, frame), frame is None if there is no new frame
+        """
+
+        if camera_number == self.camera_number:
+            cam = self.cam
+            preview_subscription = self.__preview_subscription
+
+            if cam is None or preview_subscription is None:
+                return last_sequence_number, None
+
+            frame = preview_subscription.get_latest(timeout=0)
+
+            if frame is None and last_sequence_number == 0:
+                # other mode is previewed, the latest frame is rendered again
+                frame = cam.frame_bus.get_latest_frame()
+
+            if frame is None or frame.sequence_number == last_sequence_number:
+                return last_sequence_number, None
+
+            return frame.sequence_number, cam.get_frame_with_mode(mode, frame)
+
+        with self.__preview_readers_lock:
+            frame = self.read_preview_frame(camera_number, mode)
+            preview_reader = self.__preview_readers.get(camera_number)
+
+            return (last_sequence_number if preview_reader is None else preview_reader["sequence_number"]), frame
+
+    def read_preview_frame(self, camera_number, mode):
+        """
+        Reads frame of the camera run by a worker, must be called with preview readers lock acquired.
+        :return: frame, None if there is no new frame
+        """
+
+        preview_reader = self.__preview_readers.get(camera_number)
+
+        if preview_reader is None:
+            try:
+                preview_reader = {"transport": SharedFrameTransport(get_preview_transport_name(camera_number,
+                                                                                               os.getpid())),
+                                  "sequence_number": 0, "frame": None, "read_time": time.monotonic()}
+            except FileNotFoundError:
+                # worker hasn't opened its camera yet
+                return None
+
+            self.__preview_readers[camera_number] = preview_reader
+
+        transport = preview_reader["transport"]
+        transport.request(Camera.frame_mode_names.index(mode) if mode in Camera.frame_mode_names else -1)
+        preview_reader["sequence_number"], frame = transport.read(preview_reader["sequence_number"],
+                                                                  out=preview_reader["frame"])
+
+        if frame is not None:
+            preview_reader["frame"] = frame
+            preview_reader["read_time"] = time.monotonic()
+        elif time.monotonic() - preview_reader["read_time"] > 2:
+            # worker may have been restarted with a new shared memory block
+            self.__preview_readers.pop(camera_number)
+            transport.close()
+
+        return frame
+
+    def close_preview_readers(self):
+        with self.__preview_readers_lock:
+            for preview_reader in self.__preview_readers.values():
+                preview_reader["transport"].close()
+
+            self.__preview_readers.clear()
+
+    def start_metrics_server(self):
+        """
+        Starts HTTP server with metrics on localhost, on metrics port offset by the camera number, so that camera
+        workers don't collide. Server runs until the application exits.
+        :return: None
+        """
+
+        if self.__metrics_server is not None or not self.metrics_port:
+            return
+
+        self.__metrics_server = MetricsServer(self.metrics, int(self.metrics_port) + int(self.camera_number))
+        if not self.__metrics_server.start():
+            self.__metrics_server = None
+
+    def send_system_notification(self, cam, frame):
+        """
+        Saves snapshot of the frame and sends system notification with it, called in a notification thread.
+        :return: None
+        """
+
+        snapshot_path = self.notification_sender.tmp_img_path + ".jpg"
+        cam.save_frame_to_img(snapshot_path, frame)
+        self.notification_sender.send_system_notification(snapshot_path, "Security Camera", "Motion detected!")
+
+    def send_email_notification(self, cam, frame):
+        """
+        Saves snapshot of the frame and sends email notification with it, called in a notification thread. Snapshot
+        has its own file, so that it isn't overwritten by the system notification thread.
+        :return: None
+        """
+
+        snapshot_path = self.notification_sender.tmp_img_path + "_email"
+        cam.save_frame_to_img(snapshot_path + ".jpg", frame)
+        self.notification_sender.send_email_notification(self.email_recipient, "motion detected!", "check recordings",
+                                                         snapshot_path)
+
+    def save_metrics_snapshot(self):
+        if self.__stats_data_manager is not None:
+            self.__stats_data_manager.insert_metrics_snapshot(self.camera_number, self.metrics.get_snapshot())
+
+    def upload_emergency_recording(self, cam, file_path):
+        """
+        Uploads emergency recording to Google Drive, waits until the clip is assembled in segments mode.
+        :return: None
+        """
+
+        file_path = cam.wait_for_emergency_clip(file_path, timeout=60)
+
+        if file_path is None:
+            return
+
+        if EmergencyClipAssembler.is_playlist(file_path):
+            # playlist references local segment files, a remote copy of it would be useless
+            self.__logger.warning(f"emergency clip couldn't be concatenated, playlist isn't uploaded: {file_path}")
+            return
+
+        gdrive.upload_to_cloud(file_path, (file_path.split("/"))[-1], self.gdrive_folder_id)
+
+    def stop_surveillance(self):
+        """
+        Signals the surveillance loop to stop, it destroys the camera in its thread, so that the caller doesn't wait
+        for writers to finish.
+        :return: None
+        """
+
+        self.surveillance_running = False
+
+        if self.__surveillance_stopped is not None:
+            self.__surveillance_stopped.set()
+
     def update_parameters(self):
         if self.cam is not None:
             self.cam.emergency_buff_size = self.emergency_buff_length * self.fps
+            self.cam.emergency_buff_length = self.emergency_buff_length
             self.cam.detection_sensitivity = self.detection_sensitivity
             self.cam.max_detection_sensitivity = self.max_detection_sensitivity
             self.cam.min_motion_contour_area = self.min_motion_rectangle_area
             self.cam.standard_recording_fps = self.cam.emergency_recording_fps = self.fps
             self.cam.camera_number = self.camera_number
+            self.cam.emergency_queue_size = self.emergency_queue_size
+            self.cam.emergency_overflow_policy = self.emergency_overflow_policy
+            self.cam.standard_queue_size = self.standard_queue_size
+            self.cam.standard_overflow_policy = self.standard_overflow_policy
+            self.cam.idle_detection_interval = self.idle_detection_interval
+            self.cam.detection_change_threshold = self.detection_change_threshold
+            self.cam.detection_resolution = self.detection_resolution
+            self.cam.motion_detector = self.motion_detector
+            self.cam.detection_zones = self.detection_zones
+
+        if self.loop_scheduler is not None:
+            self.loop_scheduler.fps = self.fps
 
         self.no_emergency_recording_frames = self.emergency_recording_length * self.fps
         self.no_standard_recording_frames = self.standard_recording_length * self.fps
         self.no_emergency_buff_frames = self.emergency_buff_length * self.fps
 
+        # emergency clips are assembled from short segments of standard recording
+        if self.emergency_recording_mode == "Segments":
+            self.no_standard_recording_frames = self.recording_segment_length * self.fps
+
+        if self.cam is not None:
+            # applied from the next standard recording
+            self.cam.standard_recording_segment_frames = self.no_standard_recording_frames
+
     def start_surveillance(self):
         """
-        Opens the camera and starts surveillance.
+        Opens the camera and runs surveillance until it's stopped. If the previous surveillance loop is still
+        finishing, waits until it destroys its camera.
         :return: None
         """
 
+        stopped = self.__surveillance_stopped = Event()
         self.surveillance_running = True
+
+        with self.__surveillance_lock:
+            if not stopped.is_set():
+                self.run_surveillance_loop(stopped)
+
+    def run_surveillance_loop(self, stopped):
+        """
+        Opens the camera and runs surveillance loop, the camera is destroyed when the loop finishes.
+        :param stopped threading.Event set when surveillance should stop
+        :return: None
+        """
+
         emergency_recording_loaded_frames = 0
-        standard_recording_loaded_frames = 0
         last_system_notification_time = None
         last_email_notification_time = None
+        next_metrics_snapshot_time = time.monotonic() + (self.metrics_snapshot_interval or 0)
+        metrics = self.metrics
 
-        if self.collect_stats:
+        if self.collect_stats or self.metrics_snapshot_interval:
             self.__stats_data_manager = StatsDataManager("../data/stats.sqlite")
+
+        if self.collect_stats:
             self.__stats_data_manager.insert_surveillance_log("ON")
 
-        while self.cam is None or not self.cam.validate_capture():
+        self.start_metrics_server()
+        self.start_camera_workers()
+
+        while not stopped.is_set() and (self.cam is None or not self.cam.validate_capture()):
             # opening input stream failed - try again
 
             self.__logger.warning("failed to open input stream")
 
+            # camera that failed to open is destroyed, so that its threads and buffers don't pile up
+            if self.cam is not None:
+                self.cam.destroy()
+
             self.cam = Camera(emergency_buff_size=self.no_emergency_buff_frames,
+                              emergency_buff_length=self.emergency_buff_length,
                               detection_sensitivity=self.detection_sensitivity,
                               max_detection_sensitivity=self.max_detection_sensitivity,
                               min_motion_contour_area=self.min_motion_rectangle_area,
                               fps=self.fps,
                               camera_number=self.camera_number,
-                              recording_mode=self.recording_mode)
+                              recording_mode=self.recording_mode,
+                              detection_resolution=self.detection_resolution,
+                              motion_detector=self.motion_detector,
+                              detection_zones=self.detection_zones,
+                              threaded_capture=self.threaded_capture,
+                              emergency_buff_max_memory=self.emergency_buff_max_memory,
+                              emergency_buff_compression=self.emergency_buff_compression,
+                              emergency_queue_size=self.emergency_queue_size,
+                              emergency_overflow_policy=self.emergency_overflow_policy,
+                              recording_name_suffix=f"_camera{self.camera_number}" if self.is_camera_worker else "",
+                              frame_source=create_frame_source(self.frame_source, self.camera_number),
+                              standard_recording_segment_frames=self.no_standard_recording_frames,
+                              standard_queue_size=self.standard_queue_size,
+                              standard_overflow_policy=self.standard_overflow_policy,
+                              emergency_recording_mode=self.emergency_recording_mode,
+                              idle_detection_interval=self.idle_detection_interval,
+                              detection_change_threshold=self.detection_change_threshold)
 
             time.sleep(0.005)
 
-        while self.surveillance_running and self.cam is not None:
-            self.cam.refresh_frame()
+        self.open_preview_transport()
+
+        # local preview consumes frames from the frame bus in the preview thread
+        if self.cam is not None:
+            self.__preview_subscription = self.cam.frame_bus.subscribe("preview", max_fps=self.preview_fps)
+
+        loop_scheduler = self.loop_scheduler = LoopScheduler(self.fps)
+
+        while not stopped.is_set() and self.cam is not None:
+            loop_start_time = time.perf_counter()
+
+            with metrics.time_stage("refresh"):
+                # frame is published after detection, so that preview draws its motion
+                refreshed = self.cam.refresh_frame(publish=False)
+
+            refresh_end_time = time.perf_counter()
+            if refreshed:
+                loop_scheduler.add_frame(refresh_end_time)
+
+            # containers are opened with the rate frames actually arrive at, so that recordings play in real time
+            self.cam.standard_recording_fps = self.cam.emergency_recording_fps = loop_scheduler.get_recording_fps()
+
+            # detection runs before rendering, so that motion modes draw its analysis, during emergency recording it's
+            # needed only for them, detection runs sparsely while the scene is idle, see DetectionCadence
+            motion_detected = False
+            if refreshed and loop_scheduler.should_detect_motion() and self.cam.detection_due and \
+                    (not self.cam.emergency_recording_started or self.cam.mode_draws_motion(self.cam.recording_mode)):
+                with metrics.time_stage("detection"):
+                    motion_detected = self.cam.search_for_motion()
+
+            if refreshed:
+                self.cam.publish_frame()
+
+            # frame in recording mode is rendered once and shared by the emergency buffer and recording writers
+            if refreshed:
+                with metrics.time_stage("render"):
+                    self.cam.render_recording_frame()
+
+                if not self.cam.emergency_recording_started:
+                    with metrics.time_stage("emergency_buffer"):
+                        self.cam.update_emergency_buffer()
+
+            # preview is the first work shed under load
+            if self.__preview_subscription is not None:
+                self.__preview_subscription.max_fps = (self.preview_fps or 30) / loop_scheduler.preview_stride
+
+            if loop_scheduler.should_render_preview():
+                with metrics.time_stage("preview"):
+                    self.publish_preview_frame()
 
             '''standard recording'''
-            # refresh frame and save it to standard recording
-            if self.save_recordings_locally:
-                if self.surveillance_running:
+            # pass frame to standard recording, writer starts a new file every no_standard_recording_frames frames,
+            # frames are written only once, also when refreshing timed out
+            if refreshed and self.save_recordings_locally and not stopped.is_set():
+                with metrics.time_stage("standard_recording"):
                     self.cam.write_standard_recording_frame()
-                    standard_recording_loaded_frames += 1
-
-                # check if standard recording should end
-                if standard_recording_loaded_frames >= self.no_standard_recording_frames:
-                    self.cam.stop_standard_recording()
-                    standard_recording_loaded_frames = 0
 
             '''emergency recording'''
             # check if emergency recording should start
             if self.cam is not None and not self.cam.emergency_recording_started:
-                if self.cam.search_for_motion() and self.surveillance_running:
+                if motion_detected and not stopped.is_set():
                     self.__logger.info("motion detected")
+                    metrics.increment("motion_events")
 
                     if self.save_recordings_locally:
-                        self.cam.save_emergency_recording_frame(controller=self)
+                        with metrics.time_stage("emergency_recording"):
+                            self.cam.save_emergency_recording_frame()
 
                     if self.collect_stats:
                         self.__stats_data_manager.insert_motion_detection_data()
@@ -130,11 +554,9 @@ class Controller:
                                                            self.min_delay_between_system_notifications):
                         last_system_notification_time = time.time()
 
-                        self.cam.save_frame_to_img(self.notification_sender.tmp_img_path + ".jpg")
-
-                        system_notification_thread = Thread(target=self.notification_sender.send_system_notification,
-                                                            args=[self.notification_sender.tmp_img_path + ".jpg",
-                                                                  "Security Camera", "Motion detected!"])
+                        # snapshot is saved in the notification thread from the immutable frame of the frame bus
+                        system_notification_thread = Thread(target=self.send_system_notification,
+                                                            args=[self.cam, self.cam.frame_bus.get_latest_frame()])
 
                         system_notification_thread.start()
                         self.__logger.info("system notification thread started")
@@ -147,10 +569,8 @@ class Controller:
                                                           self.min_delay_between_email_notifications):
                         last_email_notification_time = time.time()
 
-                        email_notification_thread = Thread(target=self.notification_sender.send_email_notification,
-                                                           args=[self.email_recipient, "motion detected!",
-                                                                 "check recordings",
-                                                                 self.notification_sender.tmp_img_path])
+                        email_notification_thread = Thread(target=self.send_email_notification,
+                                                           args=[self.cam, self.cam.frame_bus.get_latest_frame()])
 
                         email_notification_thread.start()
                         self.__logger.info("email notification thread started")
@@ -161,30 +581,53 @@ class Controller:
             # check if emergency recording should end
             elif self.save_recordings_locally and \
                     emergency_recording_loaded_frames >= self.no_emergency_recording_frames:
-                file_path = self.cam.stop_emergency_recording()
+                with metrics.time_stage("emergency_recording_stop"):
+                    file_path = self.cam.stop_emergency_recording()
                 emergency_recording_loaded_frames = 0
+                metrics.increment("emergency_recordings")
+
+                self.emergency_recording_stats = self.cam.get_emergency_recording_stats()
+                if self.emergency_recording_stats is not None and self.emergency_recording_stats["dropped_frames"] > 0:
+                    self.__logger.warning(f"emergency recording dropped frames: {self.emergency_recording_stats}")
 
                 if self.upload_to_gdrive and file_path is not None:
-                    gdrive_upload_thread = Thread(target=gdrive.upload_to_cloud,
-                                                  args=[file_path, (file_path.split("/"))[-1], self.gdrive_folder_id])
+                    gdrive_upload_thread = Thread(target=self.upload_emergency_recording, args=[self.cam, file_path])
 
                     gdrive_upload_thread.start()
                     self.__logger.info("gdrive thread started")
 
-            # save frame to emergency recording
-            elif self.save_recordings_locally:
-                self.cam.save_emergency_recording_frame(controller=self)
+            # save new frame to emergency recording
+            elif refreshed and self.save_recordings_locally:
+                with metrics.time_stage("emergency_recording"):
+                    self.cam.save_emergency_recording_frame()
                 emergency_recording_loaded_frames += 1
 
-            # delay
-            if cv2.waitKey(self.refresh_time) == ord("q"):
-                self.cam.destroy()
-                self.surveillance_running = False
+            if self.metrics_snapshot_interval and time.monotonic() >= next_metrics_snapshot_time:
+                next_metrics_snapshot_time = time.monotonic() + self.metrics_snapshot_interval
+                self.save_metrics_snapshot()
+
+            loop_end_time = time.perf_counter()
+            metrics.observe("loop", loop_end_time - loop_start_time)
 
+            # waiting for the frame isn't counted as load
+            loop_scheduler.end_iteration(loop_end_time - refresh_end_time)
+
+        self.__preview_subscription = None
+        self.close_preview_transport()
+
+        # writers are drained here, not in the thread that stopped surveillance
+        if self.cam is not None:
+            self.cam.destroy()
         self.cam = None
 
-        if self.collect_stats and self.__stats_data_manager is not None:
-            self.__stats_data_manager.insert_surveillance_log("OFF")
+        # surveillance may have been started again while this loop was finishing
+        if not self.surveillance_running:
+            self.stop_camera_workers()
+            self.close_preview_readers()
+
+        if self.__stats_data_manager is not None:
+            if self.collect_stats:
+                self.__stats_data_manager.insert_surveillance_log("OFF")
             self.__stats_data_manager.close_connection()
 
         self.__stats_data_manager = None
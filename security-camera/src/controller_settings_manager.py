@@ -23,7 +23,6 @@ class ControllerSettingsManager:
         controller.emergency_recording_length = settings_data["emergency_recording_length"]
         controller.standard_recording_length = settings_data["standard_recording_length"]
         controller.emergency_buff_length = settings_data["emergency_buff_length"]
-        controller.refresh_time = settings_data["refresh_time"]
         controller.detection_sensitivity = settings_data["detection_sensitivity"]
         controller.max_detection_sensitivity = settings_data["max_detection_sensitivity"]
         controller.min_motion_rectangle_area = settings_data["min_motion_rectangle_area"]
@@ -39,13 +38,36 @@ class ControllerSettingsManager:
         controller.gdrive_folder_id = settings_data["gdrive_folder_id"]
         controller.disable_preview = settings_data["disable_preview"]
         controller.recording_mode = settings_data["recording_mode"]
+        controller.detection_resolution = settings_data.get("detection_resolution", 0)
+        controller.motion_detector = settings_data.get("motion_detector", "Frame difference")
+        controller.detection_zones = settings_data.get("detection_zones", [])
+        controller.threaded_capture = settings_data.get("threaded_capture", False)
+        controller.emergency_buff_max_memory = settings_data.get("emergency_buff_max_memory", 1024)
+        controller.emergency_buff_compression = settings_data.get("emergency_buff_compression", "None")
+        controller.emergency_queue_size = settings_data.get("emergency_queue_size", 240)
+        controller.emergency_overflow_policy = settings_data.get("emergency_overflow_policy", "Block")
+        controller.standard_queue_size = settings_data.get("standard_queue_size", 240)
+        controller.standard_overflow_policy = settings_data.get("standard_overflow_policy", "Block")
+        controller.emergency_recording_mode = settings_data.get("emergency_recording_mode", "Encode")
+        controller.recording_segment_length = settings_data.get("recording_segment_length", 10)
+        controller.idle_detection_interval = settings_data.get("idle_detection_interval", 1)
+        controller.detection_change_threshold = settings_data.get("detection_change_threshold", 8)
+        controller.cameras = settings_data.get("cameras", [])
+        controller.frame_source = settings_data.get("frame_source", "")
+        controller.metrics_port = settings_data.get("metrics_port", 0)
+        controller.metrics_snapshot_interval = settings_data.get("metrics_snapshot_interval", 0)
+        controller.preview_fps = settings_data.get("preview_fps", 30)
 
-    def save_settings(self, controller):
-        settings_data = {
+    @staticmethod
+    def get_settings_data(controller):
+        """
+        :return: dict with settings of the controller, as saved to the settings file
+        """
+
+        return {
             "emergency_recording_length": controller.emergency_recording_length,
             "standard_recording_length": controller.standard_recording_length,
             "emergency_buff_length": controller.emergency_buff_length,
-            "refresh_time": controller.refresh_time,
             "detection_sensitivity": controller.detection_sensitivity,
             "max_detection_sensitivity": controller.max_detection_sensitivity,
             "min_motion_rectangle_area": controller.min_motion_rectangle_area,
@@ -60,8 +82,30 @@ class ControllerSettingsManager:
             "save_recordings_locally": controller.save_recordings_locally,
             "gdrive_folder_id": controller.gdrive_folder_id,
             "disable_preview": controller.disable_preview,
-            "recording_mode": controller.recording_mode
+            "recording_mode": controller.recording_mode,
+            "detection_resolution": controller.detection_resolution,
+            "motion_detector": controller.motion_detector,
+            "detection_zones": controller.detection_zones,
+            "threaded_capture": controller.threaded_capture,
+            "emergency_buff_max_memory": controller.emergency_buff_max_memory,
+            "emergency_buff_compression": controller.emergency_buff_compression,
+            "emergency_queue_size": controller.emergency_queue_size,
+            "emergency_overflow_policy": controller.emergency_overflow_policy,
+            "standard_queue_size": controller.standard_queue_size,
+            "standard_overflow_policy": controller.standard_overflow_policy,
+            "emergency_recording_mode": controller.emergency_recording_mode,
+            "recording_segment_length": controller.recording_segment_length,
+            "idle_detection_interval": controller.idle_detection_interval,
+            "detection_change_threshold": controller.detection_change_threshold,
+            "cameras": controller.cameras,
+            "frame_source": controller.frame_source,
+            "metrics_port": controller.metrics_port,
+            "metrics_snapshot_interval": controller.metrics_snapshot_interval,
+            "preview_fps": controller.preview_fps
         }
 
+    def save_settings(self, controller):
+        settings_data = self.get_settings_data(controller)
+
         with open(self.settings_file_path, 'w') as settings_file:
             dump(settings_data, settings_file)
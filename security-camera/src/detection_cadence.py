@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+from collections import deque
+
+
+class DetectionCadence:
+    """
+    Class deciding on which frames motion detection runs. While the scene is idle, detection runs on every n-th frame
+    only; it runs on every frame while motion is seen and as soon as a cheap change score of the frame rises. The score
+    is the largest difference between cells of small gray thumbnails of the frame and of the last analysed frame, so
+    a small object changes its cells just like a global change of the scene would.
+    """
+
+    def __init__(self, idle_interval=1, change_threshold=8, active_frames=48, thumbnail_width=64,
+                 no_measured_frames=120):
+        """
+        :param idle_interval detection runs on every n-th frame while idle, 1 to run it on every frame
+        :param change_threshold change score (0-255) above which detection runs immediately
+        :param active_frames number of frames after the last motion during which detection runs on every frame
+        :param no_measured_frames number of the most recent frames the detection rate is measured over
+        """
+
+        self.idle_interval = idle_interval
+        self.change_threshold = change_threshold
+        self.active_frames = active_frames
+        self.thumbnail_width = thumbnail_width
+
+        self.no_frames = 0
+        self.no_detections = 0
+        self.__no_frames_since_detection = 0
+        self.__no_frames_since_motion = None
+        self.__reference_thumbnail = None
+        self.__detected_frames = deque(maxlen=no_measured_frames)
+
+    @property
+    def is_active(self):
+        return self.__no_frames_since_motion is not None and self.__no_frames_since_motion <= self.active_frames
+
+    @property
+    def detection_rate(self):
+        """
+        :return: share of recent frames on which detection ran
+        """
+
+        if len(self.__detected_frames) == 0:
+            return 1.0
+
+        return sum(self.__detected_frames) / len(self.__detected_frames)
+
+    def get_thumbnail(self, image):
+        """
+        :return: small gray thumbnail of the image, each pixel is an average of a cell of the image
+        """
+
+        height, width = image.shape[:2]
+        thumbnail_size = (self.thumbnail_width, max(1, round(self.thumbnail_width * height / width)))
+
+        # subsampling before averaging keeps the cost independent of resolution
+        step = max(1, width // (4 * self.thumbnail_width))
+        thumbnail = cv2.resize(image[::step, ::step], thumbnail_size, interpolation=cv2.INTER_AREA)
+
+        return cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY) if thumbnail.ndim == 3 else thumbnail
+
+    def get_change_score(self, thumbnail):
+        """
+        :return: largest difference (0-255) between cells of the thumbnail and the last analysed one, None if there is
+        nothing to compare with
+        """
+
+        reference_thumbnail = self.__reference_thumbnail
+
+        if thumbnail is None or reference_thumbnail is None or reference_thumbnail.shape != thumbnail.shape:
+            return None
+
+        return int(np.max(cv2.absdiff(thumbnail, reference_thumbnail)))
+
+    def add_frame(self):
+        """
+        Records a new frame.
+        :return: None
+        """
+
+        self.no_frames += 1
+        self.__no_frames_since_detection += 1
+        self.__detected_frames.append(0)
+
+        if self.__no_frames_since_motion is not None:
+            self.__no_frames_since_motion += 1
+
+    def is_detection_due(self, get_thumbnail):
+        """
+        :param get_thumbnail function returning thumbnail of the new frame, called only if the score is needed
+        :return: True if detection should run on the new frame
+        """
+
+        if self.idle_interval <= 1 or self.is_active or self.__no_frames_since_detection >= self.idle_interval:
+            return True
+
+        change_score = self.get_change_score(get_thumbnail())
+
+        return change_score is None or change_score > self.change_threshold
+
+    def add_detection(self, thumbnail, motion_detected):
+        """
+        Records detection on the new frame, its thumbnail becomes the reference for change scores.
+        :return: None
+        """
+
+        self.no_detections += 1
+        self.__no_frames_since_detection = 0
+        self.__reference_thumbnail = thumbnail
+
+        if len(self.__detected_frames) > 0:
+            self.__detected_frames[-1] = 1
+
+        if motion_detected:
+            self.__no_frames_since_motion = 0
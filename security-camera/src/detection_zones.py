@@ -0,0 +1,60 @@
+import logging
+import cv2
+import numpy as np
+
+
+def create_detection_mask(mask_shape, detection_scale, detection_zones):
+    """
+    Rasterises include and exclude zones into a mask of detection proxy size. If there are no include zones, the whole
+    frame is included. Exclude zones are applied after include zones.
+    :param mask_shape (height, width) of the detection proxy
+    :param detection_scale scale of the detection proxy
+    :param detection_zones list of dicts with "type" ("include" or "exclude") and "points" (list of [x, y] in full-frame
+    coordinates)
+    :return: uint8 mask with 255 where motion is detected and 0 elsewhere
+    """
+
+    logger = logging.getLogger("security_camera_logger")
+
+    include_polygons = []
+    exclude_polygons = []
+
+    for zone in detection_zones:
+        try:
+            points = np.array(zone["points"], dtype=np.float64)
+            zone_type = zone["type"]
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"invalid detection zone skipped: {zone}")
+            continue
+
+        if points.ndim != 2 or points.shape[0] < 3 or points.shape[1] != 2:
+            logger.warning(f"detection zone skipped - polygon needs at least 3 points: {zone}")
+            continue
+
+        if not np.all(np.isfinite(points)):
+            logger.warning(f"detection zone skipped - polygon has invalid points: {zone}")
+            continue
+
+        polygon = np.rint(points * detection_scale).astype(np.int32)
+
+        # polygons partially outside the frame are clipped, ones entirely outside would leave include zones empty
+        x, y, w, h = cv2.boundingRect(polygon)
+        if x >= mask_shape[1] or y >= mask_shape[0] or x + w <= 0 or y + h <= 0:
+            logger.warning(f"detection zone skipped - polygon is outside the frame: {zone}")
+        elif zone_type == "include":
+            include_polygons.append(polygon)
+        elif zone_type == "exclude":
+            exclude_polygons.append(polygon)
+        else:
+            logger.warning(f"detection zone skipped - unknown zone type: {zone_type}")
+
+    if include_polygons:
+        mask = np.zeros(mask_shape, np.uint8)
+        cv2.fillPoly(mask, include_polygons, 255)
+    else:
+        mask = np.full(mask_shape, 255, np.uint8)
+
+    if exclude_polygons:
+        cv2.fillPoly(mask, exclude_polygons, 0)
+
+    return mask
@@ -0,0 +1,109 @@
+import logging
+import os
+import shutil
+import subprocess
+
+
+class EmergencyClipAssembler:
+    """
+    Class responsible for assembling emergency clips from finished segments of standard recording, without decoding
+    or re-encoding them. Segments are concatenated by ffmpeg with stream copy; if ffmpeg isn't available or fails,
+    the clip is saved as an ffconcat playlist referencing the segments, which can be played or concatenated later.
+    """
+
+    def __init__(self, ffmpeg_path=None):
+        """
+        :param ffmpeg_path path of ffmpeg executable, found in PATH if not given
+        """
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.ffmpeg_path = shutil.which("ffmpeg") if ffmpeg_path is None else ffmpeg_path
+
+    def get_clip_path(self, base_path):
+        """
+        :return: path of the clip - a video file if ffmpeg is available, a playlist otherwise
+        """
+
+        return base_path + (".mkv" if self.ffmpeg_path else ".ffconcat")
+
+    @staticmethod
+    def is_playlist(clip_path):
+        """
+        :return: True if the clip is a playlist referencing local segments instead of a video file
+        """
+
+        return clip_path.endswith(".ffconcat")
+
+    @staticmethod
+    def get_covering_segments(segments, start_time, end_time):
+        """
+        :param segments finished segments (RecordingSegment)
+        :return: list of tuples (segment, inpoint, outpoint) of segments overlapping [start time, end time], points are
+        in seconds from the start of the segment, None if the whole segment is used from start / until end
+        """
+
+        covering_segments = []
+
+        for segment in sorted(segments, key=lambda segment: segment.start_time):
+            if segment.end_time < start_time or segment.start_time > end_time:
+                continue
+
+            inpoint = start_time - segment.start_time if segment.start_time < start_time else None
+            outpoint = end_time - segment.start_time if segment.end_time > end_time else None
+            covering_segments.append((segment, inpoint, outpoint))
+
+        return covering_segments
+
+    @staticmethod
+    def write_playlist(path, covering_segments):
+        with open(path, "w") as playlist_file:
+            playlist_file.write("ffconcat version 1.0\n")
+
+            for segment, inpoint, outpoint in covering_segments:
+                segment_path = os.path.abspath(segment.file_path).replace("'", "'\\''")
+                playlist_file.write(f"file '{segment_path}'\n")
+
+                if inpoint is not None:
+                    playlist_file.write(f"inpoint {inpoint:.3f}\n")
+                if outpoint is not None:
+                    playlist_file.write(f"outpoint {outpoint:.3f}\n")
+
+    def assemble(self, segments, start_time, end_time, clip_path):
+        """
+        Assembles clip of [start time, end time] from the segments covering it.
+        :return: path of the clip - clip path or path of the playlist if concatenation failed, None on fail
+        """
+
+        covering_segments = self.get_covering_segments(segments, start_time, end_time)
+
+        if len(covering_segments) == 0:
+            self.__logger.error(f"no recording segments cover emergency clip: {clip_path}")
+            return None
+
+        base_path = os.path.splitext(clip_path)[0]
+        playlist_path = base_path + ".ffconcat"
+
+        try:
+            self.write_playlist(playlist_path, covering_segments)
+        except OSError:
+            self.__logger.exception(f"failed to write emergency clip playlist: {playlist_path}")
+            return None
+
+        if not self.ffmpeg_path or clip_path == playlist_path:
+            self.__logger.info(f"emergency clip saved as playlist of {len(covering_segments)} segments")
+            return playlist_path
+
+        try:
+            subprocess.run([self.ffmpeg_path, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                            "-i", playlist_path, "-c", "copy", clip_path],
+                           check=True, capture_output=True, timeout=60)
+        except (OSError, subprocess.SubprocessError):
+            self.__logger.exception("failed to concatenate segments, emergency clip saved as playlist")
+            return playlist_path
+
+        os.remove(playlist_path)
+        self.__logger.info(f"emergency clip concatenated from {len(covering_segments)} segments")
+
+        return clip_path
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+from threading import Lock
+
+
+class Frame:
+    """
+    Captured frame together with its sequence number and capture timestamp. Image is kept as a read-only view, so the
+    frame can be shared without copying. Derived representations (gray, blurred gray, RGB, render modes) are computed
+    on first use and memoised, consumers that need to modify an image have to copy it.
+    """
+
+    __slots__ = ("image", "sequence_number", "capture_time", "valid", "__derived", "__lock", "__weakref__")
+
+    def __init__(self, image, sequence_number=0, capture_time=None):
+        self.valid = isinstance(image, np.ndarray) and image.size > 0
+        self.image = self.get_read_only_view(image) if self.valid else None
+        self.sequence_number = sequence_number
+        self.capture_time = capture_time
+
+        self.__derived = {}
+        self.__lock = Lock()
+
+    @staticmethod
+    def get_read_only_view(image):
+        view = image.view()
+        view.flags.writeable = False
+
+        return view
+
+    def get_derived(self, key, compute):
+        """
+        Returns derived representation of the frame, it is computed only once per frame.
+        :param key hashable identifier of the representation
+        :param compute function taking the frame and returning the representation
+        :return: read-only array, None if the frame is invalid or computing failed
+        """
+
+        if not self.valid:
+            return None
+
+        try:
+            return self.__derived[key]
+        except KeyError:
+            pass
+
+        # computed without holding the lock, render functions may wait for other locks (e.g. motion analysis)
+        derived = compute(self)
+
+        if isinstance(derived, np.ndarray):
+            derived.flags.writeable = False
+
+        with self.__lock:
+            return self.__derived.setdefault(key, derived)
+
+    def get_writable_copy(self, key=None):
+        """
+        :param key derived representation to copy, the image itself if None
+        :return: writable copy of the image or the derived representation, None if it doesn't exist
+        """
+
+        image = self.image if key is None else self.__derived.get(key)
+
+        return None if image is None else image.copy()
+
+    @property
+    def gray(self):
+        return self.get_derived("gray", lambda frame: cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def blurred_gray(self):
+        return self.get_derived("blurred_gray", lambda frame: cv2.GaussianBlur(frame.gray, (3, 3), sigmaX=0))
+
+    @property
+    def rgb(self):
+        return self.get_derived("rgb", lambda frame: cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB))
+
+    def render(self, mode, render_function):
+        """
+        Renders the frame in given mode, the same mode is rendered only once per frame.
+        :param render_function function taking the frame and returning rendered image
+        :return: read-only rendered image, None if the frame is invalid
+        """
+
+        return self.get_derived(("render", mode), render_function)
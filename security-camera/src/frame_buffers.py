@@ -0,0 +1,280 @@
+import cv2
+import logging
+import numpy as np
+from collections import deque
+from queue import Queue, Full
+from threading import Lock, Thread
+
+
+class FrameRingBuffer:
+    """
+    Fixed-memory buffer of the most recent frames. Frames are copied in place into a single preallocated
+    (N, H, W, 3) array, the oldest frame is overwritten when the buffer is full.
+    """
+
+    def __init__(self, capacity, max_memory):
+        """
+        :param capacity max number of frames
+        :param max_memory memory ceiling in bytes, capacity is reduced if frames wouldn't fit
+        """
+
+        self.requested_capacity = int(capacity)
+        self.max_memory = max_memory
+        self.capacity = 0
+
+        self.__frames = None
+        self.__head = 0
+        self.__length = 0
+        self.__lock = Lock()
+
+    def __len__(self):
+        return self.__length
+
+    @property
+    def nbytes(self):
+        return 0 if self.__frames is None else self.__frames.nbytes
+
+    def get_capacity_for(self, frame_shape):
+        """
+        :return: number of frames of given shape that fit into the buffer without exceeding memory ceiling
+        """
+
+        frame_nbytes = int(np.prod(frame_shape))
+
+        return max(1, min(self.requested_capacity, self.max_memory // frame_nbytes))
+
+    def allocate(self, frame_shape):
+        """
+        Allocates memory for frames of given shape, discards buffered frames.
+        :return: None
+        """
+
+        with self.__lock:
+            self.capacity = self.get_capacity_for(frame_shape)
+            self.__frames = np.empty((self.capacity, *frame_shape), np.uint8)
+            self.__head = 0
+            self.__length = 0
+
+    def set_capacity(self, capacity):
+        """
+        Changes max number of frames. Buffer is reallocated only if the capacity actually changes.
+        :return: None
+        """
+
+        capacity = int(capacity)
+
+        if capacity != self.requested_capacity:
+            self.requested_capacity = capacity
+
+            if self.__frames is not None:
+                self.allocate(self.__frames.shape[1:])
+
+    def append(self, frame):
+        """
+        Copies the frame into the buffer, overwrites the oldest frame if the buffer is full. Buffer is reallocated if
+        frame shape changes.
+        :return: None
+        """
+
+        if self.__frames is None or self.__frames.shape[1:] != frame.shape:
+            self.allocate(frame.shape)
+
+        with self.__lock:
+            np.copyto(self.__frames[(self.__head + self.__length) % self.capacity], frame)
+
+            if self.__length < self.capacity:
+                self.__length += 1
+            else:
+                self.__head = (self.__head + 1) % self.capacity
+
+    def popleft(self):
+        """
+        Removes the oldest frame from the buffer. Returned array is a view into the buffer, it stays intact until the
+        buffer wraps around, so it has to be consumed before the next capacity - 1 appends.
+        :return: the oldest frame, None if the buffer is empty
+        """
+
+        with self.__lock:
+            if self.__length == 0:
+                return None
+
+            frame = self.__frames[self.__head]
+            self.__head = (self.__head + 1) % self.capacity
+            self.__length -= 1
+
+            return frame
+
+    def drain(self):
+        """
+        Iterates over buffered frames from the oldest one, removing them from the buffer.
+        :return: generator of frames
+        """
+
+        frame = self.popleft()
+
+        while frame is not None:
+            yield frame
+            frame = self.popleft()
+
+    def clear(self):
+        with self.__lock:
+            self.__head = 0
+            self.__length = 0
+
+    def close(self):
+        pass
+
+
+class CompressedFrameBuffer:
+    """
+    Buffer of the most recent frames stored as JPEG or PNG images. Frames are encoded by a background thread and
+    decoded only when they are drained. Oldest frames are dropped when the buffer exceeds its byte budget or capacity.
+    """
+
+    image_formats = {"JPEG": ".jpg", "PNG": ".png"}
+
+    def __init__(self, capacity, max_memory, image_format="JPEG", jpeg_quality=90, max_pending_frames=32):
+        """
+        :param capacity max number of frames
+        :param max_memory byte budget for encoded frames
+        :param image_format "JPEG" or "PNG"
+        """
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.requested_capacity = int(capacity)
+        self.max_memory = max_memory
+        self.capacity = self.requested_capacity
+
+        self.__extension = self.image_formats[image_format]
+        self.__encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if image_format == "JPEG" else []
+
+        self.__encoded_frames = deque()
+        self.__nbytes = 0
+        self.__lock = Lock()
+
+        # frames waiting for the encoder thread, which is started by the first appended frame
+        self.__pending_frames = Queue(maxsize=max_pending_frames)
+        self.no_dropped_frames = 0
+        self.__encoder_thread = None
+        self.__closed = False
+
+    def __len__(self):
+        return len(self.__encoded_frames) + self.__pending_frames.qsize()
+
+    @property
+    def nbytes(self):
+        return self.__nbytes
+
+    def get_capacity_for(self, frame_shape):
+        return self.requested_capacity
+
+    def allocate(self, frame_shape):
+        pass
+
+    def set_capacity(self, capacity):
+        self.requested_capacity = self.capacity = int(capacity)
+
+    def append(self, frame):
+        """
+        Passes the frame to the encoder thread. Frame is dropped if the encoder falls behind. The frame must not be
+        modified afterwards.
+        :return: None
+        """
+
+        if self.__encoder_thread is None:
+            if self.__closed:
+                return
+
+            self.__encoder_thread = Thread(target=self.encode_frames, daemon=True)
+            self.__encoder_thread.start()
+
+        try:
+            self.__pending_frames.put_nowait(frame)
+        except Full:
+            self.no_dropped_frames += 1
+
+    def encode_frames(self):
+        while True:
+            frame = self.__pending_frames.get()
+
+            if frame is None:
+                self.__pending_frames.task_done()
+                return
+
+            try:
+                success, encoded_frame = cv2.imencode(self.__extension, frame, self.__encode_params)
+            except cv2.error:
+                self.__logger.exception("failed to encode frame of emergency buffer")
+                success = False
+
+            if success:
+                with self.__lock:
+                    self.__encoded_frames.append(encoded_frame)
+                    self.__nbytes += encoded_frame.nbytes
+
+                    while len(self.__encoded_frames) > self.capacity or self.__nbytes > self.max_memory:
+                        self.__nbytes -= self.__encoded_frames.popleft().nbytes
+
+            self.__pending_frames.task_done()
+
+    def popleft(self):
+        """
+        Removes the oldest encoded frame from the buffer and decodes it.
+        :return: the oldest frame, None if the buffer is empty
+        """
+
+        with self.__lock:
+            if len(self.__encoded_frames) == 0:
+                return None
+
+            encoded_frame = self.__encoded_frames.popleft()
+            self.__nbytes -= encoded_frame.nbytes
+
+        return cv2.imdecode(encoded_frame, cv2.IMREAD_COLOR)
+
+    def drain(self):
+        """
+        Waits for frames that are being encoded, then iterates over buffered frames from the oldest one, removing
+        them from the buffer.
+        :return: generator of decoded frames
+        """
+
+        self.__pending_frames.join()
+        frame = self.popleft()
+
+        while frame is not None:
+            yield frame
+            frame = self.popleft()
+
+    def clear(self):
+        self.__pending_frames.join()
+
+        with self.__lock:
+            self.__encoded_frames.clear()
+            self.__nbytes = 0
+
+    def close(self):
+        """
+        Stops the encoder thread.
+        :return: None
+        """
+
+        self.__closed = True
+
+        if self.__encoder_thread is not None:
+            self.__pending_frames.put(None)
+
+
+def create_frame_buffer(capacity, max_memory, compression):
+    """
+    Creates emergency buffer, raw or compressed with given image format.
+    :param compression "None", "JPEG" or "PNG"
+    :return: FrameRingBuffer or CompressedFrameBuffer
+    """
+
+    if compression in CompressedFrameBuffer.image_formats:
+        return CompressedFrameBuffer(capacity, max_memory, compression)
+
+    return FrameRingBuffer(capacity, max_memory)
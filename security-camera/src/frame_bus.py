@@ -0,0 +1,154 @@
+import logging
+import time
+from threading import Lock
+from recording_writers import BoundedFrameQueue
+
+
+class FrameSubscription:
+    """
+    Subscription to frames published on the frame bus. Each subscriber has its own bounded queue, rate limit and drop
+    policy, so a slow subscriber only loses its own frames. Frames are immutable, so they are shared without copying.
+    """
+
+    def __init__(self, name, max_size=1, overflow_policy="Drop oldest", max_fps=None):
+        """
+        :param max_size max number of queued frames
+        :param overflow_policy "Drop oldest" or "Drop newest", subscribers can't block the publisher
+        :param max_fps max number of frames per second passed to the subscriber, None for no limit
+        """
+
+        if overflow_policy == "Block":
+            raise ValueError("frame bus subscriptions can't block the publisher")
+
+        self.name = name
+        self.max_fps = max_fps
+        self.frame_queue = BoundedFrameQueue(max_size, overflow_policy)
+
+        self.__last_offer_time = None
+
+        # counters
+        self.no_limited_frames = 0
+
+    def offer(self, frame, publish_time):
+        """
+        Queues the frame, unless it comes sooner than the rate limit allows.
+        :return: True if the frame was queued
+        """
+
+        if self.max_fps and self.__last_offer_time is not None and \
+                publish_time - self.__last_offer_time < 1 / self.max_fps:
+            self.no_limited_frames += 1
+            return False
+
+        self.__last_offer_time = publish_time
+
+        return self.frame_queue.put(frame)
+
+    def get(self, timeout=None):
+        """
+        :return: the oldest queued frame, None on timeout or if the subscription is closed
+        """
+
+        return self.frame_queue.get(timeout)
+
+    def get_latest(self, timeout=None):
+        """
+        Takes all queued frames and returns the newest one, older frames are counted as dropped.
+        :return: frame, None on timeout or if the subscription is closed
+        """
+
+        frame = self.frame_queue.get(timeout)
+
+        while frame is not None and len(self.frame_queue) > 0:
+            frame = self.frame_queue.get(0)
+            self.frame_queue.no_dropped_frames += 1
+
+        return frame
+
+    def close(self):
+        self.frame_queue.close(discard=True)
+
+    def get_stats(self):
+        return {"queued_frames": self.frame_queue.no_put_frames,
+                "dropped_frames": self.frame_queue.no_dropped_frames,
+                "limited_frames": self.no_limited_frames,
+                "max_depth": self.frame_queue.max_depth}
+
+
+class FrameBus:
+    """
+    In-process bus the capture stage publishes frames on. Subscribers consume frames from their own queues in their
+    own threads, instead of reading the frames held by the camera. The latest frame can also be read directly, e.g.
+    for snapshots.
+    """
+
+    def __init__(self):
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.__subscriptions = ()
+        self.__latest_frame = None
+        self.__lock = Lock()
+
+        # counters
+        self.no_published_frames = 0
+
+    def subscribe(self, name, max_size=1, overflow_policy="Drop oldest", max_fps=None):
+        """
+        :return: FrameSubscription receiving frames published from now on, see FrameSubscription for parameters
+        """
+
+        subscription = FrameSubscription(name, max_size, overflow_policy, max_fps)
+
+        with self.__lock:
+            self.__subscriptions += (subscription,)
+
+        self.__logger.debug(f"frame bus subscriber added: {name}")
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.__lock:
+            self.__subscriptions = tuple(item for item in self.__subscriptions if item is not subscription)
+
+        subscription.close()
+
+    def publish(self, frame):
+        """
+        Offers the frame to all subscribers, never waits for them.
+        :return: None
+        """
+
+        publish_time = time.monotonic()
+        self.__latest_frame = frame
+        self.no_published_frames += 1
+
+        # subscriptions are replaced, not modified, so they can be iterated without the lock
+        for subscription in self.__subscriptions:
+            subscription.offer(frame, publish_time)
+
+    def get_latest_frame(self):
+        """
+        :return: the most recently published frame, None if nothing was published yet
+        """
+
+        return self.__latest_frame
+
+    def close(self):
+        with self.__lock:
+            subscriptions, self.__subscriptions = self.__subscriptions, ()
+
+        for subscription in subscriptions:
+            subscription.close()
+
+    def get_stats(self):
+        """
+        :return: dict with number of published frames and stats of each subscriber
+        """
+
+        stats = {"published_frames": self.no_published_frames}
+
+        for subscription in self.__subscriptions:
+            stats.update({f"{subscription.name}_{key}": value for key, value in subscription.get_stats().items()})
+
+        return stats
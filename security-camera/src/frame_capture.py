@@ -0,0 +1,169 @@
+import logging
+import time
+import numpy as np
+from threading import Thread, Condition
+
+
+class CapturedFrame:
+    """
+    Frame read by the capture thread together with its sequence number and capture timestamp.
+    """
+
+    __slots__ = ("image", "sequence_number", "capture_time", "slot")
+
+    def __init__(self, image, sequence_number, capture_time, slot):
+        self.image = image
+        self.sequence_number = sequence_number
+        self.capture_time = capture_time
+        self.slot = slot
+
+
+class FrameCaptureThread(Thread):
+    """
+    Thread responsible for continuously reading frames from the capture into a ring of preallocated frame buffers.
+    Consumers acquire frames, which pins their buffers until they are released, so that the capture never overwrites
+    a frame that is still in use. The ring has a fixed size, if all buffers are pinned, new frames are dropped.
+    Consumers keeping frames for long (e.g. recording queues) hold copies instead of pinned buffers.
+    """
+
+    def __init__(self, capture, frame_shape, ring_size=6, on_frame_captured=None):
+        super().__init__(daemon=True)
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.__capture = capture
+        self.__on_frame_captured = on_frame_captured
+
+        # ring of preallocated frame buffers
+        self.__ring = [np.empty(frame_shape, np.uint8) for _ in range(ring_size)]
+        self.__ring_frames = [None] * ring_size
+        self.__ring_pins = [0] * ring_size
+        self.__scratch_buffer = np.empty(frame_shape, np.uint8)
+        self.__next_slot = 0
+
+        self.__condition = Condition()
+        self.__running = True
+        self.__latest_frame = None
+
+        # counters
+        self.no_captured_frames = 0
+        self.no_dropped_frames = 0
+        self.no_failed_reads = 0
+
+    def run(self):
+        self.__logger.info("frame capture thread started")
+
+        while self.__running:
+            with self.__condition:
+                slot = self.get_free_slot()
+
+            if slot is None:
+                # all buffers are in use - read the frame anyway, so that the driver doesn't queue stale frames
+                success, _ = self.__capture.read(image=self.__scratch_buffer)
+
+                if success:
+                    self.no_dropped_frames += 1
+                else:
+                    self.no_failed_reads += 1
+                    time.sleep(0.005)
+
+                continue
+
+            success, image = self.__capture.read(image=self.__ring[slot])
+            capture_time = time.time()
+
+            if not success or image is None:
+                self.no_failed_reads += 1
+                time.sleep(0.005)
+                continue
+
+            if image is not self.__ring[slot]:
+                # capture allocated a new buffer (e.g. frame size changed), keep it in the ring
+                self.__ring[slot] = image
+
+            if self.__on_frame_captured is not None:
+                self.__on_frame_captured(image, capture_time)
+
+            with self.__condition:
+                self.no_captured_frames += 1
+                frame = CapturedFrame(image, self.no_captured_frames, capture_time, slot)
+                self.__ring_frames[slot] = frame
+                self.__latest_frame = frame
+                self.__condition.notify_all()
+
+        self.__logger.info("frame capture thread stopped")
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+
+    def get_free_slot(self):
+        """
+        Looks for the oldest buffer that is neither pinned nor holding the latest frame. Must be called with the
+        condition acquired.
+        :return: index of the buffer, None if all buffers are in use
+        """
+
+        ring_size = len(self.__ring)
+
+        for i in range(ring_size):
+            slot = (self.__next_slot + i) % ring_size
+            frame = self.__ring_frames[slot]
+
+            if self.__ring_pins[slot] == 0 and (frame is None or frame is not self.__latest_frame):
+                self.__ring_frames[slot] = None
+                self.__next_slot = (slot + 1) % ring_size
+                return slot
+
+        return None
+
+    def acquire_latest_frame(self, timeout=None):
+        """
+        Waits for any frame and pins the most recent one.
+        :return: CapturedFrame, None on timeout or when the thread is stopped
+        """
+
+        return self.acquire_next_frame(0, timeout, latest=True)
+
+    def acquire_next_frame(self, last_sequence_number, timeout=None, latest=False):
+        """
+        Waits for a frame newer than the last seen one and pins it. Frames are returned in order, unless the consumer
+        fell behind so much that unseen frames were already overwritten.
+        :param last_sequence_number sequence number of the last frame seen by the consumer
+        :param latest if True, the most recent frame is returned instead of the next unseen one
+        :return: CapturedFrame, None on timeout or when the thread is stopped
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.__condition:
+            while self.__running:
+                if self.__latest_frame is not None and self.__latest_frame.sequence_number > last_sequence_number:
+                    if latest:
+                        frame = self.__latest_frame
+                    else:
+                        frame = min((frame for frame in self.__ring_frames
+                                     if frame is not None and frame.sequence_number > last_sequence_number),
+                                    key=lambda f: f.sequence_number)
+
+                    self.__ring_pins[frame.slot] += 1
+                    return frame
+
+                remaining_time = None if deadline is None else deadline - time.monotonic()
+                if remaining_time is not None and remaining_time <= 0:
+                    return None
+
+                self.__condition.wait(remaining_time)
+
+        return None
+
+    def release_frame(self, frame):
+        """
+        Unpins buffer of the frame, so that it can be overwritten.
+        :return: None
+        """
+
+        with self.__condition:
+            self.__ring_pins[frame.slot] -= 1
@@ -0,0 +1,341 @@
+import os
+import cv2
+import time
+import logging
+import numpy as np
+from platform import system
+
+
+class FrameSource:
+    """
+    Base class of sources of frames consumed by the camera. Sources with fps set are paced in real time, otherwise
+    frames are read as fast as possible.
+    """
+
+    def __init__(self, fps=None):
+        self.fps = fps
+        self.frame_dimensions = (0, 0)
+        self.no_read_frames = 0
+        self.__next_frame_time = None
+
+    def is_opened(self):
+        raise NotImplementedError
+
+    def read_frame(self, image):
+        """
+        Reads the next frame, into the image if it is given and its shape matches.
+        :return: tuple (success, frame)
+        """
+
+        raise NotImplementedError
+
+    def read(self, image=None):
+        """
+        Reads the next frame, waits until it is due if the source is paced.
+        :param image preallocated array the frame is read into if its shape matches
+        :return: tuple (success, frame)
+        """
+
+        if not self.is_opened():
+            return False, None
+
+        if self.fps:
+            self.wait_for_next_frame()
+
+        success, frame = self.read_frame(image)
+
+        if success:
+            self.no_read_frames += 1
+
+        return success, frame
+
+    def wait_for_next_frame(self):
+        now = time.perf_counter()
+
+        if self.__next_frame_time is None or now - self.__next_frame_time > 1:
+            # first frame or the consumer fell far behind - don't try to catch up
+            self.__next_frame_time = now
+        elif self.__next_frame_time > now:
+            time.sleep(self.__next_frame_time - now)
+
+        self.__next_frame_time += 1 / self.fps
+
+    def release(self):
+        pass
+
+    @staticmethod
+    def get_output_image(image, shape):
+        if image is None or image.shape != shape:
+            return np.empty(shape, np.uint8)
+
+        return image
+
+
+class DeviceFrameSource(FrameSource):
+    """
+    Live camera device, opened in its highest resolution.
+    """
+
+    def __init__(self, camera_number):
+        super().__init__()
+
+        if system() == "Windows":
+            self.__capture = cv2.VideoCapture(camera_number, cv2.CAP_DSHOW)
+        else:
+            self.__capture = cv2.VideoCapture(camera_number)
+
+        HIGH_RES = 10000
+        self.__capture.set(cv2.CAP_PROP_FRAME_WIDTH, HIGH_RES)
+        self.__capture.set(cv2.CAP_PROP_FRAME_HEIGHT, HIGH_RES)
+
+        self.frame_dimensions = (int(self.__capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                 int(self.__capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        self.__capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_dimensions[0])
+        self.__capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_dimensions[1])
+
+    def is_opened(self):
+        return self.__capture.isOpened()
+
+    def read_frame(self, image):
+        # device delivers frames in its own pace
+        return self.__capture.read(image=image)
+
+    def release(self):
+        self.__capture.release()
+
+
+class VideoFileFrameSource(FrameSource):
+    """
+    Video file played in real time (paced by its fps) or read as fast as possible.
+    """
+
+    def __init__(self, path, real_time=True, loop=False):
+        super().__init__()
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.path = path
+        self.loop = loop
+        self.__capture = cv2.VideoCapture(path)
+
+        if not self.__capture.isOpened():
+            self.__logger.error(f"failed to open video file: {path}")
+
+        self.frame_dimensions = (int(self.__capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                 int(self.__capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        if real_time:
+            self.fps = self.__capture.get(cv2.CAP_PROP_FPS) or 30
+
+    def is_opened(self):
+        return self.__capture.isOpened()
+
+    def read_frame(self, image):
+        success, frame = self.__capture.read(image=image)
+
+        if not success and self.loop:
+            self.__capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.__capture.read(image=image)
+
+        return success, frame
+
+    def release(self):
+        self.__capture.release()
+
+
+class ImageDirectoryFrameSource(FrameSource):
+    """
+    Images of a directory read in alphabetical order. Images are resized to the size of the first one.
+    """
+
+    image_extensions = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+    def __init__(self, path, fps=None, loop=False):
+        super().__init__(fps)
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.path = path
+        self.loop = loop
+        self.__index = 0
+
+        try:
+            self.__image_paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                        if name.lower().endswith(self.image_extensions))
+        except OSError:
+            self.__logger.exception(f"failed to list images directory: {path}")
+            self.__image_paths = []
+
+        first_image = cv2.imread(self.__image_paths[0]) if self.__image_paths else None
+
+        if first_image is None:
+            self.__logger.error(f"no readable images in directory: {path}")
+            self.__image_paths = []
+        else:
+            self.frame_dimensions = (first_image.shape[1], first_image.shape[0])
+
+        self.__opened = len(self.__image_paths) > 0
+
+    def is_opened(self):
+        return self.__opened
+
+    def read_frame(self, image):
+        if self.__index >= len(self.__image_paths):
+            if not self.loop:
+                return False, None
+            self.__index = 0
+
+        path = self.__image_paths[self.__index]
+        self.__index += 1
+
+        frame = cv2.imread(path)
+
+        if frame is None:
+            self.__logger.warning(f"failed to read image: {path}")
+            return False, None
+
+        image = self.get_output_image(image, (self.frame_dimensions[1], self.frame_dimensions[0], 3))
+
+        if frame.shape != image.shape:
+            cv2.resize(frame, self.frame_dimensions, dst=image, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(image, frame)
+
+        return True, image
+
+    def release(self):
+        self.__opened = False
+
+
+class ScriptedObject:
+    """
+    Rectangle moving with constant velocity through the synthetic scene between start and end frame. Object wraps
+    around the edges of the frame.
+    """
+
+    def __init__(self, position, size, velocity=(0, 0), color=(235, 235, 235), start_frame=0, end_frame=None):
+        self.position = position
+        self.size = size
+        self.velocity = velocity
+        self.color = tuple(int(channel) for channel in color)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+
+    def is_visible(self, frame_index):
+        return self.start_frame <= frame_index and (self.end_frame is None or frame_index < self.end_frame)
+
+    def get_rectangle(self, frame_index, frame_dimensions):
+        """
+        :return: (x, y, w, h) of the object in given frame, None if the object isn't visible
+        """
+
+        if not self.is_visible(frame_index):
+            return None
+
+        t = frame_index - self.start_frame
+        x = int(self.position[0] + self.velocity[0] * t) % max(1, frame_dimensions[0] - self.size[0])
+        y = int(self.position[1] + self.velocity[1] * t) % max(1, frame_dimensions[1] - self.size[1])
+
+        return x, y, self.size[0], self.size[1]
+
+
+class SyntheticFrameSource(FrameSource):
+    """
+    Deterministic synthetic scene: static textured background with sensor noise and scripted moving objects. Noise is
+    generated once for a few frames, which are then cycled, so frames are cheap to produce at any resolution.
+    """
+
+    def __init__(self, width=1280, height=720, fps=None, scripted_objects=(), no_frames=None, noise=4,
+                 no_noise_frames=4, seed=13):
+        """
+        :param fps frames per second in real time, None to produce frames as fast as possible
+        :param scripted_objects list of ScriptedObject
+        :param no_frames number of frames after which the source ends, None for endless source
+        :param noise standard deviation of sensor noise
+        """
+
+        super().__init__(fps)
+
+        self.frame_dimensions = (width, height)
+        self.scripted_objects = list(scripted_objects)
+        self.no_frames = no_frames
+        self.frame_index = 0
+        self.__opened = True
+
+        rng = np.random.default_rng(seed)
+        background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 9)
+
+        self.__backgrounds = []
+        for _ in range(max(1, no_noise_frames)):
+            noisy_background = background.astype(np.int16) + rng.normal(0, noise, background.shape).astype(np.int16)
+            self.__backgrounds.append(np.clip(noisy_background, 0, 255).astype(np.uint8))
+
+    def is_opened(self):
+        return self.__opened
+
+    def is_motion_frame(self, frame_index):
+        """
+        :return: True if a moving object is visible in the frame
+        """
+
+        return any(scripted_object.is_visible(frame_index) for scripted_object in self.scripted_objects)
+
+    def read_frame(self, image):
+        if self.no_frames is not None and self.frame_index >= self.no_frames:
+            return False, None
+
+        image = self.get_output_image(image, (self.frame_dimensions[1], self.frame_dimensions[0], 3))
+        np.copyto(image, self.__backgrounds[self.frame_index % len(self.__backgrounds)])
+
+        for scripted_object in self.scripted_objects:
+            rectangle = scripted_object.get_rectangle(self.frame_index, self.frame_dimensions)
+
+            if rectangle is not None:
+                x, y, w, h = rectangle
+                image[y:y + h, x:x + w] = scripted_object.color
+
+        self.frame_index += 1
+
+        return True, image
+
+    def release(self):
+        self.__opened = False
+
+
+def create_frame_source(source, camera_number=0):
+    """
+    Creates frame source from its description:
+    "" or None - camera device with given number,
+    number - camera device with that number,
+    "synthetic" or "synthetic:WIDTHxHEIGHT" - synthetic scene with a moving object, paced to 30 fps,
+    path to a directory - images of the directory,
+    other path - video file played in real time.
+    :return: FrameSource
+    """
+
+    if source is None or source == "":
+        return DeviceFrameSource(camera_number)
+
+    source = str(source)
+
+    if source.isdigit():
+        return DeviceFrameSource(int(source))
+
+    if source.startswith("synthetic"):
+        width, height = 1280, 720
+        if ":" in source:
+            width, height = (int(size) for size in source.split(":", 1)[1].lower().split("x"))
+
+        object_size = max(8, height // 8)
+        moving_object = ScriptedObject(position=(0, height // 2), size=(object_size, object_size),
+                                       velocity=(max(1, width // 320), 0), start_frame=60)
+
+        return SyntheticFrameSource(width, height, fps=30, scripted_objects=[moving_object])
+
+    if os.path.isdir(source):
+        return ImageDirectoryFrameSource(source, fps=30)
+
+    return VideoFileFrameSource(source, real_time=True)
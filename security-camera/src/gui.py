@@ -9,6 +9,8 @@ from controller import Controller
 from threading import Thread
 from PIL import Image, ImageTk
 from camera import Camera
+from preview_renderer import PreviewRenderer
+from motion_detectors import motion_detectors
 
 
 class SecurityCameraApp(tk.Tk):
@@ -30,8 +32,10 @@ class SecurityCameraApp(tk.Tk):
         self.__app_height = 720
         self.__img_width = 1280
         self.__img_height = 720
-        self.__gui_refresh_time = 10
         self.__displayed_img = None
+        self.__preview_item = None
+        self.__preview_sequence_number = 0
+        self.__preview_placeholder_shown = False
         self.__antispam_length = 5
         self.resizable(False, False)
         self.geometry(f"{self.__app_width}x{self.__app_height}+100+100")
@@ -61,8 +65,18 @@ class SecurityCameraApp(tk.Tk):
         self.__canvas = tk.Canvas(canvas_frame, width=self.__app_width, height=self.__app_height)
         self.__canvas.pack(fill=tk.BOTH, expand=True)
 
+        # preview is drawn by pasting into one persistent image of a single canvas item
+        self.__displayed_img = ImageTk.PhotoImage("RGB", (self.__img_width, self.__img_height))
+        self.__preview_item = self.__canvas.create_image(0, 0, image=self.__displayed_img, anchor=tk.NW)
+
+        # preview frames are resized and converted off the GUI thread
+        self.__preview_renderer = PreviewRenderer(self.cam_controller.get_preview_frame, self.__img_width,
+                                                  self.__img_height, self.cam_controller.preview_fps)
+        self.__preview_renderer.start()
+
         # sidebar
         self.__preview_mode_dropdown = None
+        self.__preview_camera_dropdown = None
         self.__toggle_surveillance_button = None
         self.create_sidebar()
 
@@ -111,6 +125,15 @@ class SecurityCameraApp(tk.Tk):
                                                        width=15, row=5, column=0, padding_x=5, padding_y=5)
         self.__preview_mode_dropdown.toggle_disable(self.cam_controller.disable_preview)
 
+        # preview camera dropdown, cameras run by workers are read from shared memory; camera of this process is
+        # named "Main", as its number can be changed in settings
+        camera_names = ["Main"] + [str(camera_settings["camera_number"]) for camera_settings in
+                                   self.cam_controller.get_worker_cameras_settings()]
+        self.__preview_camera_dropdown = DropdownSetting(root=sidebar_frame, initial_value=camera_names[0],
+                                                         label_text="Preview camera:",
+                                                         dropdown_options=[camera_names[0]] + camera_names,
+                                                         width=15, row=6, column=0, padding_x=5, padding_y=5)
+
         # place frame
         sidebar_frame.grid(row=0, column=0, pady=(200, 10), padx=10, columnspan=2)
 
@@ -283,10 +306,29 @@ class SecurityCameraApp(tk.Tk):
                                                   width=15, row=8, column=0, padding_x=settings_padding_x,
                                                   padding_y=settings_padding_y)
 
+        detection_resolutions = {"Full": 0, "1080p": 1080, "720p": 720, "480p": 480, "360p": 360}
+        current_detection_resolution = next((name for name, height in detection_resolutions.items()
+                                             if height == self.cam_controller.detection_resolution), "Full")
+        detection_resolution_dropdown = DropdownSetting(root=settings_frame,
+                                                        initial_value=current_detection_resolution,
+                                                        label_text="Detection resolution:",
+                                                        dropdown_options=[current_detection_resolution] +
+                                                        list(detection_resolutions.keys()),
+                                                        width=15, row=17, column=0, padding_x=settings_padding_x,
+                                                        padding_y=settings_padding_y)
+
+        motion_detector_dropdown = DropdownSetting(root=settings_frame,
+                                                   initial_value=self.cam_controller.motion_detector,
+                                                   label_text="Motion detector:",
+                                                   dropdown_options=[self.cam_controller.motion_detector] +
+                                                   list(motion_detectors.keys()),
+                                                   width=15, row=18, column=0, padding_x=settings_padding_x,
+                                                   padding_y=settings_padding_y)
+
         # settings applied label
         settings_applied_label = ttk.Label(settings_frame, text="", padding=(5, 5))
         settings_applied_label.configure(foreground="#217346")
-        settings_applied_label.grid(row=18, column=0, columnspan=3, padx=200)
+        settings_applied_label.grid(row=20, column=0, columnspan=3, padx=200)
 
         # apply settings button
         def update_email(new_email):
@@ -319,10 +361,7 @@ class SecurityCameraApp(tk.Tk):
             self.cam_controller.save_recordings_locally = local_recordings_checkbutton_setting.get_value()
             self.cam_controller.upload_to_gdrive = upload_to_gdrive_checkbutton_setting.get_value()
 
-            prev_disable_preview_state = self.cam_controller.disable_preview
             self.cam_controller.disable_preview = disable_preview_checkbutton_setting.get_value()
-            if prev_disable_preview_state and not self.cam_controller.disable_preview:
-                self.after(self.__gui_refresh_time, self.update_window)
             self.__preview_mode_dropdown.toggle_disable(self.cam_controller.disable_preview)
 
             # email entry
@@ -345,12 +384,21 @@ class SecurityCameraApp(tk.Tk):
                 self.restart_surveillance_thread()
                 self.__logger.info("restarted surveillance after recording mode change")
 
+            # detection resolution dropdown
+            self.cam_controller.detection_resolution = detection_resolutions[detection_resolution_dropdown.get_value()]
+
+            # motion detector dropdown
+            self.cam_controller.motion_detector = motion_detector_dropdown.get_value()
+
             # updating parameters
             self.cam_controller.update_parameters()
 
             # saving parameters to JSON
             self.cam_controller.controller_settings_manager.save_settings(self.cam_controller)
 
+            # camera workers load saved settings when they start
+            Thread(target=self.cam_controller.restart_camera_workers, daemon=True).start()
+
             # show settings applied label
             settings_applied_label.config(text="✔ settings have been applied")
 
@@ -359,7 +407,7 @@ class SecurityCameraApp(tk.Tk):
 
         apply_settings_button = ttk.Button(settings_frame, text="Apply", style='Accent.TButton',
                                            command=apply_settings, width=5)
-        apply_settings_button.grid(row=17, column=0, columnspan=3, padx=390, pady=(30, 5), sticky="ew")
+        apply_settings_button.grid(row=19, column=0, columnspan=3, padx=390, pady=(30, 5), sticky="ew")
 
     def toggle_surveillance(self):
         self.__toggle_surveillance_button.state(["disabled"])
@@ -386,9 +434,8 @@ class SecurityCameraApp(tk.Tk):
         self.surveillance_thread.start()
 
     def kill_surveillance_thread(self):
-        if self.cam_controller.cam is not None:
-            self.cam_controller.surveillance_running = False
-            self.cam_controller.cam.destroy()
+        # surveillance thread destroys the camera when its loop finishes
+        self.cam_controller.stop_surveillance()
         # self.cam_controller.controller_settings_manager.save_settings(self.cam_controller)
         self.__logger.info("surveillance thread stopped")
 
@@ -397,25 +444,41 @@ class SecurityCameraApp(tk.Tk):
         self.run_surveillance_thread()
 
     def on_closing(self):
+        self.__preview_renderer.stop()
         self.kill_surveillance_thread()
         self.destroy()
 
     def update_window(self):
-        if self.cam_controller.surveillance_running and self.cam_controller.disable_preview:
-            self.set_preview_img(self.preview_disabled_img)
+        """
+        Shows the latest preview frame if the preview renderer rendered a new one, at most preview fps times per
+        second. The frame is already resized and converted, so it is only pasted into the displayed image.
+        :return: None
+        """
+
+        surveillance_running = self.cam_controller.surveillance_running
+        preview_fps = max(self.cam_controller.preview_fps or 30, 1)
+
+        self.__preview_renderer.preview_fps = preview_fps
+        self.__preview_renderer.set_source(self.get_preview_camera_number(),
+                                           self.__preview_mode_dropdown.get_value(),
+                                           enabled=surveillance_running and not self.cam_controller.disable_preview)
+
+        if surveillance_running and self.cam_controller.disable_preview:
+            if not self.__preview_placeholder_shown:
+                self.set_preview_img(self.preview_disabled_img)
+                self.__preview_placeholder_shown = True
 
-        elif self.cam_controller.surveillance_running and self.cam_controller.cam is not None:
-            frame = self.cam_controller.cam.get_frame_with_mode(self.__preview_mode_dropdown.get_value())
-            rgb_frame = self.cam_controller.cam.convert_frame_to_rgb(frame)
+        elif surveillance_running:
+            self.__preview_placeholder_shown = False
+            self.__preview_sequence_number = self.__preview_renderer.read_frame(self.__preview_sequence_number,
+                                                                                self.paste_preview_frame)
 
-            if rgb_frame is not None:
-                img = Image.fromarray(rgb_frame).resize(size=(self.__img_width, self.__img_height))
-                self.set_preview_img(img)
+        self.after(max(1, round(1000 / preview_fps)), self.update_window)
 
-            self.after(self.__gui_refresh_time, self.update_window)
+    def get_preview_camera_number(self):
+        preview_camera = self.__preview_camera_dropdown.get_value()
 
-        else:
-            self.after(self.__gui_refresh_time, self.update_window)
+        return self.cam_controller.camera_number if preview_camera == "Main" else int(preview_camera)
 
     def toggle_surveillance_button_antispam(self, iteration):
         if iteration > 0:
@@ -435,8 +498,13 @@ class SecurityCameraApp(tk.Tk):
         self.set_preview_img(background)
 
     def set_preview_img(self, img):
-        self.__displayed_img = ImageTk.PhotoImage(image=img)
-        self.__canvas.create_image(0, 0, image=self.__displayed_img, anchor=tk.NW)
+        if img.size != (self.__img_width, self.__img_height):
+            img = img.resize(size=(self.__img_width, self.__img_height))
+
+        self.__displayed_img.paste(img)
+
+    def paste_preview_frame(self, rgb_frame):
+        self.__displayed_img.paste(Image.fromarray(rgb_frame))
 
     @staticmethod
     def open_recordings_folder():
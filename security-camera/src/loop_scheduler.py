@@ -0,0 +1,166 @@
+import logging
+import time
+from collections import deque
+
+
+class LoopScheduler:
+    """
+    Class responsible for pacing the surveillance loop. Each iteration has a deadline one frame period after the
+    previous one, so the time spent on processing is not added on top of the delay. The rate at which frames actually
+    arrive is measured, so recordings can be written with it. When processing doesn't fit into the frame period,
+    optional work is shed in a fixed order: preview rendering first, then frequency of motion detection. Recording
+    frames are never dropped by the scheduler.
+    """
+
+    # (preview stride, detection stride) of each shed level - preview/detection runs on every n-th frame
+    shed_levels = ((1, 1), (3, 1), (6, 1), (6, 2), (6, 3))
+
+    def __init__(self, fps, high_load=0.9, low_load=0.6, smoothing=0.1, no_measured_frames=64, clock=time.perf_counter,
+                 sleep=time.sleep):
+        """
+        :param fps target number of loop iterations per second
+        :param high_load share of the frame period taken by processing, above which more work is shed
+        :param low_load share of the frame period taken by processing, below which less work is shed
+        :param smoothing weight of the latest iteration in the smoothed load
+        :param no_measured_frames number of the most recent frames the rate is measured over
+        :param clock function returning current time in seconds, used for deadlines and frame times
+        :param sleep function sleeping for given number of seconds
+        """
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.fps = fps
+        self.high_load = high_load
+        self.low_load = low_load
+        self.smoothing = smoothing
+        self.__clock = clock
+        self.__sleep = sleep
+
+        self.load = 0.0
+        self.shed_level = 0
+        self.no_late_iterations = 0
+        self.__frame_times = deque(maxlen=no_measured_frames)
+        self.__next_deadline = None
+        self.__iteration = 0
+        self.__last_shed_level_change = 0
+
+    @property
+    def frame_period(self):
+        return 1 / self.fps
+
+    @property
+    def preview_stride(self):
+        return self.shed_levels[self.shed_level][0]
+
+    @property
+    def detection_stride(self):
+        return self.shed_levels[self.shed_level][1]
+
+    def add_frame(self, frame_time=None):
+        """
+        Records arrival of a new frame, used to measure the capture rate.
+        :return: None
+        """
+
+        self.__frame_times.append(self.__clock() if frame_time is None else frame_time)
+
+    def get_measured_fps(self):
+        """
+        :return: rate at which frames arrived recently, None if it wasn't measured yet
+        """
+
+        if len(self.__frame_times) < 2 or self.__frame_times[-1] <= self.__frame_times[0]:
+            return None
+
+        return (len(self.__frame_times) - 1) / (self.__frame_times[-1] - self.__frame_times[0])
+
+    def get_recording_fps(self):
+        """
+        :return: measured rate rounded to 0.1 and limited to the target fps, target fps if it wasn't measured yet
+        """
+
+        measured_fps = self.get_measured_fps()
+
+        if measured_fps is None or len(self.__frame_times) < self.__frame_times.maxlen // 2:
+            return self.fps
+
+        return max(1.0, min(round(measured_fps, 1), float(self.fps)))
+
+    def should_render_preview(self):
+        return self.__iteration % self.preview_stride == 0
+
+    def should_detect_motion(self):
+        return self.__iteration % self.detection_stride == 0
+
+    def end_iteration(self, busy_time):
+        """
+        Updates the load with processing time of the iteration and waits until the deadline of the next iteration.
+        :param busy_time time in seconds spent on processing, without waiting for the frame
+        :return: None
+        """
+
+        self.update_load(busy_time)
+        self.wait_for_deadline()
+
+    def update_load(self, busy_time):
+        self.load += self.smoothing * (busy_time / self.frame_period - self.load)
+        self.update_shed_level()
+        self.__iteration += 1
+
+    def wait_for_deadline(self):
+        """
+        Sleeps until the deadline of the next iteration. If the loop is late by more than a frame period, the deadline
+        is reset instead of catching up with a burst of iterations.
+        :return: None
+        """
+
+        now = self.__clock()
+
+        if self.__next_deadline is None:
+            self.__next_deadline = now
+
+        self.__next_deadline += self.frame_period
+
+        if self.__next_deadline > now:
+            self.__sleep(self.__next_deadline - now)
+        else:
+            self.no_late_iterations += 1
+
+            if now - self.__next_deadline > self.frame_period:
+                self.__next_deadline = now
+
+    def update_shed_level(self):
+        """
+        Sheds one more level of optional work if the load is high, restores one if it is low. Level changes at most
+        once per second, so the effect of the previous change can be seen in the load.
+        :return: None
+        """
+
+        if self.__iteration - self.__last_shed_level_change < self.fps:
+            return
+
+        shed_level = self.shed_level
+
+        if self.load > self.high_load and shed_level < len(self.shed_levels) - 1:
+            shed_level += 1
+        elif self.load < self.low_load and shed_level > 0:
+            shed_level -= 1
+
+        if shed_level != self.shed_level:
+            self.__logger.info(f"loop load {self.load:.2f}, shed level changed from {self.shed_level} to {shed_level}")
+
+            self.shed_level = shed_level
+            self.__last_shed_level_change = self.__iteration
+
+    def get_stats(self):
+        """
+        :return: dict with load, shed level, number of late iterations and measured fps
+        """
+
+        measured_fps = self.get_measured_fps()
+
+        return {"load": round(self.load, 3),
+                "shed_level": self.shed_level,
+                "late_iterations": self.no_late_iterations,
+                "measured_fps": None if measured_fps is None else round(measured_fps, 2)}
@@ -0,0 +1,253 @@
+import json
+import logging
+import time
+import numpy as np
+from threading import Lock, Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RollingHistogram:
+    """
+    Latencies of the most recent samples kept in a preallocated ring, percentiles are computed only when a summary is
+    requested.
+    """
+
+    def __init__(self, size=1024):
+        self.__samples = np.zeros(size, np.float64)
+        self.__index = 0
+        self.no_samples = 0
+        self.total = 0.0
+        self.__lock = Lock()
+
+    def add(self, value):
+        with self.__lock:
+            self.__samples[self.__index] = value
+            self.__index = (self.__index + 1) % len(self.__samples)
+            self.no_samples += 1
+            self.total += value
+
+    def get_summary(self):
+        """
+        :return: dict with number of all samples and mean, p50, p90, p99 and max of the recent samples in ms
+        """
+
+        with self.__lock:
+            samples = self.__samples[:min(self.no_samples, len(self.__samples))].copy()
+            no_samples = self.no_samples
+
+        if len(samples) == 0:
+            return {"count": 0}
+
+        p50, p90, p99 = np.percentile(samples, (50, 90, 99)) * 1000
+
+        return {"count": no_samples,
+                "mean_ms": round(float(np.mean(samples)) * 1000, 3),
+                "p50_ms": round(float(p50), 3),
+                "p90_ms": round(float(p90), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(np.max(samples)) * 1000, 3)}
+
+
+class StageTimer:
+    """
+    Context manager adding duration of the stage to its histogram.
+    """
+
+    __slots__ = ("histogram", "start_time")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.add(time.perf_counter() - self.start_time)
+
+
+class Metrics:
+    """
+    Class responsible for collecting latencies of pipeline stages, counters and gauges. Gauges are functions called
+    only when a snapshot is taken, so values already counted elsewhere (e.g. captured frames) cost nothing per frame.
+    """
+
+    def __init__(self, labels=None, histogram_size=1024):
+        """
+        :param labels dict of labels added to exported metrics, e.g. camera number
+        """
+
+        self.labels = labels or {}
+        self.histogram_size = histogram_size
+
+        self.__histograms = {}
+        self.__timers = {}
+        self.__counters = {}
+        self.__gauges = {}
+        self.__lock = Lock()
+
+    def get_histogram(self, name):
+        histogram = self.__histograms.get(name)
+
+        if histogram is None:
+            with self.__lock:
+                histogram = self.__histograms.setdefault(name, RollingHistogram(self.histogram_size))
+
+        return histogram
+
+    def time_stage(self, name):
+        """
+        Timers are reused, so a stage must not be timed from several threads at once.
+        :return: context manager measuring duration of the stage
+        """
+
+        timer = self.__timers.get(name)
+
+        if timer is None:
+            timer = self.__timers[name] = StageTimer(self.get_histogram(name))
+
+        return timer
+
+    def observe(self, name, duration):
+        self.get_histogram(name).add(duration)
+
+    def increment(self, name, value=1):
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def register_gauge(self, name, function):
+        """
+        :param function function returning a number or a dict of numbers, called when a snapshot is taken
+        """
+
+        self.__gauges[name] = function
+
+    def get_gauges(self):
+        gauges = {}
+
+        for name, function in list(self.__gauges.items()):
+            try:
+                value = function()
+            except Exception:
+                logging.getLogger("security_camera_logger").exception(f"failed to read gauge: {name}")
+                continue
+
+            if isinstance(value, dict):
+                gauges.update({f"{name}_{key}": item for key, item in value.items() if item is not None})
+            elif value is not None:
+                gauges[name] = value
+
+        return gauges
+
+    def get_snapshot(self):
+        """
+        :return: dict with labels, counters, gauges and latency summaries of stages
+        """
+
+        with self.__lock:
+            counters = dict(self.__counters)
+            histograms = dict(self.__histograms)
+
+        return {"time": time.time(),
+                "labels": self.labels,
+                "counters": counters,
+                "gauges": self.get_gauges(),
+                "latencies": {name: histogram.get_summary() for name, histogram in histograms.items()}}
+
+    def get_prometheus_text(self):
+        """
+        :return: snapshot in Prometheus text exposition format
+        """
+
+        snapshot = self.get_snapshot()
+        labels = ",".join(f'{key}="{value}"' for key, value in self.labels.items())
+        lines = []
+
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"security_camera_{name}_total{{{labels}}} {value}")
+
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"security_camera_{name}{{{labels}}} {float(value)}")
+
+        stage_labels = labels + "," if labels else ""
+        for name, summary in sorted(snapshot["latencies"].items()):
+            if summary["count"] == 0:
+                continue
+
+            for quantile in ("50", "90", "99"):
+                lines.append(f'security_camera_stage_latency_seconds{{{stage_labels}stage="{name}",'
+                             f'quantile="0.{quantile}"}} {summary[f"p{quantile}_ms"] / 1000}')
+
+            lines.append(f'security_camera_stage_latency_seconds_count{{{stage_labels}stage="{name}"}} '
+                         f'{summary["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    HTTP server exposing metrics on localhost: /metrics in Prometheus text format, /metrics.json as JSON.
+    """
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.__server = None
+        self.__thread = None
+
+    def start(self):
+        """
+        :return: True on success, False if the server couldn't be started (e.g. port is in use)
+        """
+
+        metrics = self.metrics
+        logger = self.__logger
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = metrics.get_prometheus_text().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(metrics.get_snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, message_format, *args):
+                logger.debug("metrics server: " + message_format % args)
+
+        try:
+            self.__server = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+        except OSError:
+            self.__logger.exception(f"failed to start metrics server on port {self.port}")
+            return False
+
+        self.__server.daemon_threads = True
+        self.port = self.__server.server_address[1]
+        self.__thread = Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+        self.__logger.info(f"metrics server started on http://{self.host}:{self.port}/metrics")
+
+        return True
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+            self.__logger.info("metrics server stopped")
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+
+class MotionAnalysis:
+    """
+    Class responsible for storing results of motion analysis performed on a single captured frame. Blobs of motion
+    are extracted from the motion mask in one native call, their areas, bounding boxes and centroids are kept as NumPy
+    arrays in full-frame coordinates.
+    """
+
+    def __init__(self, sequence_number, motion_mask, detection_scale):
+        self.sequence_number = sequence_number
+        self.detection_scale = detection_scale
+
+        # binary mask of detected motion in the downscaled detection proxy
+        self.__motion_mask = motion_mask
+
+        # blobs are labeled only inside the bounding rectangle of motion, which is much cheaper for sparse masks
+        x, y, w, h = cv2.boundingRect(motion_mask)
+        self.__labels_offset = (x, y)
+
+        if w == 0 or h == 0:
+            self.__labels = None
+            stats = np.zeros((0, 5), np.int32)
+            centroids = np.zeros((0, 2), np.float64)
+        else:
+            # label 0 is the background
+            _, self.__labels, stats, centroids = cv2.connectedComponentsWithStats(motion_mask[y:y + h, x:x + w],
+                                                                                  connectivity=8)
+            stats = stats[1:]
+            stats[:, cv2.CC_STAT_LEFT] += x
+            stats[:, cv2.CC_STAT_TOP] += y
+            centroids = centroids[1:] + (x, y)
+
+        self.areas = stats[:, cv2.CC_STAT_AREA] / detection_scale ** 2
+        self.bounding_boxes = np.rint(stats[:, :4] / detection_scale).astype(np.int32)
+        self.centroids = centroids / detection_scale
+
+        self.__contours = None
+        self.__min_area = None
+        self.__min_area_selection = None
+        self.__contours_with_min_area = None
+
+    def get_min_area_selection(self, min_area):
+        """
+        Selects blobs by their area. Selection is reused until min area changes.
+        :param min_area minimal area in full-frame pixels
+        :return: boolean array, True for blobs with min area
+        """
+
+        if self.__min_area_selection is None or self.__min_area != min_area:
+            self.__min_area_selection = self.areas >= min_area
+            self.__min_area = min_area
+            self.__contours_with_min_area = None
+
+        return self.__min_area_selection
+
+    def has_motion(self, min_area):
+        """
+        Checks if there is a blob with min area.
+        :return: True if blob with min area exists, False otherwise
+        """
+
+        return bool(np.any(self.get_min_area_selection(min_area)))
+
+    def get_bounding_boxes_with_min_area(self, min_area):
+        """
+        :return: array with (x, y, w, h) rows of blobs with min area
+        """
+
+        return self.bounding_boxes[self.get_min_area_selection(min_area)]
+
+    @property
+    def contours(self):
+        """
+        Contours of all blobs in full-frame coordinates, found only when requested.
+        """
+
+        if self.__contours is None:
+            self.__contours = self.find_contours(self.__motion_mask)
+
+        return self.__contours
+
+    def get_contours_with_min_area(self, min_area):
+        """
+        Finds contours of blobs with min area. Contours are found only when requested, result is reused until min area
+        changes.
+        :param min_area minimal area in full-frame pixels
+        :return: tuple with contours in full-frame coordinates
+        """
+
+        min_area_selection = self.get_min_area_selection(min_area)
+
+        if self.__contours_with_min_area is None:
+            if np.all(min_area_selection):
+                self.__contours_with_min_area = self.contours
+            elif not np.any(min_area_selection):
+                self.__contours_with_min_area = ()
+            else:
+                label_lookup = np.zeros(len(min_area_selection) + 1, np.uint8)
+                label_lookup[1:][min_area_selection] = 255
+                self.__contours_with_min_area = self.find_contours(label_lookup[self.__labels],
+                                                                   offset=self.__labels_offset)
+
+        return self.__contours_with_min_area
+
+    def find_contours(self, mask, offset=(0, 0)):
+        contours = cv2.findContours(mask, mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_SIMPLE, offset=offset)[0]
+
+        if self.detection_scale == 1:
+            return tuple(contours)
+
+        return tuple(np.rint(contour / self.detection_scale).astype(np.int32) for contour in contours)
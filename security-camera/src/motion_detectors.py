@@ -0,0 +1,170 @@
+import cv2
+import numpy as np
+
+
+class MotionDetector:
+    """
+    Base class of motion detection engines. Engine receives blurred gray detection proxy frames and returns binary
+    masks of places where motion was detected.
+    """
+
+    # True if the engine compares two consecutive frames, so the previous frame has to be fed before detection
+    requires_previous_frame = False
+
+    def __init__(self):
+        self.dilation_kernel = np.ones((3, 3), np.uint8)
+
+    def detect(self, blurred_gray_frame, threshold):
+        """
+        Updates the engine with the new frame and looks for motion in it.
+        :param blurred_gray_frame blurred gray detection proxy frame
+        :param threshold minimal difference of pixel intensity (0-255) considered as motion
+        :return: dilated binary mask on success, None if there is not enough data to detect motion yet
+        """
+
+        foreground_mask = self.get_foreground_mask(blurred_gray_frame, threshold)
+
+        if foreground_mask is not None:
+            return cv2.dilate(foreground_mask, self.dilation_kernel, iterations=1)
+
+    def get_foreground_mask(self, blurred_gray_frame, threshold):
+        raise NotImplementedError
+
+    def update(self, blurred_gray_frame):
+        """
+        Updates the engine with the frame without looking for motion in it.
+        :return: None
+        """
+
+        self.get_foreground_mask(blurred_gray_frame, 255)
+
+    def reset(self):
+        """
+        Discards all frames the engine has seen.
+        :return: None
+        """
+
+        raise NotImplementedError
+
+
+class FrameDifferenceDetector(MotionDetector):
+    """
+    Detects motion by comparing two consecutive frames.
+    """
+
+    requires_previous_frame = True
+
+    def __init__(self):
+        super().__init__()
+
+        self.__previous_frame = None
+
+    def get_foreground_mask(self, blurred_gray_frame, threshold):
+        previous_frame = self.__previous_frame
+        self.__previous_frame = blurred_gray_frame
+
+        if previous_frame is None or previous_frame.shape != blurred_gray_frame.shape:
+            return None
+
+        gray_diff = cv2.absdiff(blurred_gray_frame, previous_frame)
+
+        return cv2.threshold(gray_diff, thresh=threshold, maxval=255, type=cv2.THRESH_BINARY)[1]
+
+    def reset(self):
+        self.__previous_frame = None
+
+
+class RunningAverageDetector(MotionDetector):
+    """
+    Detects motion by comparing the frame with background model updated as a running average of previous frames.
+    """
+
+    def __init__(self, learning_rate=0.05):
+        super().__init__()
+
+        self.learning_rate = learning_rate
+        self.__background = None
+
+    def get_foreground_mask(self, blurred_gray_frame, threshold):
+        if self.__background is None or self.__background.shape != blurred_gray_frame.shape:
+            self.__background = blurred_gray_frame.astype(np.float32)
+            return None
+
+        gray_diff = cv2.absdiff(blurred_gray_frame, cv2.convertScaleAbs(self.__background))
+        cv2.accumulateWeighted(blurred_gray_frame, self.__background, self.learning_rate)
+
+        return cv2.threshold(gray_diff, thresh=threshold, maxval=255, type=cv2.THRESH_BINARY)[1]
+
+    def reset(self):
+        self.__background = None
+
+
+class BackgroundSubtractorDetector(MotionDetector):
+    """
+    Detects motion with one of OpenCV's background subtractors, which keep per-pixel statistical background model.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.__background_subtractor = None
+        self.__frame_shape = None
+
+    def create_background_subtractor(self):
+        raise NotImplementedError
+
+    def set_threshold(self, background_subtractor, threshold):
+        raise NotImplementedError
+
+    def get_foreground_mask(self, blurred_gray_frame, threshold):
+        if self.__background_subtractor is None or self.__frame_shape != blurred_gray_frame.shape:
+            self.__background_subtractor = self.create_background_subtractor()
+            self.__frame_shape = blurred_gray_frame.shape
+
+        self.set_threshold(self.__background_subtractor, threshold)
+
+        return self.__background_subtractor.apply(blurred_gray_frame)
+
+    def reset(self):
+        self.__background_subtractor = None
+        self.__frame_shape = None
+
+
+class MOG2Detector(BackgroundSubtractorDetector):
+    """
+    Detects motion with Gaussian mixture background model. Threshold is used as squared Mahalanobis distance, so max
+    detection sensitivity is close to OpenCV's default.
+    """
+
+    def create_background_subtractor(self):
+        return cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+
+    def set_threshold(self, background_subtractor, threshold):
+        background_subtractor.setVarThreshold(threshold)
+
+
+class KNNDetector(BackgroundSubtractorDetector):
+    """
+    Detects motion with K-nearest neighbours background model. Threshold is used as distance of pixel intensities.
+    """
+
+    def create_background_subtractor(self):
+        return cv2.createBackgroundSubtractorKNN(detectShadows=False)
+
+    def set_threshold(self, background_subtractor, threshold):
+        background_subtractor.setDist2Threshold(threshold ** 2)
+
+
+motion_detectors = {"Frame difference": FrameDifferenceDetector,
+                    "Running average": RunningAverageDetector,
+                    "MOG2": MOG2Detector,
+                    "KNN": KNNDetector}
+
+
+def create_motion_detector(name):
+    """
+    Creates motion detection engine with given name.
+    :return: MotionDetector, FrameDifferenceDetector if name is unknown
+    """
+
+    return motion_detectors.get(name, FrameDifferenceDetector)()
@@ -0,0 +1,138 @@
+import cv2
+import logging
+import time
+import numpy as np
+from threading import Thread, Lock, Event
+
+
+class PreviewRenderer(Thread):
+    """
+    Thread responsible for preparing preview frames off the GUI thread. A preview-sized RGB image is rendered only
+    when a new frame of the previewed camera is available or the previewed source changes, at most preview fps times
+    per second. Images are rendered into two preallocated buffers: one is being written while the other one is read.
+    """
+
+    def __init__(self, get_frame, width, height, preview_fps=30):
+        """
+        :param get_frame function taking camera number, mode and sequence number of the last rendered frame and
+        returning tuple (sequence number, frame), frame is None if there is no newer one
+        :param preview_fps max number of preview frames rendered per second
+        """
+
+        super().__init__(daemon=True)
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.__get_frame = get_frame
+        self.width = width
+        self.height = height
+        self.preview_fps = preview_fps
+
+        # previewed source, set by the GUI
+        self.camera_number = None
+        self.mode = None
+        self.enabled = False
+
+        # front buffer is read by the GUI, back buffer is written by the thread
+        self.__front_buffer = np.zeros((height, width, 3), np.uint8)
+        self.__back_buffer = np.zeros((height, width, 3), np.uint8)
+        self.__resize_buffer = np.empty((height, width, 3), np.uint8)
+        self.__lock = Lock()
+        self.__stopped = Event()
+
+        self.sequence_number = 0
+        self.__source = None
+        self.__source_sequence_number = 0
+
+        # counters
+        self.no_rendered_frames = 0
+
+    def run(self):
+        self.__logger.info("preview renderer started")
+
+        next_deadline = time.perf_counter()
+
+        while not self.__stopped.is_set():
+            try:
+                self.render_new_frame()
+            except Exception:
+                self.__logger.exception("failed to render preview frame")
+
+            next_deadline = max(next_deadline + 1 / max(self.preview_fps, 1), time.perf_counter())
+            self.__stopped.wait(next_deadline - time.perf_counter())
+
+        self.__logger.info("preview renderer stopped")
+
+    def stop(self):
+        self.__stopped.set()
+
+    def set_source(self, camera_number, mode, enabled=True):
+        self.camera_number = camera_number
+        self.mode = mode
+        self.enabled = enabled
+
+    def render_new_frame(self):
+        """
+        Renders frame of the previewed source into the back buffer and swaps buffers, if there is a new frame.
+        :return: True if a new preview frame was rendered
+        """
+
+        source = (self.camera_number, self.mode)
+
+        if not self.enabled or source[0] is None:
+            return False
+
+        if source != self.__source:
+            # other source is previewed, its current frame is rendered even if it was seen before
+            self.__source = source
+            self.__source_sequence_number = 0
+
+        source_sequence_number, frame = self.__get_frame(source[0], source[1], self.__source_sequence_number)
+
+        if frame is None:
+            return False
+
+        self.__source_sequence_number = source_sequence_number
+        self.render(frame, self.__back_buffer)
+
+        with self.__lock:
+            self.__front_buffer, self.__back_buffer = self.__back_buffer, self.__front_buffer
+            self.sequence_number += 1
+            self.no_rendered_frames += 1
+
+        return True
+
+    def render(self, frame, out):
+        """
+        Resizes BGR frame to preview size and converts it to RGB.
+        :return: None
+        """
+
+        if frame.ndim == 2:
+            resized_frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(resized_frame, cv2.COLOR_GRAY2RGB, dst=out)
+            return
+
+        if frame.shape[:2] == (self.height, self.width):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+            return
+
+        # resized before conversion, so that only preview-sized image is converted
+        interpolation = cv2.INTER_AREA if frame.shape[1] > self.width else cv2.INTER_LINEAR
+        cv2.resize(frame, (self.width, self.height), dst=self.__resize_buffer, interpolation=interpolation)
+        cv2.cvtColor(self.__resize_buffer, cv2.COLOR_BGR2RGB, dst=out)
+
+    def read_frame(self, last_sequence_number, consume):
+        """
+        Passes the latest preview frame to the function, if it is newer than the last read one. The frame is valid
+        only during the call, it must be copied to be kept.
+        :param consume function taking RGB image of preview size
+        :return: sequence number of the latest preview frame
+        """
+
+        with self.__lock:
+            if self.sequence_number != last_sequence_number:
+                consume(self.__front_buffer)
+
+            return self.sequence_number
@@ -0,0 +1,322 @@
+import cv2
+import logging
+import time
+from collections import deque
+from threading import Thread, Condition
+
+
+class BoundedFrameQueue:
+    """
+    Blocking queue of frames with limited size. When the queue is full, put either blocks until there is space,
+    drops the oldest queued frame or drops the new frame, depending on the overflow policy.
+    """
+
+    overflow_policies = ("Block", "Drop oldest", "Drop newest")
+
+    def __init__(self, max_size, overflow_policy="Block"):
+        if overflow_policy not in self.overflow_policies:
+            raise ValueError(f"unknown overflow policy: {overflow_policy}")
+
+        self.max_size = max(1, int(max_size))
+        self.overflow_policy = overflow_policy
+
+        self.__frames = deque()
+        self.__condition = Condition()
+        self.__closed = False
+
+        # counters
+        self.no_put_frames = 0
+        self.no_dropped_frames = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.__frames)
+
+    def put(self, frame):
+        """
+        Adds the frame to the queue, applying the overflow policy if the queue is full.
+        :return: True if the frame was queued, False if it was dropped or the queue is closed
+        """
+
+        with self.__condition:
+            if self.__closed:
+                return False
+
+            if len(self.__frames) >= self.max_size:
+                if self.overflow_policy == "Drop newest":
+                    self.no_dropped_frames += 1
+                    return False
+                elif self.overflow_policy == "Drop oldest":
+                    self.__frames.popleft()
+                    self.no_dropped_frames += 1
+                else:
+                    while len(self.__frames) >= self.max_size and not self.__closed:
+                        self.__condition.wait()
+
+                    if self.__closed:
+                        return False
+
+            self.__frames.append(frame)
+            self.no_put_frames += 1
+            self.max_depth = max(self.max_depth, len(self.__frames))
+            self.__condition.notify_all()
+
+            return True
+
+    def get(self, timeout=None):
+        """
+        Takes the oldest frame from the queue, waits if the queue is empty. After the queue is closed, remaining
+        frames are still returned.
+        :return: frame, None on timeout or if the queue is closed and empty
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.__condition:
+            while len(self.__frames) == 0:
+                if self.__closed:
+                    return None
+
+                remaining_time = None if deadline is None else deadline - time.monotonic()
+                if remaining_time is not None and remaining_time <= 0:
+                    return None
+
+                self.__condition.wait(remaining_time)
+
+            frame = self.__frames.popleft()
+            self.__condition.notify_all()
+
+            return frame
+
+    def close(self, discard=False):
+        """
+        Stops accepting frames and wakes up all waiting threads.
+        :param discard if True, queued frames are dropped
+        :return: None
+        """
+
+        with self.__condition:
+            self.__closed = True
+
+            if discard:
+                self.no_dropped_frames += len(self.__frames)
+                self.__frames.clear()
+
+            self.__condition.notify_all()
+
+
+class RecordingWriter:
+    """
+    Base class of writers, which encode recordings in a background thread fed through a bounded queue, so that
+    encoding doesn't stall capture and detection.
+    """
+
+    def __init__(self, max_queue_size, overflow_policy, name):
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.name = name
+        self.frame_queue = BoundedFrameQueue(max_queue_size, overflow_policy)
+        self.__thread = Thread(target=self.write_frames, daemon=True)
+
+        self.no_written_frames = 0
+
+    def start(self):
+        self.__thread.start()
+
+    def put(self, frame):
+        """
+        Queues the frame for writing.
+        :return: True if the frame was queued, False if it was dropped
+        """
+
+        return self.frame_queue.put(frame)
+
+    def write_frames(self):
+        raise NotImplementedError
+
+    def write_frame(self, output, frame):
+        try:
+            output.write(frame)
+            self.no_written_frames += 1
+        except cv2.error:
+            self.__logger.exception(f"failed to write frame to {self.name}")
+
+    def release_output(self, output):
+        """
+        :return: True on success, False if releasing the output failed
+        """
+
+        try:
+            output.release()
+        except cv2.error:
+            self.__logger.exception(f"failed to release {self.name} output")
+            return False
+
+        return True
+
+    def stop_writing(self, drain=True):
+        """
+        Stops accepting frames and waits until the writing thread finishes.
+        :param drain if True, all queued frames are written, otherwise they are dropped
+        :return: None
+        """
+
+        self.frame_queue.close(discard=not drain)
+
+        if self.__thread.is_alive():
+            self.__thread.join()
+
+    def get_stats(self):
+        """
+        :return: dict with queue depth, number of written and dropped frames
+        """
+
+        return {"queue_depth": len(self.frame_queue),
+                "max_queue_depth": self.frame_queue.max_depth,
+                "written_frames": self.no_written_frames,
+                "dropped_frames": self.frame_queue.no_dropped_frames}
+
+
+class EmergencyRecordingWriter(RecordingWriter):
+    """
+    Class responsible for writing emergency recording in a background thread. Frames of the emergency buffer are
+    written first, then frames passed by put.
+    """
+
+    def __init__(self, output, emergency_buffer, max_queue_size, overflow_policy):
+        super().__init__(max_queue_size, overflow_policy, "emergency recording")
+
+        self.__output = output
+        self.__emergency_buffer = emergency_buffer
+
+    def write_frames(self):
+        for frame in self.__emergency_buffer.drain():
+            self.write_frame(self.__output, frame)
+
+        frame = self.frame_queue.get()
+
+        while frame is not None:
+            self.write_frame(self.__output, frame)
+            frame = self.frame_queue.get()
+
+    def stop(self, drain=True):
+        """
+        Stops accepting frames, waits until the writing thread finishes and releases the output.
+        :param drain if True, all queued frames are written before the output is released, otherwise they are dropped
+        :return: True on success, False if releasing the output failed
+        """
+
+        self.stop_writing(drain)
+
+        return self.release_output(self.__output)
+
+
+class RecordingSegment:
+    """
+    Finished segment of standard recording with capture times of its first and last frame.
+    """
+
+    def __init__(self, file_path, start_time, end_time, no_frames):
+        self.file_path = file_path
+        self.start_time = start_time
+        self.end_time = end_time
+        self.no_frames = no_frames
+
+
+class StandardRecordingWriter(RecordingWriter):
+    """
+    Class responsible for writing continuous standard recording in a background thread. Recording is split into
+    segments of given number of frames; outputs of segments are opened and released by the writing thread.
+    """
+
+    def __init__(self, open_output, max_queue_size, overflow_policy, segment_frames=0, on_segment_finished=None):
+        """
+        :param open_output function taking capture time of the first frame and returning tuple (output, file path)
+        of a new segment, called by the writing thread
+        :param segment_frames number of frames of a segment, 0 for a single segment
+        :param on_segment_finished function called with RecordingSegment after its output is released
+        """
+
+        super().__init__(max_queue_size, overflow_policy, "standard recording")
+
+        self.__open_output = open_output
+        self.__on_segment_finished = on_segment_finished
+        self.segment_frames = segment_frames
+        self.no_segments = 0
+        self.__released = True
+        self.__rollover_time = None
+
+    def put(self, frame, capture_time=None):
+        """
+        Queues the frame for writing.
+        :param capture_time time of capturing the frame, current time if not given
+        :return: True if the frame was queued, False if it was dropped
+        """
+
+        return self.frame_queue.put((frame, time.time() if capture_time is None else capture_time))
+
+    def request_rollover(self, after_time):
+        """
+        Requests the current segment to end with the first frame captured at given time or later, so that the frames
+        until then are in finished segments as soon as possible.
+        :return: None
+        """
+
+        self.__rollover_time = after_time
+
+    def write_frames(self):
+        output = None
+        file_path = None
+        start_time = None
+        no_segment_frames = 0
+        item = self.frame_queue.get()
+
+        while item is not None:
+            frame, capture_time = item
+
+            if output is None:
+                output, file_path = self.__open_output(capture_time)
+                start_time = capture_time
+                self.no_segments += 1
+                self.__released = False
+
+            self.write_frame(output, frame)
+            no_segment_frames += 1
+
+            rollover_time = self.__rollover_time
+            if 0 < self.segment_frames <= no_segment_frames or (rollover_time is not None and
+                                                                 capture_time >= rollover_time):
+                self.__rollover_time = None
+                self.finish_segment(output, file_path, start_time, capture_time, no_segment_frames)
+                output = None
+                no_segment_frames = 0
+
+            end_time = capture_time
+            item = self.frame_queue.get()
+
+        if output is not None:
+            self.finish_segment(output, file_path, start_time, end_time, no_segment_frames)
+
+    def finish_segment(self, output, file_path, start_time, end_time, no_frames):
+        self.__released = self.release_output(output)
+
+        if self.__on_segment_finished is not None:
+            self.__on_segment_finished(RecordingSegment(file_path, start_time, end_time, no_frames))
+
+    def stop(self, drain=True):
+        """
+        Stops accepting frames, waits until the writing thread finishes and releases the output of the last segment.
+        :param drain if True, all queued frames are written before the output is released, otherwise they are dropped
+        :return: True on success, False if releasing the output failed
+        """
+
+        self.stop_writing(drain)
+
+        return self.__released
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["segments"] = self.no_segments
+
+        return stats
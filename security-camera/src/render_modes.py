@@ -0,0 +1,235 @@
+import cv2
+import numpy as np
+from threading import local
+
+
+class RenderStep:
+    """
+    Base class of steps of render modes. Step takes BGR image and returns rendered BGR image of the same size. Kernels
+    and lookup tables of steps are prepared once, when the step is created.
+    """
+
+    # True if the step draws on the image instead of producing a new one, it gets a private writable image
+    in_place = False
+    # True if the step, when it is the first one, renders the old frame instead of the new one
+    uses_old_frame = False
+
+    def apply(self, image, out, frame, camera, sequence_number):
+        """
+        :param image BGR image rendered by the previous step or the image of the frame
+        :param out preallocated output of the same shape as image, None if a new image should be returned
+        :param frame Frame, if the image is its unmodified image (so that memoised gray views can be used), else None
+        :param camera Camera the frame was captured by
+        :param sequence_number sequence number of the rendered frame
+        :return: rendered image
+        """
+
+        raise NotImplementedError
+
+    @staticmethod
+    def get_gray(image, frame):
+        return frame.gray if frame is not None else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class IdentityStep(RenderStep):
+    def apply(self, image, out, frame, camera, sequence_number):
+        return image
+
+
+class KernelStep(RenderStep):
+    def __init__(self, kernel):
+        self.kernel = np.asarray(kernel, np.float32)
+
+    def apply(self, image, out, frame, camera, sequence_number):
+        return cv2.filter2D(image, -1, self.kernel, dst=out)
+
+
+class LutStep(RenderStep):
+    def __init__(self, lut):
+        self.lut = np.asarray(lut, np.uint8).reshape(1, 256)
+
+    def apply(self, image, out, frame, camera, sequence_number):
+        return cv2.LUT(image, self.lut, dst=out)
+
+
+class GrayStep(RenderStep):
+    def apply(self, image, out, frame, camera, sequence_number):
+        return cv2.cvtColor(self.get_gray(image, frame), cv2.COLOR_GRAY2BGR, dst=out)
+
+
+class HighContrastStep(RenderStep):
+    def apply(self, image, out, frame, camera, sequence_number):
+        if frame is not None:
+            blurred_gray = frame.blurred_gray
+        else:
+            blurred_gray = cv2.GaussianBlur(self.get_gray(image, frame), (3, 3), sigmaX=0)
+
+        return cv2.cvtColor(cv2.equalizeHist(blurred_gray), cv2.COLOR_GRAY2BGR, dst=out)
+
+
+class EdgesStep(RenderStep):
+    def apply(self, image, out, frame, camera, sequence_number):
+        edges = cv2.Canny(self.get_gray(image, frame), threshold1=50, threshold2=150)
+
+        return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR, dst=out)
+
+
+class MotionOverlayStep(RenderStep):
+    """
+    Draws detected motion on the image. As the first step, it draws on the old frame, like the motion modes always
+    did. Motion is drawn with the analysis of the rendered frame, not with the latest one.
+    """
+
+    in_place = True
+    uses_old_frame = True
+
+    def __init__(self, draw):
+        """
+        :param draw function taking the camera, a writable image and sequence number of the rendered frame and
+        drawing motion on it
+        """
+
+        self.draw = draw
+
+    def apply(self, image, out, frame, camera, sequence_number):
+        return self.draw(camera, image, sequence_number)
+
+
+class RenderChain:
+    """
+    Render mode made of steps applied one after another, e.g. "Gray -> Sharpened -> Motion rectangles". Intermediate
+    images are written into buffers preallocated per thread and reused for the following frames. Only the final image
+    is newly allocated, as it is shared with recordings and preview after rendering.
+    """
+
+    separators = ("->", "→")
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+        # steps from this index on draw in place, so the image they get is the final one
+        self.__final_index = len(self.steps)
+        while self.__final_index > 0 and self.steps[self.__final_index - 1].in_place:
+            self.__final_index -= 1
+
+        self.draws_motion = any(isinstance(step, MotionOverlayStep) for step in self.steps)
+        self.__buffers = local()
+
+    def get_output(self, index, image):
+        """
+        :return: preallocated buffer for the output of the step, None if the output is the final image
+        """
+
+        if index >= self.__final_index:
+            return None
+
+        buffers = self.__buffers.__dict__
+        key = (index, image.shape, image.dtype)
+        buffer = buffers.get(key)
+
+        if buffer is None:
+            buffer = buffers[key] = np.empty_like(image)
+
+        return buffer
+
+    def render(self, frame_new, frame_old, camera):
+        """
+        :return: rendered image, None if the rendered frame is invalid
+        """
+
+        frame = frame_old if self.steps[0].uses_old_frame else frame_new
+
+        if frame is None or not frame.valid:
+            return None
+
+        sequence_number = frame_new.sequence_number
+
+        image = frame.image
+        is_private = False
+        buffer = None
+
+        for index, step in enumerate(self.steps):
+            if step.in_place and not is_private:
+                out = self.get_output(index, image)
+                if out is None:
+                    image = image.copy()
+                else:
+                    np.copyto(out, image)
+                    image = buffer = out
+
+                frame = None
+                is_private = True
+
+            out = None if step.in_place else self.get_output(index + 1, image)
+            rendered_image = step.apply(image, out, frame, camera, sequence_number)
+
+            if rendered_image is not image:
+                frame = None
+                is_private = True
+
+                if rendered_image is out:
+                    buffer = out
+
+            image = rendered_image
+
+        # trailing steps may return their input, e.g. "Gray -> Standard"
+        return image.copy() if image is buffer else image
+
+
+# kernels and lookup tables are prepared once, modes made of several steps are kept as tuples of steps
+render_steps = {"Standard": IdentityStep(),
+                "Sharpened": KernelStep([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]),
+                "Mexican hat": KernelStep([[0, 0, -1, 0, 0], [0, -1, -2, -1, 0], [-1, -2, 16, -2, -1],
+                                           [0, -1, -2, -1, 0], [0, 0, -1, 0, 0]]),
+                "Gray": GrayStep(),
+                "High contrast": HighContrastStep(),
+                "Negative": LutStep(255 - np.arange(256)),
+                "Edges": EdgesStep(),
+                "Motion rectangles": MotionOverlayStep(lambda camera, image, sequence_number:
+                                                       camera.draw_motion_rectangles(image, sequence_number)),
+                "Motion contours": MotionOverlayStep(lambda camera, image, sequence_number:
+                                                     camera.draw_motion_contours(image, sequence_number))}
+
+
+def register_render_step(name, step):
+    """
+    Registers the step, so that it can be used as a render mode and in chains of render modes.
+    :param step RenderStep or chain of registered modes, e.g. "Gray -> Sharpened"
+    :return: None
+    """
+
+    if isinstance(step, str):
+        render_chain = create_render_chain(step)
+
+        if render_chain is None:
+            raise ValueError(f"unknown render mode in chain: {step}")
+
+        step = tuple(render_chain.steps)
+
+    render_steps[name] = step
+
+
+def create_render_chain(mode):
+    """
+    Creates render chain from name of the mode, names of steps of a chain are separated by "->" or "→".
+    :return: RenderChain, None if any of the steps is unknown
+    """
+
+    names = [mode]
+    for separator in RenderChain.separators:
+        names = [part for name in names for part in name.split(separator)]
+
+    steps = []
+
+    for name in names:
+        step = render_steps.get(name.strip())
+
+        if step is None:
+            return None
+
+        if isinstance(step, tuple):
+            steps.extend(step)
+        else:
+            steps.append(step)
+
+    return RenderChain(steps)
@@ -0,0 +1,189 @@
+import logging
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedFrameTransport:
+    """
+    Class responsible for passing the latest frame between processes through shared memory. Frames are written into
+    one of several slots in turn (triple buffering by default), so the reader copies the latest complete frame while
+    the writer fills another slot. Each slot has a version counter, which is odd while the slot is written, so that
+    torn reads are detected and retried. Readers also publish a request (e.g. preview mode) with a heartbeat, so the
+    writer can skip rendering when no one is reading.
+    """
+
+    # header fields
+    LATEST_SEQUENCE_NUMBER = 0
+    LATEST_SLOT = 1
+    REQUEST = 2
+    REQUEST_TIME = 3
+    HEADER_SIZE = 4
+
+    # slot header fields
+    SLOT_VERSION = 0
+    SLOT_SEQUENCE_NUMBER = 1
+    SLOT_HEIGHT = 2
+    SLOT_WIDTH = 3
+    SLOT_CHANNELS = 4
+    SLOT_HEADER_SIZE = 5
+
+    def __init__(self, name, max_frame_shape=None, no_slots=3, create=False):
+        """
+        :param name name of the shared memory block
+        :param max_frame_shape (height, width, channels) of the largest frame, needed only to create the block
+        :param create if True, the block is created (the writer's side), otherwise an existing one is attached
+        """
+
+        # logging
+        self.__logger = logging.getLogger("security_camera_logger")
+
+        self.name = name
+        self.is_owner = create
+
+        if create:
+            max_frame_nbytes = int(np.prod(max_frame_shape))
+            size = self.get_header_nbytes(no_slots) + no_slots * max_frame_nbytes
+
+            try:
+                self.__shared_memory = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # left by a worker that crashed
+                self.__logger.warning(f"removing stale shared memory block: {name}")
+                shared_memory.SharedMemory(name).unlink()
+                self.__shared_memory = shared_memory.SharedMemory(name, create=True, size=size)
+
+            self.__header = np.ndarray((2 + self.HEADER_SIZE,), np.int64, self.__shared_memory.buf)
+            self.__header[:] = (no_slots, max_frame_nbytes, 0, -1, -1, 0)
+        else:
+            # worker processes share the resource tracker of the supervisor, so the block is removed by it only if
+            # the owner doesn't remove it
+            self.__shared_memory = shared_memory.SharedMemory(name)
+            self.__header = np.ndarray((2 + self.HEADER_SIZE,), np.int64, self.__shared_memory.buf)
+
+        self.no_slots = int(self.__header[0])
+        self.max_frame_nbytes = int(self.__header[1])
+
+        # header starts with the number of slots and max frame size, fields follow
+        self.__fields = self.__header[2:]
+        self.__slot_headers = np.ndarray((self.no_slots, self.SLOT_HEADER_SIZE), np.int64, self.__shared_memory.buf,
+                                         offset=(2 + self.HEADER_SIZE) * 8)
+        self.__slots = np.ndarray((self.no_slots, self.max_frame_nbytes), np.uint8, self.__shared_memory.buf,
+                                  offset=self.get_header_nbytes(self.no_slots))
+
+        if create:
+            self.__slot_headers[:] = 0
+
+    @classmethod
+    def get_header_nbytes(cls, no_slots):
+        return (2 + cls.HEADER_SIZE + no_slots * cls.SLOT_HEADER_SIZE) * 8
+
+    @property
+    def sequence_number(self):
+        return int(self.__fields[self.LATEST_SEQUENCE_NUMBER])
+
+    def write(self, frame):
+        """
+        Copies the frame into the slot after the latest one and publishes it.
+        :return: True on success, False if the frame doesn't fit into the slot
+        """
+
+        if frame.nbytes > self.max_frame_nbytes or frame.dtype != np.uint8:
+            self.__logger.warning(f"frame {frame.shape} doesn't fit into shared memory block: {self.name}")
+            return False
+
+        slot = (int(self.__fields[self.LATEST_SLOT]) + 1) % self.no_slots
+        slot_header = self.__slot_headers[slot]
+        sequence_number = self.sequence_number + 1
+        # gray frames are stored with 0 channels
+        shape = frame.shape if frame.ndim == 3 else (*frame.shape, 0)
+
+        slot_header[self.SLOT_VERSION] += 1
+        np.copyto(self.__slots[slot, :frame.nbytes].reshape(frame.shape), frame)
+        slot_header[self.SLOT_SEQUENCE_NUMBER] = sequence_number
+        slot_header[self.SLOT_HEIGHT:self.SLOT_CHANNELS + 1] = shape
+        slot_header[self.SLOT_VERSION] += 1
+
+        self.__fields[self.LATEST_SLOT] = slot
+        self.__fields[self.LATEST_SEQUENCE_NUMBER] = sequence_number
+
+        return True
+
+    def read(self, last_sequence_number=0, out=None, retries=3):
+        """
+        Copies the latest frame, if it is newer than the last one seen by the reader.
+        :param out array reused for the frame if its shape matches
+        :return: tuple (sequence number, frame), frame is None if there is no new frame
+        """
+
+        for _ in range(retries):
+            slot = int(self.__fields[self.LATEST_SLOT])
+
+            if slot < 0:
+                return last_sequence_number, None
+
+            slot_header = self.__slot_headers[slot]
+            version = int(slot_header[self.SLOT_VERSION])
+            sequence_number = int(slot_header[self.SLOT_SEQUENCE_NUMBER])
+
+            if sequence_number <= last_sequence_number:
+                return last_sequence_number, None
+
+            if version % 2 == 1:
+                # writer has wrapped around and is writing this slot
+                continue
+
+            height, width, channels = (int(size) for size in slot_header[self.SLOT_HEIGHT:self.SLOT_CHANNELS + 1])
+            shape = (height, width, channels) if channels else (height, width)
+            if out is None or out.shape != shape:
+                out = np.empty(shape, np.uint8)
+
+            np.copyto(out, self.__slots[slot, :out.nbytes].reshape(shape))
+
+            if int(slot_header[self.SLOT_VERSION]) == version:
+                return sequence_number, out
+
+        return last_sequence_number, None
+
+    def request(self, value):
+        """
+        Publishes reader's request with the current time as a heartbeat.
+        :return: None
+        """
+
+        self.__fields[self.REQUEST] = value
+        self.__fields[self.REQUEST_TIME] = time.time_ns()
+
+    def get_request(self, max_age=2):
+        """
+        :param max_age in seconds, older requests are ignored
+        :return: value of the latest request, None if no reader requested anything recently
+        """
+
+        if time.time_ns() - int(self.__fields[self.REQUEST_TIME]) > max_age * 1e9:
+            return None
+
+        return int(self.__fields[self.REQUEST])
+
+    def close(self):
+        """
+        Detaches the shared memory block, the owner also removes it.
+        :return: None
+        """
+
+        self.__header = self.__fields = self.__slot_headers = self.__slots = None
+        self.__shared_memory.close()
+
+        if self.is_owner:
+            try:
+                self.__shared_memory.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def get_preview_transport_name(camera_number, supervisor_pid):
+    """
+    :return: name of the shared memory block with preview frames of the camera run by supervisor's worker
+    """
+
+    return f"security_camera_{supervisor_pid}_camera{camera_number}"
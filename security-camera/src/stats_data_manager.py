@@ -1,86 +1,314 @@
+import json
 import logging
 import sqlite3
+import time
+from collections import deque
 from datetime import datetime
+from threading import Thread, Condition, Lock
 
 
 class StatsDataManager:
     """
-    Class responsible for operations on database that stores data used for statistics.
+    Class responsible for operations on database that stores data used for statistics. Inserts are only queued,
+    rows are written behind by a writer thread in batches, each batch in one transaction. Database runs in WAL mode,
+    so reads don't wait for the writer.
     """
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, batch_size=64, flush_interval=1.0):
+        """
+        :param db_path path of the database file
+        :param batch_size number of queued rows, after which they are written without waiting for the flush interval
+        :param flush_interval max time in seconds a queued row waits to be written
+        """
+
         # logging
         self.__logger = logging.getLogger("security_camera_logger")
 
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # connection of the writer thread
+        self.__write_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.__write_conn.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode, NORMAL syncs only at checkpoints - a committed row can be lost on power failure, not corrupted
+        self.__write_conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+        # connection used for reads
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.cursor = self.conn.cursor()
-        self.create_tables()
+        self.__read_lock = Lock()
+
+        # queue of (statement, parameters) rows
+        self.__rows = deque()
+        self.__condition = Condition()
+        self.__closed = False
+        self.__no_queued_rows = 0
+        self.__no_written_rows = 0
+        self.__flush_requested = False
+
+        # counters
+        self.no_batches = 0
+        self.no_failed_rows = 0
+
+        self.__writer_thread = Thread(target=self.write_rows, daemon=True)
+        self.__writer_thread.start()
 
         self.__logger.info("started connection")
 
     def create_tables(self):
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS motion_detection_data
+        cursor = self.__write_conn.cursor()
+
+        cursor.execute('''CREATE TABLE IF NOT EXISTS motion_detection_data
                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
                                timestamp INTEGER)''')
 
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS surveillance_log
+        cursor.execute('''CREATE TABLE IF NOT EXISTS surveillance_log
                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
                                timestamp INTEGER,
                                log_type text)''')
 
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS notifications_log
+        cursor.execute('''CREATE TABLE IF NOT EXISTS notifications_log
                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
                                timestamp INTEGER,
                                notification_type text)''')
 
-        self.conn.commit()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS metrics_snapshots
+                              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               timestamp INTEGER,
+                               camera_number INTEGER,
+                               snapshot text)''')
+
+        # range queries by time
+        for table in ("motion_detection_data", "surveillance_log", "notifications_log"):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_timestamp_index ON {table} (timestamp)")
+
+        self.__write_conn.commit()
 
         self.__logger.info("created tables")
 
+    def queue_row(self, statement, parameters):
+        """
+        Queues the row to be inserted by the writer thread.
+        :return: None
+        """
+
+        with self.__condition:
+            if self.__closed:
+                self.__logger.error("failed to queue stats row - connection is closed")
+                return
+
+            self.__rows.append((statement, parameters))
+            self.__no_queued_rows += 1
+
+            # writer is woken up to start the flush interval of the first row and when a batch is full
+            if len(self.__rows) == 1 or len(self.__rows) >= self.batch_size:
+                self.__condition.notify_all()
+
+    def write_rows(self):
+        """
+        Writes queued rows until the connection is closed. Rows are written when there are batch size of them, when
+        the oldest one waited for the flush interval, when flush is requested or when the connection is closed.
+        :return: None
+        """
+
+        oldest_row_time = None
+
+        while True:
+            with self.__condition:
+                while not self.__closed and not self.__flush_requested and len(self.__rows) < self.batch_size:
+                    if len(self.__rows) == 0:
+                        oldest_row_time = None
+                        self.__condition.wait()
+                        continue
+
+                    if oldest_row_time is None:
+                        oldest_row_time = time.monotonic()
+
+                    remaining_time = oldest_row_time + self.flush_interval - time.monotonic()
+                    if remaining_time <= 0:
+                        break
+
+                    self.__condition.wait(remaining_time)
+
+                rows = list(self.__rows)
+                self.__rows.clear()
+                self.__flush_requested = False
+                closed = self.__closed
+                oldest_row_time = None
+
+            if len(rows) > 0:
+                self.write_batch(rows)
+
+            with self.__condition:
+                self.__no_written_rows += len(rows)
+                self.__condition.notify_all()
+
+            if closed and len(rows) == 0:
+                return
+
+    def write_batch(self, rows):
+        """
+        Inserts the rows in one transaction, rows of the same statement with one executemany.
+        :return: None
+        """
+
+        parameters_by_statement = {}
+        for statement, parameters in rows:
+            parameters_by_statement.setdefault(statement, []).append(parameters)
+
+        try:
+            with self.__write_conn:
+                for statement, parameters in parameters_by_statement.items():
+                    self.__write_conn.executemany(statement, parameters)
+        except sqlite3.Error:
+            self.no_failed_rows += len(rows)
+            self.__logger.exception(f"failed to insert {len(rows)} stats rows")
+            return
+
+        self.no_batches += 1
+        self.__logger.debug(f"inserted {len(rows)} stats rows")
+
+    def flush(self, timeout=None):
+        """
+        Waits until all rows queued so far are written.
+        :return: True on success, False on timeout
+        """
+
+        with self.__condition:
+            no_queued_rows = self.__no_queued_rows
+            self.__flush_requested = True
+            self.__condition.notify_all()
+
+            return self.__condition.wait_for(lambda: self.__no_written_rows >= no_queued_rows or
+                                             not self.__writer_thread.is_alive(), timeout) and \
+                self.__no_written_rows >= no_queued_rows
+
+    def fetch_rows(self, query):
+        """
+        Flushes queued rows first, so that the result includes them.
+        :return: list of rows
+        """
+
+        self.flush()
+
+        with self.__read_lock:
+            self.cursor.execute(query)
+            return self.cursor.fetchall()
+
+    def iterate_rows(self, query, parameters=(), batch_size=1024):
+        """
+        Flushes queued rows first, then streams rows of the query from a cursor, batch size rows at a time.
+        :return: generator of rows
+        """
+
+        self.flush()
+
+        with self.__read_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(query, parameters)
+
+        try:
+            while True:
+                with self.__read_lock:
+                    rows = cursor.fetchmany(batch_size)
+
+                if len(rows) == 0:
+                    return
+
+                yield from rows
+        finally:
+            cursor.close()
+
     def insert_motion_detection_data(self):
         ts = int(datetime.now().timestamp() * 1000)
-        self.cursor.execute("INSERT INTO motion_detection_data (timestamp) VALUES (?)", (ts,))
-        self.conn.commit()
+        self.queue_row("INSERT INTO motion_detection_data (timestamp) VALUES (?)", (ts,))
 
-        self.__logger.info("inserted motion detection timestamp")
+        self.__logger.info("queued motion detection timestamp")
 
     def fetch_motion_detection_data(self):
-        self.cursor.execute("SELECT timestamp FROM motion_detection_data")
-        rows = self.cursor.fetchall()
-        return rows
+        return self.fetch_rows("SELECT timestamp FROM motion_detection_data")
+
+    def iterate_motion_detection_data(self, date_from, date_to):
+        """
+        :param date_from starting date in milliseconds
+        :param date_to ending date in milliseconds
+        :return: generator of (timestamp,) rows between the dates, ordered by timestamp
+        """
+
+        return self.iterate_rows("SELECT timestamp FROM motion_detection_data WHERE timestamp BETWEEN ? AND ? "
+                                 "ORDER BY timestamp", (date_from, date_to))
 
     def insert_surveillance_log(self, log_type):
         if log_type not in ('ON', 'OFF'):
             self.__logger.error('invalid log type')
         else:
             ts = int(datetime.now().timestamp() * 1000)
-            self.cursor.execute("INSERT INTO surveillance_log (timestamp, log_type) VALUES (?, ?)", (ts, log_type))
-            self.conn.commit()
+            self.queue_row("INSERT INTO surveillance_log (timestamp, log_type) VALUES (?, ?)", (ts, log_type))
 
-            self.__logger.info("inserted surveillance log")
+            self.__logger.info("queued surveillance log")
 
     def fetch_surveillance_log(self):
-        self.cursor.execute("SELECT timestamp, log_type FROM surveillance_log")
-        rows = self.cursor.fetchall()
-        return rows
+        return self.fetch_rows("SELECT timestamp, log_type FROM surveillance_log")
+
+    def iterate_surveillance_log(self, date_from, date_to):
+        """
+        :param date_from starting date in milliseconds
+        :param date_to ending date in milliseconds
+        :return: generator of (timestamp, log type) rows between the dates, ordered by timestamp
+        """
+
+        return self.iterate_rows("SELECT timestamp, log_type FROM surveillance_log WHERE timestamp BETWEEN ? AND ? "
+                                 "ORDER BY timestamp", (date_from, date_to))
 
     def insert_notifications_log(self, notification_type):
         if notification_type not in ("email", "system"):
             self.__logger.error("invalid log type")
         else:
             ts = int(datetime.now().timestamp() * 1000)
-            self.cursor.execute("INSERT INTO notifications_log (timestamp, notification_type) VALUES (?, ?)",
-                                (ts, notification_type))
-            self.conn.commit()
+            self.queue_row("INSERT INTO notifications_log (timestamp, notification_type) VALUES (?, ?)",
+                           (ts, notification_type))
 
-            self.__logger.info("inserted notification log")
+            self.__logger.info("queued notification log")
 
     def fetch_notifications_log(self):
-        self.cursor.execute("SELECT timestamp, notification_type FROM notifications_log")
-        rows = self.cursor.fetchall()
+        return self.fetch_rows("SELECT timestamp, notification_type FROM notifications_log")
+
+    def iterate_notifications_log(self, date_from, date_to):
+        """
+        :param date_from starting date in milliseconds
+        :param date_to ending date in milliseconds
+        :return: generator of (timestamp, notification type) rows between the dates, ordered by timestamp
+        """
+
+        return self.iterate_rows("SELECT timestamp, notification_type FROM notifications_log "
+                                 "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", (date_from, date_to))
+
+    def insert_metrics_snapshot(self, camera_number, snapshot):
+        ts = int(datetime.now().timestamp() * 1000)
+        self.queue_row("INSERT INTO metrics_snapshots (timestamp, camera_number, snapshot) VALUES (?, ?, ?)",
+                       (ts, camera_number, json.dumps(snapshot)))
+
+        self.__logger.info("queued metrics snapshot")
+
+    def fetch_metrics_snapshots(self):
+        rows = [(timestamp, camera_number, json.loads(snapshot)) for timestamp, camera_number, snapshot in
+                self.fetch_rows("SELECT timestamp, camera_number, snapshot FROM metrics_snapshots")]
         return rows
 
     def close_connection(self):
+        """
+        Writes all queued rows and closes the connections.
+        :return: None
+        """
+
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+        self.__writer_thread.join()
+
+        self.__write_conn.close()
         self.conn.close()
 
         self.__logger.info("closed connection")
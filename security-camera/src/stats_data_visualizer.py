@@ -21,19 +21,10 @@ class StatsDataVisualizer:
         :return: x, y ready for plotting
         """
 
-        motion_detection_data = self.__stats_data_manager.fetch_motion_detection_data()
-        motion_detection_data = [log[0] for log in motion_detection_data]
-        motion_detection_data.sort()
-
-        motion_detection_data_between_dates = []
-
-        i = 0
-        while i < len(motion_detection_data) and motion_detection_data[i] < date_from:
-            i += 1
-        while i < len(motion_detection_data) and motion_detection_data[i] <= date_to:
-            dt = datetime.fromtimestamp(motion_detection_data[i] / 1000)
-            motion_detection_data_between_dates.append(str(dt)[5:16])
-            i += 1
+        # rows are read from the timestamp index already filtered and sorted
+        motion_detection_data_between_dates = [
+            str(datetime.fromtimestamp(log[0] / 1000))[5:16]
+            for log in self.__stats_data_manager.iterate_motion_detection_data(date_from, date_to)]
 
         return motion_detection_data_between_dates, [1 for _ in range(len(motion_detection_data_between_dates))]
 
@@ -63,23 +54,18 @@ class StatsDataVisualizer:
         :return: x, y ready for plotting
         """
 
-        surveillance_data = self.__stats_data_manager.fetch_surveillance_log()
-        surveillance_data.sort(key=lambda log: log[0])
         surveillance_data_between_dates = []
 
-        i = 0
-        while i < len(surveillance_data) and surveillance_data[i][0] < date_from:
-            i += 1
-        while i < len(surveillance_data) and surveillance_data[i][0] <= date_to:
-            dt = datetime.fromtimestamp(surveillance_data[i][0] / 1000)
+        # rows are read from the timestamp index already filtered and sorted
+        for timestamp, log_type in self.__stats_data_manager.iterate_surveillance_log(date_from, date_to):
+            dt = datetime.fromtimestamp(timestamp / 1000)
 
-            if surveillance_data[i][1] == 'ON':
+            if log_type == 'ON':
                 surveillance_data_between_dates.append((str(dt)[5:16], 'OFF'))
             else:
                 surveillance_data_between_dates.append((str(dt)[5:16], 'ON'))
 
-            surveillance_data_between_dates.append((str(dt)[5:16], surveillance_data[i][1]))
-            i += 1
+            surveillance_data_between_dates.append((str(dt)[5:16], log_type))
 
         return [log[0] for log in surveillance_data_between_dates],\
             [1 if log[1] == 'ON' else 0 for log in surveillance_data_between_dates]
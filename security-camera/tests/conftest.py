@@ -4,7 +4,9 @@ import sys
 import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 from src.camera import Camera
+from src.frame_sources import SyntheticFrameSource, ScriptedObject
 
 
 @pytest.fixture(scope="function", params=(
@@ -18,12 +20,18 @@ def camera_params(request):
     yield request.param
 
 
+@pytest.fixture(name="frame_source", scope="function")
+def make_frame_source():
+    yield SyntheticFrameSource(640, 480, scripted_objects=[ScriptedObject(position=(0, 200), size=(60, 60),
+                                                                          velocity=(8, 0), start_frame=5)])
+
+
 @pytest.fixture(name="camera", scope="function")
-@pytest.mark.usefixtures("camera_params")
-def make_camera(camera_params):
+def make_camera(camera_params, frame_source):
     camera = Camera(camera_params["emergency_buff_size"], camera_params["detection_sensitivity"], 
                     camera_params["max_detection_sensitivity"],camera_params["min_motion_contour_area"], 
-                    camera_params["fps"], camera_params["camera_number"], camera_params["recording_mode"])
+                    camera_params["fps"], camera_params["camera_number"], camera_params["recording_mode"],
+                    frame_source=frame_source)
     
     yield camera
     
@@ -37,7 +45,6 @@ def frame_resolution(request):
 
 
 @pytest.fixture(name="random_frame")
-@pytest.mark.usefixtures("frame_resolution")
 def random_frame(frame_resolution):
     yield np.random.randint(0, 256, (frame_resolution[0], frame_resolution[1], 3), dtype="uint8")
     
\ No newline at end of file
@@ -1,4 +1,6 @@
-from src.camera import Camera
+from src.camera import Camera, Frame
+from src.recording_writers import StandardRecordingWriter
+from src.frame_sources import SyntheticFrameSource, ScriptedObject
 import pytest
 import os
 import sys
@@ -44,7 +46,7 @@ def test_validate_frame(camera: Camera, random_frame):
 @pytest.mark.usefixtures("camera", "random_frame")
 def test_update_emergency_buffer(camera: Camera, random_frame):
     for i in range(1, min(camera.emergency_buff_size, 30)):
-        camera._Camera__frame_new = random_frame
+        camera._Camera__frame_new = Frame(random_frame)
         camera.update_emergency_buffer()
 
         assert len(camera._Camera__emergency_recording_buffered_frames) == i
@@ -70,8 +72,225 @@ def test_stop_emergency_recording(camera: Camera):
 def test_get_frame(camera: Camera, random_frame):
     for get_frame_with_mode in camera.frame_modes.values():
         for _ in range(5):
-            camera._Camera__frame_old = random_frame
-            camera._Camera__frame_new = random_frame
+            camera._Camera__frame_old = Frame(random_frame)
+            camera._Camera__frame_new = Frame(random_frame)
                 
             assert camera.validate_frame(get_frame_with_mode())
-    
\ No newline at end of file
+    
+
+@pytest.mark.usefixtures("camera")
+def test_detect_scripted_object(camera: Camera):
+    camera.detection_sensitivity = 12
+    camera.max_detection_sensitivity = 15
+    camera.min_motion_contour_area = 100
+    motion_detected = []
+
+    for _ in range(10):
+        assert camera.refresh_frame()
+        motion_detected.append(camera.search_for_motion())
+
+    assert not any(motion_detected[1:5])
+    assert all(motion_detected[6:])
+
+
+@pytest.mark.usefixtures("camera")
+def test_recording_frame_is_rendered_once(camera: Camera):
+    assert camera.refresh_frame()
+    assert camera.refresh_frame()
+
+    recording_frame = camera.render_recording_frame()
+
+    assert camera.validate_frame(recording_frame)
+    assert not recording_frame.flags.writeable
+    assert camera.render_recording_frame() is recording_frame
+    assert camera.get_frame_with_mode(camera.recording_mode) is recording_frame
+
+    assert camera.refresh_frame()
+
+    assert camera.render_recording_frame() is not recording_frame
+
+
+@pytest.mark.usefixtures("camera")
+def test_adaptive_detection_cadence(camera: Camera):
+    camera.detection_sensitivity = 12
+    camera.max_detection_sensitivity = 15
+    camera.min_motion_contour_area = 100
+    camera.idle_detection_interval = 4
+    detection_due = []
+    motion_detected = []
+
+    for _ in range(12):
+        assert camera.refresh_frame()
+        detection_due.append(camera.detection_due)
+        motion_detected.append(camera.detection_due and camera.search_for_motion())
+
+    # scene is idle until the object appears in the 6th frame
+    assert not all(detection_due[2:5])
+    assert detection_due[5] and motion_detected[5]
+    assert all(detection_due[5:])
+    assert camera.get_stats()["detection_rate"] < 1
+
+
+@pytest.mark.usefixtures("camera")
+def test_rollover_within_one_second_keeps_segments(camera: Camera, tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "src")
+    os.makedirs(tmp_path / "recordings" / "standard")
+    monkeypatch.chdir(tmp_path / "src")
+
+    segments = []
+    writer = StandardRecordingWriter(camera.open_standard_recording_output, 100, "Block", segment_frames=2,
+                                     on_segment_finished=segments.append)
+    image = np.zeros((camera.frame_dimensions[1], camera.frame_dimensions[0], 3), np.uint8)
+
+    # early rollover at the end of an emergency opens the next segment in the same second, here even millisecond
+    writer.request_rollover(after_time=1000.0)
+    for capture_time in (1000.0, 1000.0, 1000.5, 1000.7):
+        writer.put(image, capture_time=capture_time)
+    writer.start()
+    writer.stop(drain=True)
+
+    file_paths = [segment.file_path for segment in segments]
+
+    assert len(segments) == 3
+    assert len(set(file_paths)) == len(file_paths)
+    assert all(os.path.isfile(file_path) for file_path in file_paths)
+
+
+@pytest.mark.usefixtures("camera")
+def test_motion_analysis_is_reused_for_frame(camera: Camera):
+    camera.idle_detection_interval = 1
+    motion_detector = camera._Camera__motion_detector
+    detect = motion_detector.detect
+    detected_frames = []
+
+    def counting_detect(blurred_gray_frame, threshold):
+        detected_frames.append(blurred_gray_frame)
+        return detect(blurred_gray_frame, threshold)
+
+    motion_detector.detect = counting_detect
+
+    assert camera.refresh_frame()
+    assert camera.refresh_frame()
+
+    motion_analysis = camera.get_motion_analysis()
+
+    # detection and overlays of the same frame share one analysis
+    for _ in range(3):
+        camera.search_for_motion()
+        camera.get_motion_contours_with_min_area()
+        camera.get_frame_with_rectangles()
+        camera.get_frame_with_contours()
+
+    assert len(detected_frames) == 1
+    assert camera.get_motion_analysis() is motion_analysis
+
+    assert camera.refresh_frame()
+
+    camera.get_frame_with_rectangles()
+    camera.search_for_motion()
+
+    assert len(detected_frames) == 2
+    assert camera.get_motion_analysis() is not motion_analysis
+    assert camera.get_motion_analysis().sequence_number == motion_analysis.sequence_number + 1
+
+
+@pytest.mark.usefixtures("camera")
+def test_motion_recording_mode_draws_scheduled_detection(camera: Camera):
+    camera.detection_sensitivity = 12
+    camera.max_detection_sensitivity = 15
+    camera.min_motion_contour_area = 100
+    camera.idle_detection_interval = 1
+    camera.recording_mode = "Motion rectangles"
+    motion_detector = camera._Camera__motion_detector
+    detect = motion_detector.detect
+    detected_frames = []
+
+    def counting_detect(blurred_gray_frame, threshold):
+        detected_frames.append(blurred_gray_frame)
+        return detect(blurred_gray_frame, threshold)
+
+    motion_detector.detect = counting_detect
+
+    for _ in range(8):
+        assert camera.refresh_frame()
+
+    # detection scheduled by the loop runs before the recording frame is rendered
+    assert camera.mode_draws_motion(camera.recording_mode)
+    assert camera.search_for_motion()
+    assert not np.array_equal(camera.render_recording_frame(), camera._Camera__frame_old.image)
+
+    # detection skipped by the scheduler isn't run by rendering, motion isn't drawn
+    assert camera.refresh_frame()
+    assert np.array_equal(camera.render_recording_frame(), camera._Camera__frame_old.image)
+    assert len(detected_frames) == 1
+
+
+@pytest.mark.usefixtures("frame_source")
+def test_emergency_clip_pre_roll_uses_configured_length(frame_source):
+    camera = Camera(120, 12, 15, 100, 24, 0, "Standard", frame_source=frame_source, emergency_recording_mode="Segments",
+                    emergency_buff_length=5)
+    clip_times = []
+    camera.assemble_emergency_clip = lambda start_time, end_time, clip_path: clip_times.append((start_time, end_time))
+
+    try:
+        # capture runs at half of the configured rate, the pre-roll still covers the configured length
+        camera.emergency_recording_fps = 12
+        camera.frame_capture_time = 1010.0
+        camera._Camera__emergency_event_time = 1000.0
+        clip_path = camera.start_emergency_clip_assembly()
+        camera.wait_for_emergency_clip(clip_path, timeout=1)
+
+        assert clip_times == [(995.0, 1010.0)]
+    finally:
+        camera.destroy()
+
+
+@pytest.mark.usefixtures("frame_source")
+def test_recording_frame_doesnt_pin_capture_buffer(frame_source):
+    camera = Camera(10, 1, 25, 10, 100, 0, "Standard", frame_source=frame_source, threaded_capture=True)
+
+    try:
+        assert camera.refresh_frame()
+
+        captured_image = camera.get_standard_frame()
+        recording_frame = camera.render_recording_frame()
+
+        # frames queued by writers are copies, so capture buffers are released as soon as the camera moves on
+        assert not np.shares_memory(recording_frame, captured_image)
+        assert np.array_equal(recording_frame, captured_image)
+        assert not recording_frame.flags.writeable
+    finally:
+        camera.destroy()
+
+
+def test_detection_runs_on_downscaled_proxy():
+    frame_source = SyntheticFrameSource(1280, 720, scripted_objects=[ScriptedObject(position=(400, 300), size=(120, 120),
+                                                                                    velocity=(16, 0), start_frame=3)])
+    camera = Camera(10, 12, 15, 100, 24, 0, "Standard", detection_resolution=240, frame_source=frame_source)
+
+    try:
+        for _ in range(6):
+            assert camera.refresh_frame()
+
+        motion_analysis = camera.get_motion_analysis()
+        detection_scale = motion_analysis.detection_scale
+
+        assert detection_scale == pytest.approx(240 / 720)
+        assert camera.get_detection_frame(camera._Camera__frame_new, detection_scale).shape == (240, 427)
+
+        # object moved between the last two frames, edges it uncovered and covered are reported in full-frame pixels
+        old_x, old_y, w, h = frame_source.scripted_objects[0].get_rectangle(4, frame_source.frame_dimensions)
+        new_x, _, _, _ = frame_source.scripted_objects[0].get_rectangle(5, frame_source.frame_dimensions)
+        bounding_boxes = motion_analysis.get_bounding_boxes_with_min_area(camera.min_motion_contour_area)
+        bounding_boxes = bounding_boxes[np.argsort(bounding_boxes[:, 0])]
+        contour_points = np.concatenate(camera.get_motion_contours_with_min_area()).reshape(-1, 2)
+
+        assert len(bounding_boxes) == 2
+        assert np.allclose(bounding_boxes[:, 0], (old_x, old_x + w), atol=6)
+        assert np.allclose(bounding_boxes[:, 0] + bounding_boxes[:, 2], (new_x, new_x + w), atol=6)
+        assert np.allclose(bounding_boxes[:, 1], old_y, atol=6)
+        assert np.allclose(bounding_boxes[:, 1] + bounding_boxes[:, 3], old_y + h, atol=6)
+        assert np.allclose(contour_points.min(axis=0), (old_x, old_y), atol=6)
+        assert np.allclose(contour_points.max(axis=0), (new_x + w, old_y + h), atol=6)
+    finally:
+        camera.destroy()
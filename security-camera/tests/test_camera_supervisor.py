@@ -0,0 +1,54 @@
+from src.camera_supervisor import CameraSupervisor
+import pytest
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def crashing_worker(camera_settings, stop_event, log_file_path):
+    sys.exit(1)
+
+
+def waiting_worker(camera_settings, stop_event, log_file_path):
+    stop_event.wait()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    return condition()
+
+
+@pytest.mark.parametrize("cameras_settings", ([{"camera_number": 1}], [{"camera_number": 1}, {"camera_number": 2}]))
+def test_workers_stop(cameras_settings):
+    supervisor = CameraSupervisor(cameras_settings, worker_target=waiting_worker, start_method="fork")
+    supervisor.start()
+
+    assert wait_for(lambda: all(status["alive"] for status in supervisor.get_status()))
+    assert [status["camera_number"] for status in supervisor.get_status()] == [1, 2][:len(cameras_settings)]
+
+    supervisor.stop(timeout=5)
+
+    assert not any(status["alive"] for status in supervisor.get_status())
+    assert all(status["restarts"] == 0 for status in supervisor.get_status())
+
+
+def test_crashed_worker_restarts():
+    supervisor = CameraSupervisor([{"camera_number": 1}], restart_delay=0.1, max_restart_delay=0.2,
+                                  worker_target=crashing_worker, start_method="fork")
+    supervisor.start()
+
+    try:
+        assert wait_for(lambda: supervisor.get_status()[0]["restarts"] >= 3)
+    finally:
+        supervisor.stop(timeout=5)
+
+    restarts = supervisor.get_status()[0]["restarts"]
+    time.sleep(0.5)
+
+    assert supervisor.get_status()[0]["restarts"] == restarts
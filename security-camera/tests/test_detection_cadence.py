@@ -0,0 +1,61 @@
+from src.detection_cadence import DetectionCadence
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="image")
+def make_image():
+    yield np.full((480, 640, 3), 100, np.uint8)
+
+
+def run_idle_frames(detection_cadence, image, no_frames):
+    detection_due = []
+
+    for _ in range(no_frames):
+        detection_cadence.add_frame()
+        detection_due.append(detection_cadence.is_detection_due(lambda: detection_cadence.get_thumbnail(image)))
+
+        if detection_due[-1]:
+            detection_cadence.add_detection(detection_cadence.get_thumbnail(image), motion_detected=False)
+
+    return detection_due
+
+
+def test_idle_interval(image):
+    detection_cadence = DetectionCadence(idle_interval=5)
+
+    assert run_idle_frames(detection_cadence, image, 11) == [True, False, False, False, False] * 2 + [True]
+    assert detection_cadence.detection_rate == pytest.approx(3 / 11)
+
+
+def test_every_frame_without_idle_interval(image):
+    detection_cadence = DetectionCadence(idle_interval=1)
+
+    assert all(run_idle_frames(detection_cadence, image, 10))
+    assert detection_cadence.detection_rate == 1
+
+
+def test_change_score_triggers_detection(image):
+    detection_cadence = DetectionCadence(idle_interval=10, change_threshold=8)
+    run_idle_frames(detection_cadence, image, 3)
+
+    # small object changes its cells of the thumbnail fully
+    changed_image = image.copy()
+    changed_image[200:240, 300:340] = 250
+
+    detection_cadence.add_frame()
+    assert detection_cadence.get_change_score(detection_cadence.get_thumbnail(changed_image)) > 100
+    assert detection_cadence.is_detection_due(lambda: detection_cadence.get_thumbnail(changed_image))
+
+
+def test_motion_keeps_detection_active(image):
+    detection_cadence = DetectionCadence(idle_interval=10, active_frames=3)
+    run_idle_frames(detection_cadence, image, 2)
+    detection_cadence.add_detection(detection_cadence.get_thumbnail(image), motion_detected=True)
+
+    assert run_idle_frames(detection_cadence, image, 5)[:3] == [True, True, True]
+    assert not detection_cadence.is_active
@@ -0,0 +1,77 @@
+from src.detection_zones import create_detection_mask
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_zone(zone_type, x, y, w, h):
+    return {"type": zone_type, "points": [[x, y], [x + w - 1, y], [x + w - 1, y + h - 1], [x, y + h - 1]]}
+
+
+def test_no_zones_include_whole_frame():
+    mask = create_detection_mask((48, 64), 1, [])
+
+    assert mask.shape == (48, 64) and mask.dtype == np.uint8
+    assert np.all(mask == 255)
+
+
+def test_include_zones_only():
+    mask = create_detection_mask((96, 128), 1, [make_zone("include", 0, 0, 32, 32),
+                                                make_zone("include", 64, 48, 64, 48)])
+    expected_mask = np.zeros((96, 128), np.uint8)
+    expected_mask[:32, :32] = 255
+    expected_mask[48:, 64:] = 255
+
+    assert np.array_equal(mask, expected_mask)
+
+
+def test_zones_are_scaled_to_detection_proxy():
+    mask = create_detection_mask((24, 32), 0.5, [{"type": "include", "points": [[0, 0], [30, 0], [30, 30], [0, 30]]}])
+    expected_mask = np.zeros((24, 32), np.uint8)
+    expected_mask[:16, :16] = 255
+
+    assert np.array_equal(mask, expected_mask)
+
+
+def test_exclude_zone_is_cut_out_of_include_zone():
+    mask = create_detection_mask((48, 64), 1, [make_zone("exclude", 8, 8, 8, 8), make_zone("include", 0, 0, 32, 32)])
+    expected_mask = np.zeros((48, 64), np.uint8)
+    expected_mask[:32, :32] = 255
+    expected_mask[8:16, 8:16] = 0
+
+    assert np.array_equal(mask, expected_mask)
+
+
+def test_exclude_zones_only():
+    mask = create_detection_mask((48, 64), 1, [make_zone("exclude", 0, 0, 64, 8)])
+
+    assert np.all(mask[:8] == 0)
+    assert np.all(mask[8:] == 255)
+
+
+@pytest.mark.parametrize("zone", (
+    {"type": "include"},
+    {"type": "include", "points": None},
+    {"type": "include", "points": "points"},
+    {"type": "include", "points": [[0, 0], [10, 10]]},
+    {"type": "include", "points": [[0, 0, 1], [10, 0, 1], [10, 10, 1]]},
+    {"type": "include", "points": [[0, 0], [10, 0], [float("nan"), 10]]},
+    {"points": [[0, 0], [10, 0], [10, 10]]},
+    {"type": "unknown", "points": [[0, 0], [10, 0], [10, 10]]},
+    make_zone("include", 64, 0, 10, 10),
+    make_zone("include", -20, -20, 10, 10),
+    make_zone("include", 0, 100, 10, 10)
+))
+def test_invalid_zones_are_skipped(zone):
+    assert np.all(create_detection_mask((48, 64), 1, [zone]) == 255)
+
+
+def test_zone_partially_outside_frame_is_clipped():
+    mask = create_detection_mask((48, 64), 1, [make_zone("include", 48, -16, 32, 32)])
+    expected_mask = np.zeros((48, 64), np.uint8)
+    expected_mask[:16, 48:] = 255
+
+    assert np.array_equal(mask, expected_mask)
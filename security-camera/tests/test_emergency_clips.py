@@ -0,0 +1,59 @@
+from src.emergency_clips import EmergencyClipAssembler
+from src.recording_writers import RecordingSegment
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="segments")
+def make_segments(tmp_path):
+    segments = []
+
+    for i in range(4):
+        file_path = str(tmp_path / f"segment_{i}.mkv")
+        open(file_path, "wb").close()
+        segments.append(RecordingSegment(file_path, start_time=100 + i * 10, end_time=109.9 + i * 10, no_frames=100))
+
+    return segments
+
+
+def test_covering_segments(segments):
+    covering_segments = EmergencyClipAssembler.get_covering_segments(segments[::-1], 115, 125)
+
+    assert [segment for segment, _, _ in covering_segments] == segments[1:3]
+    assert covering_segments[0][1:] == (5, None)
+    assert covering_segments[1][1:] == (None, 5)
+
+
+def test_no_covering_segments(segments):
+    assembler = EmergencyClipAssembler(ffmpeg_path="")
+
+    assert assembler.assemble(segments, 200, 210, "clip.ffconcat") is None
+
+
+def test_clip_saved_as_playlist_without_ffmpeg(segments, tmp_path):
+    assembler = EmergencyClipAssembler(ffmpeg_path="")
+    clip_path = assembler.get_clip_path(str(tmp_path / "clip"))
+
+    assert clip_path.endswith(".ffconcat")
+    assert assembler.assemble(segments, 105, 131, clip_path) == clip_path
+    assert assembler.is_playlist(clip_path)
+
+    with open(clip_path) as playlist_file:
+        lines = playlist_file.read().splitlines()
+
+    assert lines[0] == "ffconcat version 1.0"
+    assert [line for line in lines if line.startswith("file")] == [f"file '{segment.file_path}'"
+                                                                   for segment in segments]
+    assert "inpoint 5.000" in lines
+    assert "outpoint 1.000" in lines
+
+
+def test_failed_concatenation_falls_back_to_playlist(segments, tmp_path):
+    assembler = EmergencyClipAssembler(ffmpeg_path=str(tmp_path / "missing_ffmpeg"))
+    clip_path = assembler.get_clip_path(str(tmp_path / "clip"))
+
+    assert clip_path.endswith(".mkv") and not assembler.is_playlist(clip_path)
+    assert assembler.is_playlist(assembler.assemble(segments, 105, 131, clip_path))
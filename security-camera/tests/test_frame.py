@@ -0,0 +1,67 @@
+from src.frame import Frame
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="image")
+def make_image():
+    yield np.random.randint(0, 256, (48, 64, 3), dtype="uint8")
+
+
+def test_image_is_read_only_view(image):
+    frame = Frame(image, sequence_number=3, capture_time=1.5)
+
+    assert frame.valid
+    assert np.shares_memory(frame.image, image)
+    assert not frame.image.flags.writeable
+    assert image.flags.writeable
+
+    with pytest.raises(ValueError):
+        frame.image[0, 0] = 0
+
+
+@pytest.mark.parametrize("image", (None, "None", np.zeros((0, 0, 3), np.uint8)))
+def test_invalid_frame(image):
+    frame = Frame(image)
+
+    assert not frame.valid
+    assert frame.gray is None
+    assert frame.render("Standard", lambda f: f.image) is None
+
+
+def test_derived_views_are_memoised(image):
+    frame = Frame(image)
+    calls = []
+
+    def render(f):
+        calls.append(f)
+        return 255 - f.image
+
+    assert frame.gray is frame.gray
+    assert frame.blurred_gray is frame.blurred_gray
+    assert frame.rgb.shape == image.shape
+    assert not frame.gray.flags.writeable
+
+    rendered = frame.render("Negative", render)
+
+    assert frame.render("Negative", render) is rendered
+    assert len(calls) == 1
+    assert not rendered.flags.writeable
+
+
+def test_writable_copy(image):
+    frame = Frame(image)
+    frame_copy = frame.get_writable_copy()
+    frame_copy[:] = 0
+
+    assert frame_copy.flags.writeable
+    assert np.array_equal(frame.image, image)
+    assert frame.get_writable_copy("gray") is None
+
+    gray = frame.gray
+
+    assert np.array_equal(frame.get_writable_copy("gray"), gray)
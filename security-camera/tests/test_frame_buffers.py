@@ -0,0 +1,104 @@
+from src.frame_buffers import FrameRingBuffer, create_frame_buffer
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_frame(value, shape=(48, 64, 3)):
+    return np.full(shape, value, np.uint8)
+
+
+def test_ring_buffer_keeps_newest_frames():
+    ring_buffer = FrameRingBuffer(capacity=5, max_memory=1024 ** 2)
+
+    for i in range(8):
+        ring_buffer.append(make_frame(i))
+
+    assert len(ring_buffer) == 5
+    assert [frame[0, 0, 0] for frame in ring_buffer.drain()] == [3, 4, 5, 6, 7]
+    assert len(ring_buffer) == 0
+
+
+def test_ring_buffer_memory_ceiling():
+    frame = make_frame(0)
+    ring_buffer = FrameRingBuffer(capacity=100, max_memory=frame.nbytes * 10)
+    ring_buffer.append(frame)
+
+    assert ring_buffer.capacity == 10
+    assert ring_buffer.nbytes == frame.nbytes * 10
+
+
+@pytest.mark.parametrize("shape", ((1, 1, 3), (480, 640, 3)))
+def test_ring_buffer_reallocates_on_shape_change(shape):
+    ring_buffer = FrameRingBuffer(capacity=3, max_memory=1024 ** 3)
+    ring_buffer.append(make_frame(1))
+    ring_buffer.append(make_frame(2, shape))
+
+    assert len(ring_buffer) == 1
+    assert ring_buffer.popleft().shape == shape
+    assert ring_buffer.popleft() is None
+
+
+def test_ring_buffer_set_capacity():
+    ring_buffer = FrameRingBuffer(capacity=3, max_memory=1024 ** 3)
+    ring_buffer.append(make_frame(1))
+    ring_buffer.set_capacity(3)
+
+    assert len(ring_buffer) == 1
+
+    ring_buffer.set_capacity(6)
+
+    assert ring_buffer.capacity == 6
+    assert len(ring_buffer) == 0
+
+
+@pytest.mark.parametrize("compression", ("JPEG", "PNG"))
+def test_compressed_buffer_byte_budget(compression):
+    frames = [np.random.randint(0, 256, (48, 64, 3), np.uint8) for _ in range(10)]
+    compressed_buffer = create_frame_buffer(capacity=100, max_memory=frames[0].nbytes * 3, compression=compression)
+
+    for frame in frames:
+        compressed_buffer.append(frame)
+
+    drained_frames = list(compressed_buffer.drain())
+    compressed_buffer.close()
+
+    assert 0 < len(drained_frames) < len(frames)
+    assert all(frame.shape == frames[0].shape for frame in drained_frames)
+    assert compressed_buffer.nbytes == 0
+
+
+def test_compressed_buffer_is_lossless_with_png():
+    frames = [np.full((48, 64, 3), i, np.uint8) for i in range(5)]
+    compressed_buffer = create_frame_buffer(capacity=3, max_memory=1024 ** 2, compression="PNG")
+
+    for frame in frames:
+        compressed_buffer.append(frame)
+
+    assert [frame[0, 0, 0] for frame in compressed_buffer.drain()] == [2, 3, 4]
+    compressed_buffer.close()
+
+
+def test_compressed_buffer_starts_encoder_on_first_frame():
+    compressed_buffers = [create_frame_buffer(capacity=10, max_memory=1024 ** 2, compression="JPEG")
+                          for _ in range(20)]
+
+    # buffers that never get a frame, e.g. of cameras that failed to open, have no threads
+    assert all(compressed_buffer._CompressedFrameBuffer__encoder_thread is None
+               for compressed_buffer in compressed_buffers)
+
+    for compressed_buffer in compressed_buffers:
+        compressed_buffer.close()
+
+    compressed_buffers[0].append(make_frame(1))
+    compressed_buffer = create_frame_buffer(capacity=10, max_memory=1024 ** 2, compression="JPEG")
+    compressed_buffer.append(make_frame(1))
+
+    assert compressed_buffers[0]._CompressedFrameBuffer__encoder_thread is None
+    assert compressed_buffer._CompressedFrameBuffer__encoder_thread.is_alive()
+    assert len(list(compressed_buffer.drain())) == 1
+
+    compressed_buffer.close()
@@ -0,0 +1,126 @@
+from src.frame_bus import FrameBus
+from src.camera import Camera, Frame
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def create_frames(no_frames):
+    return [Frame(np.full((4, 4, 3), i, np.uint8), i + 1) for i in range(no_frames)]
+
+
+def test_slow_subscriber_does_not_stall_others():
+    frame_bus = FrameBus()
+    fast_subscription = frame_bus.subscribe("fast", max_size=10)
+    slow_subscription = frame_bus.subscribe("slow", max_size=2, overflow_policy="Drop oldest")
+    frames = create_frames(10)
+
+    for frame in frames:
+        frame_bus.publish(frame)
+
+    assert [fast_subscription.get(0) for _ in range(10)] == frames
+    assert [slow_subscription.get(0) for _ in range(2)] == frames[-2:]
+    assert slow_subscription.get_stats()["dropped_frames"] == 8
+    assert frame_bus.get_latest_frame() is frames[-1]
+
+
+def test_rate_limit_and_latest_frame():
+    frame_bus = FrameBus()
+    limited_subscription = frame_bus.subscribe("limited", max_size=10, max_fps=1)
+    latest_subscription = frame_bus.subscribe("latest", max_size=10, overflow_policy="Drop newest")
+    frames = create_frames(5)
+
+    for frame in frames:
+        frame_bus.publish(frame)
+
+    assert limited_subscription.get(0) is frames[0]
+    assert limited_subscription.get(0) is None
+    assert limited_subscription.get_stats()["limited_frames"] == 4
+    assert latest_subscription.get_latest(0) is frames[-1]
+    assert latest_subscription.get(0) is None
+
+
+def test_unsubscribe_and_blocking_policy():
+    frame_bus = FrameBus()
+    subscription = frame_bus.subscribe("closed")
+    frame_bus.unsubscribe(subscription)
+    frame_bus.publish(create_frames(1)[0])
+
+    assert subscription.get(0) is None
+    assert "closed_queued_frames" not in frame_bus.get_stats()
+
+    with pytest.raises(ValueError):
+        frame_bus.subscribe("blocking", overflow_policy="Block")
+
+
+@pytest.mark.usefixtures("camera")
+def test_camera_publishes_refreshed_frames(camera: Camera):
+    subscription = camera.frame_bus.subscribe("test", max_size=5)
+
+    for _ in range(3):
+        assert camera.refresh_frame()
+
+    frames = [subscription.get(0) for _ in range(3)]
+
+    assert [frame.sequence_number for frame in frames] == [1, 2, 3]
+    assert not frames[0].image.flags.writeable
+    assert np.array_equal(camera.get_frame_with_mode("Negative", frames[0]), 255 - frames[0].image)
+    assert camera.get_frame_with_mode("Standard", frames[-1]) is camera.get_standard_frame()
+
+
+@pytest.mark.usefixtures("camera")
+def test_motion_is_drawn_with_analysis_of_bus_frame(camera: Camera):
+    camera.detection_sensitivity = 12
+    camera.max_detection_sensitivity = 15
+    camera.min_motion_contour_area = 100
+    subscription = camera.frame_bus.subscribe("test", max_size=10)
+
+    for _ in range(8):
+        assert camera.refresh_frame()
+
+    frame = camera.frame_bus.get_latest_frame()
+    unanalysed_image = camera.get_frame_with_mode("Motion rectangles", frame)
+
+    # frames from the bus are never analysed by the renderer, the frame is drawn again once it's analysed
+    assert camera.get_cached_motion_analysis(frame.sequence_number) is None
+    assert camera.search_for_motion()
+
+    analysed_image = camera.get_frame_with_mode("Motion rectangles", frame)
+
+    assert not np.array_equal(analysed_image, unanalysed_image)
+
+    assert camera.refresh_frame()
+    assert camera.refresh_frame()
+
+    # the camera has moved on, the frame is still drawn with its own analysis, the newer frames without any
+    assert camera.get_frame_with_mode("Motion rectangles", frame) is analysed_image
+    skipped_frame = [subscription.get(0) for _ in range(10)][8]
+
+    assert skipped_frame.sequence_number == frame.sequence_number + 1
+    assert np.array_equal(camera.get_frame_with_mode("Motion rectangles", skipped_frame), skipped_frame.image)
+
+
+@pytest.mark.usefixtures("camera")
+def test_frame_is_published_after_detection(camera: Camera):
+    camera.detection_sensitivity = 12
+    camera.max_detection_sensitivity = 15
+    camera.min_motion_contour_area = 100
+    subscription = camera.frame_bus.subscribe("test", max_size=10)
+
+    for _ in range(8):
+        assert camera.refresh_frame(publish=False)
+        assert subscription.get(0) is None
+
+        # subscribers get the frame only once its motion is analysed, so overlays don't depend on timing
+        camera.search_for_motion()
+        camera.publish_frame()
+        frame = subscription.get(0)
+
+        assert frame.sequence_number == camera.frame_bus.no_published_frames
+        # the first frame has no previous frame to be compared with
+        assert (camera.get_cached_motion_analysis(frame.sequence_number) is not None) == (frame.sequence_number > 1)
+
+    assert not np.array_equal(camera.get_frame_with_mode("Motion rectangles", frame), camera.get_standard_frame())
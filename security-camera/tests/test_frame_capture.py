@@ -0,0 +1,136 @@
+from src.frame_capture import FrameCaptureThread
+import pytest
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class SteppedFrameSource:
+    """
+    Synthetic source producing frames only when the test allows it, each image is filled with its frame number.
+    """
+
+    def __init__(self, shape=(4, 4, 3)):
+        self.shape = shape
+        self.no_read_frames = 0
+        self.__allowed_frames = threading.Semaphore(0)
+
+    def allow(self, no_frames=1):
+        for _ in range(no_frames):
+            self.__allowed_frames.release()
+
+    def read(self, image=None):
+        if not self.__allowed_frames.acquire(timeout=0.1):
+            return False, None
+
+        if image is None:
+            image = np.empty(self.shape, np.uint8)
+
+        self.no_read_frames += 1
+        image[...] = self.no_read_frames
+
+        return True, image
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+@pytest.fixture(name="capture")
+def make_capture():
+    threads = []
+
+    def start_capture(ring_size):
+        frame_source = SteppedFrameSource()
+        capture_thread = FrameCaptureThread(frame_source, frame_source.shape, ring_size=ring_size)
+        capture_thread.start()
+        threads.append(capture_thread)
+
+        return frame_source, capture_thread
+
+    yield start_capture
+
+    for capture_thread in threads:
+        capture_thread.stop()
+        capture_thread.join(1)
+
+
+def test_next_unseen_and_latest_frame(capture):
+    frame_source, capture_thread = capture(ring_size=6)
+    frame_source.allow(3)
+    wait_until(lambda: capture_thread.no_captured_frames == 3)
+
+    frames = []
+    for _ in range(2):
+        frames.append(capture_thread.acquire_next_frame(frames[-1].sequence_number if frames else 0, timeout=1))
+
+    latest_frame = capture_thread.acquire_latest_frame(timeout=1)
+
+    assert [frame.sequence_number for frame in frames] == [1, 2]
+    assert latest_frame.sequence_number == 3
+    assert [frame.image[0, 0, 0] for frame in frames + [latest_frame]] == [1, 2, 3]
+    assert capture_thread.acquire_next_frame(latest_frame.sequence_number, timeout=0.05) is None
+
+
+def test_pinned_slot_is_not_reused_until_released(capture):
+    frame_source, capture_thread = capture(ring_size=2)
+    frame_source.allow()
+    pinned_frame = capture_thread.acquire_next_frame(0, timeout=1)
+
+    # one buffer is pinned, the other one holds the latest frame, so further frames can't be kept
+    frame_source.allow(3)
+    wait_until(lambda: capture_thread.no_dropped_frames == 2)
+
+    assert capture_thread.no_captured_frames == 2
+    assert np.all(pinned_frame.image == 1)
+
+    # the capture may already be waiting for a frame it will drop, so one more frame is allowed
+    capture_thread.release_frame(pinned_frame)
+    frame_source.allow(2)
+    next_frame = capture_thread.acquire_next_frame(2, timeout=1)
+
+    assert next_frame.slot == pinned_frame.slot
+    assert next_frame.image[0, 0, 0] in (5, 6)
+
+
+def test_ring_doesnt_grow_for_slow_consumer(capture):
+    frame_source, capture_thread = capture(ring_size=4)
+    pinned_frames = []
+
+    # consumer keeps all frames, only preallocated buffers are used
+    for sequence_number in range(4):
+        frame_source.allow()
+        pinned_frames.append(capture_thread.acquire_next_frame(sequence_number, timeout=1))
+
+    assert sorted(frame.slot for frame in pinned_frames) == [0, 1, 2, 3]
+    assert [frame.image[0, 0, 0] for frame in pinned_frames] == [1, 2, 3, 4]
+    assert capture_thread.no_dropped_frames == 0
+
+    frame_source.allow(2)
+    wait_until(lambda: capture_thread.no_dropped_frames == 2)
+
+    assert capture_thread.no_captured_frames == 4
+    assert len(capture_thread._FrameCaptureThread__ring) == 4
+
+
+def test_dropped_frames_are_counted(capture):
+    frame_source, capture_thread = capture(ring_size=1)
+    frame_source.allow()
+    wait_until(lambda: capture_thread.no_captured_frames == 1)
+
+    # the only buffer holds the latest frame, it's never overwritten
+    frame_source.allow(5)
+    wait_until(lambda: capture_thread.no_dropped_frames == 5)
+
+    latest_frame = capture_thread.acquire_latest_frame(timeout=1)
+
+    assert capture_thread.no_captured_frames == 1
+    assert latest_frame.sequence_number == 1 and np.all(latest_frame.image == 1)
@@ -0,0 +1,97 @@
+from src.frame_sources import SyntheticFrameSource, ScriptedObject, ImageDirectoryFrameSource, \
+    VideoFileFrameSource, create_frame_source
+import pytest
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="scripted_object")
+def make_scripted_object():
+    yield ScriptedObject(position=(10, 20), size=(30, 30), velocity=(5, 0), color=(0, 0, 255), start_frame=2,
+                         end_frame=4)
+
+
+def test_synthetic_source_is_deterministic(scripted_object):
+    first_source = SyntheticFrameSource(160, 120, scripted_objects=[scripted_object], no_frames=6)
+    second_source = SyntheticFrameSource(160, 120, scripted_objects=[scripted_object], no_frames=6)
+
+    for _ in range(6):
+        first_success, first_frame = first_source.read()
+        second_success, second_frame = second_source.read()
+
+        assert first_success and second_success
+        assert np.array_equal(first_frame, second_frame)
+
+    assert first_source.read() == (False, None)
+    assert first_source.no_read_frames == 6
+
+
+def test_synthetic_source_scripted_object(scripted_object):
+    source = SyntheticFrameSource(160, 120, scripted_objects=[scripted_object])
+    image = np.empty((120, 160, 3), np.uint8)
+
+    for frame_index in range(5):
+        success, frame = source.read(image=image)
+
+        assert success and frame is image
+        assert source.is_motion_frame(frame_index) == (2 <= frame_index < 4)
+        assert np.array_equal(frame[20, 10 + 5 * (frame_index - 2)], (0, 0, 255)) == (2 <= frame_index < 4)
+
+
+def test_paced_source():
+    source = SyntheticFrameSource(64, 48, fps=50)
+    start_time = time.perf_counter()
+
+    for _ in range(11):
+        source.read()
+
+    assert time.perf_counter() - start_time >= 0.19
+
+
+def test_image_directory_source(tmp_path):
+    for i, size in enumerate(((64, 48), (64, 48), (32, 24))):
+        cv2.imwrite(str(tmp_path / f"{i:03}.png"), np.full((size[1], size[0], 3), i * 50, np.uint8))
+
+    source = ImageDirectoryFrameSource(str(tmp_path))
+
+    assert source.is_opened()
+    assert source.frame_dimensions == (64, 48)
+
+    frames = [source.read()[1] for _ in range(3)]
+
+    assert [frame[0, 0, 0] for frame in frames] == [0, 50, 100]
+    assert all(frame.shape == (48, 64, 3) for frame in frames)
+    assert source.read() == (False, None)
+
+
+def test_video_file_source(tmp_path):
+    path = str(tmp_path / "video.mkv")
+    output = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for _ in range(10):
+        output.write(np.zeros((48, 64, 3), np.uint8))
+    output.release()
+
+    source = VideoFileFrameSource(path, real_time=False)
+
+    assert source.is_opened()
+    assert source.frame_dimensions == (64, 48)
+    assert source.fps is None
+
+    no_frames = 0
+    while source.read()[0]:
+        no_frames += 1
+
+    assert no_frames == 10
+
+
+def test_create_frame_source(tmp_path):
+    source = create_frame_source("synthetic:320x240")
+
+    assert isinstance(source, SyntheticFrameSource)
+    assert source.frame_dimensions == (320, 240)
+    assert isinstance(create_frame_source(str(tmp_path)), ImageDirectoryFrameSource)
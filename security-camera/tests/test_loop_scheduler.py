@@ -0,0 +1,105 @@
+from src.loop_scheduler import LoopScheduler
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_measured_fps():
+    loop_scheduler = LoopScheduler(fps=30, no_measured_frames=10)
+    assert loop_scheduler.get_measured_fps() is None
+    assert loop_scheduler.get_recording_fps() == 30
+
+    for i in range(10):
+        loop_scheduler.add_frame(i / 12.5)
+
+    assert loop_scheduler.get_measured_fps() == pytest.approx(12.5)
+    assert loop_scheduler.get_recording_fps() == 12.5
+
+
+def test_recording_fps_is_limited_to_target_fps():
+    loop_scheduler = LoopScheduler(fps=24, no_measured_frames=10)
+
+    for i in range(10):
+        loop_scheduler.add_frame(i / 60)
+
+    assert loop_scheduler.get_recording_fps() == 24
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 100.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.time
+
+    def sleep(self, duration):
+        self.sleeps.append(duration)
+        self.time += duration
+
+
+def test_deadline_pacing():
+    fake_clock = FakeClock()
+    loop_scheduler = LoopScheduler(fps=50, clock=fake_clock.clock, sleep=fake_clock.sleep)
+    start_time = fake_clock.time
+
+    for _ in range(25):
+        fake_clock.time += 0.005
+        loop_scheduler.end_iteration(0.005)
+
+    # processing time is not added on top of the frame period
+    assert fake_clock.time - start_time == pytest.approx(0.005 + 25 * 0.02)
+    assert fake_clock.sleeps == pytest.approx([0.02] + [0.015] * 24)
+    assert loop_scheduler.no_late_iterations == 0
+
+
+def test_late_loop_resets_deadline():
+    fake_clock = FakeClock()
+    loop_scheduler = LoopScheduler(fps=50, clock=fake_clock.clock, sleep=fake_clock.sleep)
+    loop_scheduler.end_iteration(0)
+
+    # iteration took three frame periods, the loop doesn't catch up with a burst of iterations
+    fake_clock.time += 0.06
+    loop_scheduler.end_iteration(0.06)
+    fake_clock.time += 0.005
+    loop_scheduler.end_iteration(0.005)
+
+    assert loop_scheduler.no_late_iterations == 1
+    assert fake_clock.sleeps[-1] == pytest.approx(0.015)
+
+
+def test_work_is_shed_in_order():
+    loop_scheduler = LoopScheduler(fps=100, smoothing=1)
+
+    for _ in range(101):
+        loop_scheduler.update_load(0.02)
+
+    # preview is shed first
+    assert loop_scheduler.shed_level == 1
+    assert loop_scheduler.preview_stride > 1
+    assert loop_scheduler.detection_stride == 1
+
+    for _ in range(500):
+        loop_scheduler.update_load(0.02)
+
+    assert loop_scheduler.shed_level == len(LoopScheduler.shed_levels) - 1
+    assert loop_scheduler.detection_stride > 1
+
+    no_detections = 0
+    for _ in range(60):
+        no_detections += loop_scheduler.should_detect_motion()
+        loop_scheduler.update_load(0.02)
+
+    assert no_detections == 60 // loop_scheduler.detection_stride
+
+
+def test_shed_work_is_restored():
+    loop_scheduler = LoopScheduler(fps=100, smoothing=1)
+    loop_scheduler.shed_level = 2
+
+    for _ in range(250):
+        loop_scheduler.update_load(0)
+
+    assert loop_scheduler.shed_level == 0
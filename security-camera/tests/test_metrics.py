@@ -0,0 +1,91 @@
+from src.metrics import Metrics, MetricsServer, RollingHistogram
+from src.stats_data_manager import StatsDataManager
+import pytest
+import os
+import sys
+import json
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="metrics")
+def make_metrics():
+    metrics = Metrics(labels={"camera": "0"}, histogram_size=100)
+
+    for i in range(1, 201):
+        metrics.observe("detection", i / 1000)
+
+    metrics.increment("motion_events")
+    metrics.increment("motion_events", 2)
+    metrics.register_gauge("camera", lambda: {"refreshed_frames": 10, "failed_refreshes": None})
+    metrics.register_gauge("workers", lambda: 2)
+
+    return metrics
+
+
+def test_histogram_keeps_recent_samples():
+    histogram = RollingHistogram(size=4)
+    assert histogram.get_summary() == {"count": 0}
+
+    for value in (1, 1, 1, 1, 0.002, 0.002, 0.002, 0.002):
+        histogram.add(value)
+
+    summary = histogram.get_summary()
+
+    assert summary["count"] == 8
+    assert summary["p50_ms"] == pytest.approx(2)
+    assert summary["max_ms"] == pytest.approx(2)
+
+
+def test_snapshot(metrics):
+    with metrics.time_stage("refresh"):
+        pass
+
+    snapshot = metrics.get_snapshot()
+
+    assert snapshot["counters"] == {"motion_events": 3}
+    assert snapshot["gauges"] == {"camera_refreshed_frames": 10, "workers": 2}
+    assert snapshot["latencies"]["refresh"]["count"] == 1
+    assert snapshot["latencies"]["detection"]["count"] == 200
+    assert snapshot["latencies"]["detection"]["p50_ms"] == pytest.approx(150.5)
+
+
+def test_failing_gauge_is_skipped(metrics):
+    metrics.register_gauge("broken", lambda: 1 / 0)
+
+    assert "broken" not in metrics.get_gauges()
+
+
+def test_prometheus_text(metrics):
+    lines = metrics.get_prometheus_text().splitlines()
+
+    assert 'security_camera_motion_events_total{camera="0"} 3' in lines
+    assert 'security_camera_workers{camera="0"} 2.0' in lines
+    assert 'security_camera_stage_latency_seconds_count{camera="0",stage="detection"} 200' in lines
+
+
+def test_metrics_server(metrics):
+    server = MetricsServer(metrics, 0)
+    assert server.start()
+
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert b"security_camera_motion_events_total" in response.read()
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics.json", timeout=5) as response:
+            assert json.load(response)["counters"]["motion_events"] == 3
+    finally:
+        server.stop()
+
+
+def test_metrics_snapshots_are_saved(metrics, tmp_path):
+    stats_data_manager = StatsDataManager(str(tmp_path / "stats.sqlite"))
+    stats_data_manager.insert_metrics_snapshot(0, metrics.get_snapshot())
+
+    snapshots = stats_data_manager.fetch_metrics_snapshots()
+    stats_data_manager.close_connection()
+
+    assert len(snapshots) == 1
+    assert snapshots[0][1] == 0
+    assert snapshots[0][2]["counters"]["motion_events"] == 3
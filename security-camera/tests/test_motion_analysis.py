@@ -0,0 +1,43 @@
+from src.motion_analysis import MotionAnalysis
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="motion_mask")
+def make_motion_mask():
+    motion_mask = np.zeros((480, 640), np.uint8)
+    motion_mask[100:120, 200:260] = 255
+    motion_mask[300:302, 400:402] = 255
+
+    yield motion_mask
+
+
+@pytest.mark.parametrize("detection_scale", (1, 0.5))
+def test_blobs_in_full_frame_coordinates(motion_mask, detection_scale):
+    motion_analysis = MotionAnalysis(0, motion_mask, detection_scale)
+
+    assert len(motion_analysis.areas) == 2
+    assert motion_analysis.areas[0] == 20 * 60 / detection_scale ** 2
+    assert tuple(motion_analysis.bounding_boxes[0]) == tuple(round(v / detection_scale) for v in (200, 100, 60, 20))
+
+
+def test_min_area_filtering(motion_mask):
+    motion_analysis = MotionAnalysis(0, motion_mask, 1)
+
+    assert motion_analysis.has_motion(100)
+    assert not motion_analysis.has_motion(10000)
+    assert len(motion_analysis.get_bounding_boxes_with_min_area(100)) == 1
+    assert len(motion_analysis.get_contours_with_min_area(100)) == 1
+    assert len(motion_analysis.contours) == 2
+
+
+def test_empty_motion_mask():
+    motion_analysis = MotionAnalysis(0, np.zeros((480, 640), np.uint8), 1)
+
+    assert not motion_analysis.has_motion(0)
+    assert motion_analysis.get_contours_with_min_area(0) == ()
+    assert motion_analysis.bounding_boxes.shape == (0, 4)
@@ -0,0 +1,83 @@
+from src.motion_detectors import FrameDifferenceDetector, motion_detectors, create_motion_detector
+import pytest
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_detection_frames(no_frames, block_start_frame=None, shape=(120, 160), seed=13):
+    """
+    Makes blurred gray frames of a static noisy scene, a bright block moves across it from the given frame on.
+    """
+
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 160, shape, dtype=np.uint8), (0, 0), 5)
+    frames = []
+
+    for i in range(no_frames):
+        frame = np.clip(background + rng.normal(0, 2, shape), 0, 255).astype(np.uint8)
+
+        if block_start_frame is not None and i >= block_start_frame:
+            x = 8 * (i - block_start_frame)
+            frame[50:70, x:x + 20] = 250
+
+        frames.append(cv2.GaussianBlur(frame, (3, 3), sigmaX=0))
+
+    return frames
+
+
+@pytest.fixture(name="motion_detector", params=list(motion_detectors))
+def make_motion_detector(request):
+    yield create_motion_detector(request.param)
+
+
+def detect_all(motion_detector, frames, threshold=25):
+    return [motion_detector.detect(frame, threshold) for frame in frames]
+
+
+def test_masks_have_frame_shape(motion_detector):
+    masks = [mask for mask in detect_all(motion_detector, make_detection_frames(5)) if mask is not None]
+
+    assert len(masks) >= 4
+
+    for mask in masks:
+        assert mask.shape == (120, 160) and mask.dtype == np.uint8
+        assert np.all((mask == 0) | (mask == 255))
+
+
+def test_static_scene_is_quiet(motion_detector):
+    masks = detect_all(motion_detector, make_detection_frames(40))
+
+    assert all(np.count_nonzero(mask) == 0 for mask in masks[20:])
+
+
+def test_moving_block_is_detected(motion_detector):
+    frames = make_detection_frames(30, block_start_frame=20)
+    masks = detect_all(motion_detector, frames)
+
+    for i, mask in enumerate(masks[21:], start=1):
+        x = 8 * i
+        assert np.count_nonzero(mask[50:70, x:x + 20]) > 100
+        assert np.count_nonzero(mask[:40]) == 0 and np.count_nonzero(mask[80:]) == 0
+
+
+def test_previous_frame_is_required():
+    motion_detector = FrameDifferenceDetector()
+    frames = make_detection_frames(3, block_start_frame=1)
+
+    assert motion_detector.detect(frames[0], 25) is None
+
+    motion_detector.update(frames[1])
+
+    assert motion_detector.detect(frames[2], 25) is not None
+
+    motion_detector.reset()
+
+    assert motion_detector.detect(frames[2], 25) is None
+
+
+def test_unknown_detector_falls_back_to_frame_difference():
+    assert isinstance(create_motion_detector("Unknown"), FrameDifferenceDetector)
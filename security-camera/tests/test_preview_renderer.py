@@ -0,0 +1,84 @@
+from src.preview_renderer import PreviewRenderer
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class FakePreviewSource:
+    def __init__(self):
+        self.sequence_number = 1
+        self.image = np.zeros((480, 640, 3), np.uint8)
+        self.image[:, :, 0] = 255
+        self.no_requests = 0
+
+    def get_frame(self, camera_number, mode, last_sequence_number):
+        self.no_requests += 1
+
+        if self.sequence_number == last_sequence_number:
+            return last_sequence_number, None
+
+        return self.sequence_number, self.image
+
+
+def test_renders_only_new_frames():
+    source = FakePreviewSource()
+    preview_renderer = PreviewRenderer(source.get_frame, 320, 180)
+
+    assert not preview_renderer.render_new_frame()
+
+    preview_renderer.set_source(0, "Standard")
+
+    assert preview_renderer.render_new_frame()
+    assert not preview_renderer.render_new_frame()
+
+    source.sequence_number += 1
+
+    assert preview_renderer.render_new_frame()
+
+    preview_renderer.set_source(0, "Gray")
+
+    assert preview_renderer.render_new_frame()
+    assert preview_renderer.no_rendered_frames == 3
+
+
+def test_read_frame_passes_resized_rgb_frame_once():
+    source = FakePreviewSource()
+    preview_renderer = PreviewRenderer(source.get_frame, 320, 180)
+    preview_renderer.set_source(0, "Standard")
+    read_frames = []
+
+    def consume(rgb_frame):
+        read_frames.append(rgb_frame.copy())
+
+    sequence_number = preview_renderer.read_frame(0, consume)
+
+    assert sequence_number == 0 and len(read_frames) == 0
+
+    preview_renderer.render_new_frame()
+    sequence_number = preview_renderer.read_frame(sequence_number, consume)
+    preview_renderer.read_frame(sequence_number, consume)
+    expected_frame = cv2.resize(source.image, (320, 180), interpolation=cv2.INTER_AREA)
+
+    assert len(read_frames) == 1
+    assert read_frames[0].shape == (180, 320, 3)
+    assert np.array_equal(read_frames[0], cv2.cvtColor(expected_frame, cv2.COLOR_BGR2RGB))
+
+
+def test_thread_respects_preview_fps():
+    source = FakePreviewSource()
+    preview_renderer = PreviewRenderer(source.get_frame, 320, 180, preview_fps=20)
+    preview_renderer.set_source(0, "Standard")
+    preview_renderer.start()
+
+    try:
+        time.sleep(0.5)
+    finally:
+        preview_renderer.stop()
+        preview_renderer.join(timeout=1)
+
+    assert not preview_renderer.is_alive()
+    assert 5 <= source.no_requests <= 13
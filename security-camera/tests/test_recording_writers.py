@@ -0,0 +1,116 @@
+from src.recording_writers import BoundedFrameQueue, StandardRecordingWriter
+import pytest
+import os
+import sys
+from threading import Thread
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.mark.parametrize("overflow_policy, expected_frames", (("Drop oldest", [2, 3, 4]), ("Drop newest", [0, 1, 2])))
+def test_overflow_policy(overflow_policy, expected_frames):
+    frame_queue = BoundedFrameQueue(3, overflow_policy)
+
+    for i in range(5):
+        frame_queue.put(i)
+
+    frame_queue.close()
+
+    assert frame_queue.no_dropped_frames == 2
+    assert [frame_queue.get() for _ in range(4)] == expected_frames + [None]
+
+
+def test_block_policy_waits_for_consumer():
+    frame_queue = BoundedFrameQueue(2, "Block")
+    consumed_frames = []
+
+    def consume():
+        frame = frame_queue.get()
+        while frame is not None:
+            consumed_frames.append(frame)
+            frame = frame_queue.get()
+
+    consumer_thread = Thread(target=consume)
+    consumer_thread.start()
+
+    for i in range(100):
+        assert frame_queue.put(i)
+
+    frame_queue.close()
+    consumer_thread.join(timeout=5)
+
+    assert consumed_frames == list(range(100))
+    assert frame_queue.no_dropped_frames == 0
+    assert frame_queue.max_depth <= 2
+
+
+def test_close_with_discard():
+    frame_queue = BoundedFrameQueue(10)
+
+    for i in range(5):
+        frame_queue.put(i)
+
+    frame_queue.close(discard=True)
+
+    assert frame_queue.get(timeout=0.1) is None
+    assert not frame_queue.put(5)
+    assert frame_queue.no_dropped_frames == 5
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        BoundedFrameQueue(10, "Drop everything")
+
+
+class FakeOutput:
+    def __init__(self):
+        self.frames = []
+        self.released = False
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def release(self):
+        self.released = True
+
+
+def test_standard_recording_segments():
+    outputs = []
+
+    def open_output(capture_time):
+        outputs.append(FakeOutput())
+        return outputs[-1], f"segment_{capture_time}.mkv"
+
+    writer = StandardRecordingWriter(open_output, 10, "Block", segment_frames=4)
+    writer.start()
+
+    for i in range(10):
+        writer.put(i, capture_time=i)
+
+    assert writer.stop(drain=True)
+    assert [output.frames for output in outputs] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert all(output.released for output in outputs)
+    assert writer.get_stats() == {"queue_depth": 0, "max_queue_depth": writer.get_stats()["max_queue_depth"],
+                                  "written_frames": 10, "dropped_frames": 0, "segments": 3}
+
+
+def test_standard_recording_rollover():
+    outputs = []
+    segments = []
+
+    def open_output(capture_time):
+        outputs.append(FakeOutput())
+        return outputs[-1], f"segment_{capture_time}.mkv"
+
+    writer = StandardRecordingWriter(open_output, 10, "Block", on_segment_finished=segments.append)
+    writer.request_rollover(after_time=2)
+    writer.start()
+
+    for i in range(5):
+        writer.put(i, capture_time=i)
+
+    writer.stop(drain=True)
+
+    assert [output.frames for output in outputs] == [[0, 1, 2], [3, 4]]
+    assert [(segment.file_path, segment.start_time, segment.end_time, segment.no_frames) for segment in segments] == \
+           [("segment_0.mkv", 0, 2, 3), ("segment_3.mkv", 3, 4, 2)]
@@ -0,0 +1,83 @@
+from src.render_modes import RenderChain, RenderStep, create_render_chain
+from src.camera import Camera, Frame
+import pytest
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class CountingStep(RenderStep):
+    def __init__(self):
+        self.outputs = []
+
+    def apply(self, image, out, frame, camera, sequence_number):
+        self.outputs.append(out)
+        return cv2.add(image, 1, dst=out)
+
+
+@pytest.mark.usefixtures("random_frame")
+def test_builtin_modes_match_opencv(random_frame):
+    frame = Frame(random_frame)
+    sharpen_kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+
+    assert np.array_equal(create_render_chain("Negative").render(frame, None, None), cv2.bitwise_not(random_frame))
+    assert np.array_equal(create_render_chain("Sharpened").render(frame, None, None),
+                          cv2.filter2D(random_frame, -1, sharpen_kernel))
+    assert np.array_equal(create_render_chain("Gray").render(frame, None, None),
+                          cv2.cvtColor(cv2.cvtColor(random_frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR))
+
+
+@pytest.mark.usefixtures("random_frame")
+def test_chain_renders_steps_in_order(random_frame):
+    frame = Frame(random_frame)
+    expected = cv2.bitwise_not(cv2.cvtColor(cv2.cvtColor(random_frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR))
+
+    assert np.array_equal(create_render_chain("Gray -> Negative").render(frame, None, None), expected)
+    assert np.array_equal(create_render_chain("Gray→Negative").render(frame, None, None), expected)
+    assert create_render_chain("Gray -> Unknown") is None
+
+
+@pytest.mark.usefixtures("random_frame")
+def test_intermediate_buffers_are_reused(random_frame):
+    first_step, last_step = CountingStep(), CountingStep()
+    render_chain = RenderChain([first_step, last_step])
+    images = [render_chain.render(Frame(random_frame), None, None) for _ in range(3)]
+
+    assert first_step.outputs[0] is not None
+    assert all(out is first_step.outputs[0] for out in first_step.outputs)
+    assert all(out is None for out in last_step.outputs)
+    assert images[0] is not images[1] and images[1] is not images[2]
+    assert np.array_equal(images[2], cv2.add(random_frame, 2))
+
+
+@pytest.mark.usefixtures("random_frame")
+def test_final_image_is_never_a_buffer(random_frame):
+    render_chain = create_render_chain("Gray -> Standard")
+    images = [render_chain.render(Frame(random_frame), None, None) for _ in range(2)]
+
+    assert images[0] is not images[1]
+    assert np.array_equal(images[0], images[1])
+
+
+@pytest.mark.usefixtures("camera", "random_frame")
+def test_register_frame_mode(camera: Camera, random_frame):
+    frame_mode_names = Camera.frame_mode_names
+
+    try:
+        Camera.register_frame_mode("Gray negative", "Gray -> Negative")
+
+        assert Camera.frame_mode_names[-1] == "Gray negative"
+
+        camera._Camera__frame_old = Frame(random_frame)
+        camera._Camera__frame_new = Frame(random_frame)
+        camera.detection_due = False
+
+        assert np.array_equal(camera.get_frame_with_mode("Gray negative"),
+                              camera.get_frame_with_mode("Gray -> Negative"))
+        assert np.array_equal(camera.get_frame_with_mode("Gray -> Motion rectangles"), camera.get_gray_frame())
+        assert camera.get_frame_with_mode("Unknown") is camera.get_standard_frame()
+    finally:
+        Camera.frame_mode_names = frame_mode_names
@@ -0,0 +1,87 @@
+from src.shared_frame_transport import SharedFrameTransport
+import pytest
+import os
+import sys
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(name="transport")
+def make_transport():
+    transport = SharedFrameTransport(f"security_camera_test_{os.getpid()}", (48, 64, 3), create=True)
+
+    yield transport
+
+    transport.close()
+
+
+def write_frames(name, no_frames):
+    transport = SharedFrameTransport(name)
+
+    for i in range(no_frames):
+        transport.write(np.full((48, 64, 3), i % 256, np.uint8))
+
+    transport.close()
+
+
+def test_read_latest_frame(transport):
+    reader = SharedFrameTransport(transport.name)
+
+    assert reader.read() == (0, None)
+
+    frames = [np.random.randint(0, 256, (48, 64, 3), dtype="uint8") for _ in range(5)]
+    for frame in frames:
+        assert transport.write(frame)
+
+    sequence_number, frame = reader.read()
+
+    assert sequence_number == 5
+    assert np.array_equal(frame, frames[-1])
+    assert reader.read(sequence_number) == (sequence_number, None)
+
+    gray_frame = np.zeros((10, 20), np.uint8)
+    transport.write(gray_frame)
+    sequence_number, frame = reader.read(sequence_number, out=frame)
+
+    assert sequence_number == 6
+    assert frame.shape == gray_frame.shape
+
+    reader.close()
+
+
+def test_frame_too_large(transport):
+    assert not transport.write(np.zeros((49, 64, 3), np.uint8))
+    assert transport.sequence_number == 0
+
+
+def test_request(transport):
+    reader = SharedFrameTransport(transport.name)
+
+    assert transport.get_request() is None
+
+    reader.request(4)
+
+    assert transport.get_request() == 4
+
+    reader.close()
+
+
+def test_no_torn_frames(transport):
+    writer = multiprocessing.get_context("fork").Process(target=write_frames, args=(transport.name, 3000))
+    writer.start()
+
+    sequence_number = 0
+    frame = None
+
+    while writer.is_alive():
+        sequence_number, new_frame = transport.read(sequence_number, out=frame)
+
+        if new_frame is not None:
+            frame = new_frame
+            assert frame.min() == frame.max()
+
+    writer.join()
+
+    assert transport.sequence_number == 3000
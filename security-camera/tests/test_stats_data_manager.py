@@ -0,0 +1,83 @@
+from src.stats_data_manager import StatsDataManager
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    no_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+
+    return no_rows
+
+
+def test_rows_are_written_behind_in_batches(tmp_path):
+    db_path = str(tmp_path / "stats.sqlite")
+    stats_data_manager = StatsDataManager(db_path, batch_size=50, flush_interval=60)
+
+    for _ in range(50):
+        stats_data_manager.insert_motion_detection_data()
+
+    deadline = time.monotonic() + 5
+    while stats_data_manager.no_batches < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stats_data_manager.insert_notifications_log("email")
+    time.sleep(0.1)
+
+    # full batch is written without waiting for the flush interval, a single row waits
+    assert count_rows(db_path, "motion_detection_data") == 50
+    assert count_rows(db_path, "notifications_log") == 0
+
+    assert len(stats_data_manager.fetch_motion_detection_data()) == 50
+    assert stats_data_manager.fetch_notifications_log()[0][1] == "email"
+
+    stats_data_manager.close_connection()
+
+
+def test_flush_interval_and_close(tmp_path):
+    db_path = str(tmp_path / "stats.sqlite")
+    stats_data_manager = StatsDataManager(db_path, batch_size=1000, flush_interval=0.05)
+    stats_data_manager.insert_surveillance_log("ON")
+
+    deadline = time.monotonic() + 5
+    while stats_data_manager.no_batches < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert count_rows(db_path, "surveillance_log") == 1
+
+    stats_data_manager.flush_interval = 60
+    stats_data_manager.insert_surveillance_log("OFF")
+    stats_data_manager.close_connection()
+
+    assert count_rows(db_path, "surveillance_log") == 2
+    assert sqlite3.connect(db_path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_range_queries_use_timestamp_index(tmp_path):
+    db_path = str(tmp_path / "stats.sqlite")
+    stats_data_manager = StatsDataManager(db_path)
+
+    for ts in (500, 100, 300, 200, 400):
+        stats_data_manager.queue_row("INSERT INTO surveillance_log (timestamp, log_type) VALUES (?, ?)",
+                                     (ts, "ON" if ts % 200 else "OFF"))
+
+    rows = stats_data_manager.iterate_rows("SELECT timestamp, log_type FROM surveillance_log "
+                                           "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", (200, 400),
+                                           batch_size=2)
+
+    assert list(rows) == [(200, "OFF"), (300, "ON"), (400, "OFF")]
+    assert list(stats_data_manager.iterate_surveillance_log(450, 1000)) == [(500, "ON")]
+    assert list(stats_data_manager.iterate_motion_detection_data(0, 1000)) == []
+
+    for table in ("motion_detection_data", "surveillance_log", "notifications_log"):
+        query_plan = stats_data_manager.fetch_rows(f"EXPLAIN QUERY PLAN SELECT timestamp FROM {table} "
+                                                   f"WHERE timestamp BETWEEN 0 AND 1 ORDER BY timestamp")
+
+        assert f"{table}_timestamp_index" in " ".join(str(row[-1]) for row in query_plan)
+
+    stats_data_manager.close_connection()